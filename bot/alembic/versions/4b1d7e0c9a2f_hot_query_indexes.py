@@ -0,0 +1,38 @@
+"""hot query indexes
+
+Revision ID: 4b1d7e0c9a2f
+Revises: 3e268b65623e
+Create Date: 2026-10-18 10:12:41.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1d7e0c9a2f'
+down_revision: Union[str, None] = '3e268b65623e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_ownedcards_owner_id', 'ownedcards', ['owner_id'])
+    op.create_index('ix_ownedcards_card_id', 'ownedcards', ['card_id'])
+    op.create_index('ix_match_unfinished', 'match', ['match_id'], postgresql_where=sa.text('finished = false'))
+    op.create_index('ix_shop_date_added', 'shop', ['date_added'])
+    op.create_index('ix_votes_match_id', 'votes', ['match_id'])
+    op.create_index('ix_booster_card_segment', 'booster_card', ['booster_pack_id', 'booster_segment_id'])
+    op.create_index('ix_user_account_guild_brancoins', 'user_account', ['guild_id', sa.text('brancoins DESC')])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_account_guild_brancoins', table_name='user_account')
+    op.drop_index('ix_booster_card_segment', table_name='booster_card')
+    op.drop_index('ix_votes_match_id', table_name='votes')
+    op.drop_index('ix_shop_date_added', table_name='shop')
+    op.drop_index('ix_match_unfinished', table_name='match', postgresql_where=sa.text('finished = false'))
+    op.drop_index('ix_ownedcards_card_id', table_name='ownedcards')
+    op.drop_index('ix_ownedcards_owner_id', table_name='ownedcards')
@@ -0,0 +1,43 @@
+"""match result
+
+Revision ID: 5c8e2f7a1d93
+Revises: 9d3f6a1c2b7e
+Create Date: 2026-10-18 15:41:09.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8e2f7a1d93'
+down_revision: Union[str, None] = '9d3f6a1c2b7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('match_result',
+    sa.Column('match_id', sa.String(), nullable=False),
+    sa.Column('our_team_won', sa.Boolean(), nullable=False),
+    sa.Column('game_duration', sa.Integer(), nullable=False),
+    sa.Column('game_end', sa.DateTime(), nullable=True),
+    sa.Column('summary', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.ForeignKeyConstraint(['match_id'], ['match.match_id'], ),
+    sa.PrimaryKeyConstraint('match_id')
+    )
+    # lz4 needs postgres 14+ built with it, otherwise the column keeps the default pglz
+    op.execute("""
+    DO $$ BEGIN
+        EXECUTE 'ALTER TABLE match_result ALTER COLUMN summary SET COMPRESSION lz4';
+    EXCEPTION WHEN others THEN
+        RAISE NOTICE 'lz4 unavailable, match_result.summary stays on the default compression';
+    END $$;
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('match_result')
@@ -0,0 +1,27 @@
+"""image digest
+
+Revision ID: 7f1a3c5e9b20
+Revises: e2b4c6a8d0f1
+Create Date: 2026-10-18 19:03:55.417260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f1a3c5e9b20'
+down_revision: Union[str, None] = 'e2b4c6a8d0f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # generated, so every way an image gets in (bran addimage, POST /image) keeps it right
+    op.add_column('images', sa.Column('digest', sa.String(), sa.Computed("encode(sha256(bin), 'hex')", persisted=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('images', 'digest')
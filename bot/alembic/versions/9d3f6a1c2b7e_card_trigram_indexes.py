@@ -0,0 +1,28 @@
+"""card trigram indexes
+
+Revision ID: 9d3f6a1c2b7e
+Revises: 4b1d7e0c9a2f
+Create Date: 2026-10-18 11:02:17.530611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f6a1c2b7e'
+down_revision: Union[str, None] = '4b1d7e0c9a2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # pg_trgm comes from c9a254fa1b7f
+    op.create_index('ix_cards_title_trgm', 'cards', ['title'], postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+    op.create_index('ix_cards_description_trgm', 'cards', ['description'], postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cards_description_trgm', table_name='cards', postgresql_using='gin')
+    op.drop_index('ix_cards_title_trgm', table_name='cards', postgresql_using='gin')
@@ -0,0 +1,51 @@
+"""stats aggregates
+
+Revision ID: e2b4c6a8d0f1
+Revises: 5c8e2f7a1d93
+Create Date: 2026-10-18 17:26:43.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b4c6a8d0f1'
+down_revision: Union[str, None] = '5c8e2f7a1d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('player_stats',
+    sa.Column('league_user_id', sa.Integer(), nullable=False),
+    sa.Column('match_type', sa.String(), nullable=False),
+    sa.Column('champion', sa.String(), nullable=False),
+    sa.Column('games', sa.Integer(), nullable=False),
+    sa.Column('wins', sa.Integer(), nullable=False),
+    sa.Column('kills', sa.Integer(), nullable=False),
+    sa.Column('deaths', sa.Integer(), nullable=False),
+    sa.Column('assists', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['league_user_id'], ['league_user.id'], ),
+    sa.PrimaryKeyConstraint('league_user_id', 'match_type', 'champion')
+    )
+    op.create_table('voter_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('guild_id', sa.String(), nullable=False),
+    sa.Column('votes', sa.Integer(), nullable=False),
+    sa.Column('wins', sa.Integer(), nullable=False),
+    sa.Column('wagered', sa.Integer(), nullable=False),
+    sa.Column('profit', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user_account.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_voter_stats_guild_profit', 'voter_stats', ['guild_id', sa.text('profit DESC')], unique=False)
+    # filled from history by tools.rebuild_stats
+
+
+def downgrade() -> None:
+    op.drop_index('ix_voter_stats_guild_profit', table_name='voter_stats')
+    op.drop_table('voter_stats')
+    op.drop_table('player_stats')
@@ -35,29 +35,31 @@ def notify_pushover(msg: str):
     }), { "Content-type": "application/x-www-form-urlencoded" })
     conn.getresponse()
 
-container = LeagueContainer()
-container.init_resources()
-container.wire(modules=[__name__,  discord.bot_league_monitor])
+# render workers are spawned processes that import this module again, they mustn't start a bot
+if __name__ == "__main__":
+    container = LeagueContainer()
+    container.init_resources()
+    container.wire(modules=[__name__,  discord.bot_league_monitor])
 
 
-container2 = DbContainer()
-container2.init_resources()
-container2.wire(modules=[__name__, webserver.web, discord.bot_league_monitor])
+    container2 = DbContainer()
+    container2.init_resources()
+    container2.wire(modules=[__name__, webserver.web, discord.bot_league_monitor])
 
-random.seed()
+    random.seed()
 
-# main()
+    # main()
 
-web_server_thread = Thread(target = webserver.web.start)
-web_server_thread.start()
+    web_server_thread = Thread(target = webserver.web.start)
+    web_server_thread.start()
 
-notify_pushover("starting bot")
-retry_count = 0
-retry_max = 10
-while retry_count < retry_max:
-    monitor = discord.bot_league_monitor.run()
-    retry_count = retry_count + 1
-    time.sleep(retry_count*retry_count)
-    notify_pushover(f"failed, retry {retry_count}")
+    notify_pushover("starting bot")
+    retry_count = 0
+    retry_max = 10
+    while retry_count < retry_max:
+        monitor = discord.bot_league_monitor.run()
+        retry_count = retry_count + 1
+        time.sleep(retry_count*retry_count)
+        notify_pushover(f"failed, retry {retry_count}")
 
-notify_pushover(f"failed, exit")
\ No newline at end of file
+    notify_pushover(f"failed, exit")
\ No newline at end of file
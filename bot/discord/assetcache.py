@@ -0,0 +1,76 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import LRUCache
+from PIL import Image, ImageFont, ImageSequence
+
+
+class AssetCache():
+    """The images and fonts under bot/assets, decoded once per process instead of on every command.
+    Resized variants are kept by (asset, size) since each layout asks for the same few sizes.
+    Images are handed out as copies, callers draw on what they get. Fonts are shared as is,
+    drawing with one doesn't change it."""
+
+    assets_dir = os.path.dirname(__file__) + "/../assets/"
+    default_face = "Jersey M54.ttf"
+
+    lock = threading.Lock()
+    decoded: Dict[str, Image.Image] = {}
+    sized: LRUCache = LRUCache(maxsize=16)
+    animations: Dict[Tuple[str, bool], List[Image.Image]] = {}
+    fonts: Dict[Tuple[str, int], ImageFont.FreeTypeFont] = {}
+
+    @staticmethod
+    def original(name: str) -> Image.Image:
+        with AssetCache.lock:
+            image = AssetCache.decoded.get(name)
+        if image is None:
+            # a duplicate decode on a race is harmless, the second one just wins
+            with Image.open(AssetCache.assets_dir + name) as opened:
+                opened.load()
+                image = opened.copy()
+            with AssetCache.lock:
+                AssetCache.decoded[name] = image
+        return image
+
+    @staticmethod
+    def image(name: str, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        if size is None or tuple(size) == AssetCache.original(name).size:
+            return AssetCache.original(name).copy()
+        key = (name, tuple(size))
+        with AssetCache.lock:
+            image = AssetCache.sized.get(key)
+        if image is None:
+            image = AssetCache.original(name).resize(size)
+            with AssetCache.lock:
+                AssetCache.sized[key] = image
+        return image.copy()
+
+    @staticmethod
+    def frames(name: str, palette: bool = False) -> List[Image.Image]:
+        # pillow decodes gif frames after the first to RGB, palette=True has every frame back in P
+        # the way the gif encoder would quantize it, so unchanged frames can be written as they are
+        key = (name, palette)
+        with AssetCache.lock:
+            frames = AssetCache.animations.get(key)
+        if frames is None:
+            if palette:
+                frames = [frame if frame.mode == "P" else frame.convert("P", palette=Image.Palette.ADAPTIVE) for frame in AssetCache.frames(name)]
+            else:
+                with Image.open(AssetCache.assets_dir + name) as opened:
+                    frames = [frame.copy() for frame in ImageSequence.Iterator(opened)]
+            with AssetCache.lock:
+                AssetCache.animations[key] = frames
+        return [frame.copy() for frame in frames]
+
+    @staticmethod
+    def font(size: int, face: str = default_face) -> ImageFont.FreeTypeFont:
+        key = (face, size)
+        with AssetCache.lock:
+            font = AssetCache.fonts.get(key)
+        if font is None:
+            font = ImageFont.truetype(AssetCache.assets_dir + face, size)
+            with AssetCache.lock:
+                AssetCache.fonts[key] = font
+        return font
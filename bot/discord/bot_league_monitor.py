@@ -11,6 +11,8 @@ import asyncio
 import discord.ext
 import discord.ext.commands
 import sqlalchemy
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload, selectinload
 
 from discord.commands.torchdupes import DeleteDupeCards
 from discord.commands.torch import DeleteCard
@@ -31,37 +33,56 @@ from discord.repeattimer import RepeatTimer
 from discord.commands.addleague import AdminAddLeague
 from discord.commands.jackpot import ViewJackpot
 from discord.commands.viewmatches import ViewMatches
+from discord.commands.viewstats import ViewStats
 from discord.commands.coins import Coins
 from discord.commands.spin import Spin
 from discord.commands.gift import Gift
 from discord.commands.coin import Coin
 from discord.commands.addbooster import AdminAddBooster
-from models.models import Guild, LeagueUser, MatchPlayer, User, Match
+from models.models import Guild, LeagueUser, MatchPlayer, MatchResult, User, Match, Votes
 from discord.commands.discover import Discover
+from discord.commandrouter import CommandRouter
+from discord.drawutils import DrawUtils
 from league.leaguecontainer import LeagueContainer
-from models.dbcontainer import DbContainer, DbService
+from models.dbcontainer import AsyncDbService, DbContainer, DbService
+from models.balanceservice import BalanceService
+from models.membersync import MemberSync
+from models.matchresults import MatchResults
+from models.settlement import Payout, Settlement
+from models.statsaggregates import StatsAggregates
 from league.leagueservice import LeagueService
+from league.finishscheduler import FinishScheduler
+from league.pollscheduler import PollScheduler
 from dependency_injector.wiring import Provide, inject
 from envvars import Env
+from metrics import Metrics
 from discord.ext import commands
 import traceback
+from typing import List, Optional
 
 @inject
 class DiscordMonitorClient(commands.Bot):
     commands = []
+    router = CommandRouter()
+    poll_scheduler = PollScheduler()
+    finish_scheduler = FinishScheduler(use_spectator=Env.spectator_finish_check)
     @inject
-    def __init__(self, intents, dbservice: DbService = Provide[DbContainer.service], league_service: LeagueService = Provide[LeagueContainer.service]):
+    def __init__(self, intents, dbservice: DbService = Provide[DbContainer.service], async_dbservice: AsyncDbService = Provide[DbContainer.async_service], league_service: LeagueService = Provide[LeagueContainer.service]):
         super().__init__(intents=intents, command_prefix="b ")
+        # sync engine is for the timer threads, anything on the event loop uses async_db
         self.db = dbservice
+        self.async_db = async_dbservice
         self.league = league_service
 
     async def on_message(self, message: discord.Message):
         if message.author == self.user:
             return
-        for command in self.commands:
+        for command in self.router.route(message.content):
             try:
-                await command.process(self.get_context, message, self.db)
+                with Metrics.command_latency.labels(type(command).__name__).time():
+                    await command.process(self.get_context, message, self.async_db)
             except Exception as e: 
+                Metrics.command_errors.labels(type(command).__name__).inc()
                 print(e)
                 print(traceback.format_exc())
         if message.content.startswith("bran help"):
@@ -77,22 +98,39 @@ class DiscordMonitorClient(commands.Bot):
         await message.reply(output)
 
     async def setup_hook(self) -> None:
-        open_game_timer = RepeatTimer(30, self.look_for_open_games)
+        # app.py restarts the client on a fresh loop, asyncpg connections can't follow it there
+        await self.async_db.engine.dispose(close=False)
+        self.loop.create_task(Metrics.watch_loop_lag())
+        # start the render workers now rather than on the first inventory
+        self.loop.create_task(asyncio.to_thread(DrawUtils.render_backend.warm))
+
+        # ticks often but only polls players the scheduler says are due
+        open_game_timer = RepeatTimer(15, self.look_for_open_games)
         open_game_timer.start()
         
-        closed_game_timer = RepeatTimer(60, self.handle_finished_games)
+        # finish_scheduler decides which matches actually get checked on a tick
+        closed_game_timer = RepeatTimer(30, self.handle_finished_games)
         closed_game_timer.start()
 
         jackpot_trickle_timer = RepeatTimer(60*60, self.jackpot_trickle)
         jackpot_trickle_timer.start()
 
+        self.build_router()
+
+    def build_router(self):
+        # split from setup_hook so tools.bench_commands can drive on_message without the timers
         self.commands = [AdminAddLeague(), AdminAddBroadcast(),ViewPackCards(), AdminAddImage(), AdminAddCard(),
-                Discover(), 
                 Coin(), Gift(), Coins(), ViewJackpot(), Beg(), Spin(loop=self.loop, dbservice=self.db, ctx=self.get_context),
-                ViewMatches(), AddVote(), 
+                ViewMatches(), ViewStats(), AddVote(), 
                 Inventory(), ViewShop(), Buy(),
                 OpenPack(), ViewCard(), SelectCard(), DeleteCard(), DeleteDupeCards(), AdminAddBooster()]
 
+        # listeners see every message, prefixed commands only see their own
+        self.router = CommandRouter()
+        self.router.add_listener(Discover())
+        for command in self.commands:
+            self.router.add_command(command)
+
     async def on_ready(self):
         with self.db.Session() as session:
             all_league_users = session.query(LeagueUser).all()
@@ -108,43 +146,47 @@ class DiscordMonitorClient(commands.Bot):
             session.commit()
 
         for guild in self.guilds:
-            self.create_guild(guild)
-            self.populate_users(guild)
+            await self.create_guild(guild)
+            await self.populate_users(guild)
 
-    def populate_users(self, guild: discord.Guild):
-        with self.db.Session() as session:
-            for member in guild.members:
-                if session.query(User).filter(User.guild_id == str(guild.id), User.user_id == str(member.id)).count() == 0:
-                    user = User()
-                    user.guild_id = guild.id
-                    user.user_id = member.id
-                    session.add(user)
-                    print("adding new user")
-                else:
-                    print("user already exists")
-            session.commit()
+    async def populate_users(self, guild: discord.Guild):
+        async with self.async_db.Session() as session:
+            added = await MemberSync.sync_guild(session, guild.id, [member.id for member in guild.members])
+            await session.commit()
+        MemberSync.remember(guild.id, added)
+        print(f"{guild.id}: {len(guild.members)} members, {len(added)} new users")
 
-    def create_guild(self, guild: discord.Guild):
-        with self.db.Session() as session:
-            if session.query(Guild).filter(Guild.guild_id == str(guild.id)).count() == 0:
-                bank = Guild()
-                bank.guild_id = guild.id
-                bank.brancoins = 10
-                session.add(bank)
-                session.commit()
-            else:
-                print("guild entry already exists")
+    async def create_guild(self, guild: discord.Guild):
+        async with self.async_db.Session() as session:
+            if await MemberSync.ensure_guild(session, guild.id):
+                await session.commit()
+                print(f"{guild.id}: created guild entry")
+
+    async def on_guild_join(self, guild: discord.Guild):
+        await self.create_guild(guild)
+        await self.populate_users(guild)
+
+    async def on_member_join(self, member: discord.Member):
+        try:
+            async with self.async_db.Session() as session:
+                added = await MemberSync.add_member(session, member.guild.id, member.id)
+                if len(added) > 0:
+                    await session.commit()
+                    MemberSync.remember(member.guild.id, added)
+        except Exception as e:
+            print(e)
+            print(traceback.format_exc())
 
     def jackpot_trickle(self):
         try:
             print("trickle")
+            print(self.poll_scheduler.stats())
             with self.db.Session() as session: 
                 guilds = session.query(Guild).all()
                 for guild in guilds:
                     jackpot_soft_cap = math.ceil(ViewJackpot.upper_class_wealth(session, str(guild.guild_id)) * 0.1)
-                    if guild.brancoins < jackpot_soft_cap:
-                        guild.brancoins += math.ceil(jackpot_soft_cap * 0.08)
-                        session.add(guild)
+                    # the cap is checked in the update itself so a spin landing mid tick isn't overwritten
+                    BalanceService.add_to_jackpot_sync(session, guild.guild_id, math.ceil(jackpot_soft_cap * 0.08), below=jackpot_soft_cap)
                 session.commit()
         except Exception as e: 
             print(e)
@@ -155,64 +197,78 @@ class DiscordMonitorClient(commands.Bot):
         with self.db.Session() as session: 
             open_matches = session.query(Match).filter(Match.finished == False).all()
             for open_match in open_matches:
+                phase = self.finish_scheduler.due(open_match.match_id, open_match.match_type, open_match.start_time.timestamp())
+                if phase is None:
+                    continue
+                if phase == "spectator":
+                    try:
+                        game_length = self.league.get_live_game_length(open_match)
+                    except Exception as e:
+                        print(e)
+                        self.finish_scheduler.retry_later(open_match.match_id)
+                        continue
+                    if game_length is not None:
+                        print(f"match {open_match.match_id} still going at {game_length}s")
+                        self.finish_scheduler.still_playing(open_match.match_id, game_length)
+                        continue
+                    self.finish_scheduler.left_game(open_match.match_id)
+
                 print("checking if match closed yet")
-                results = self.league.get_game(open_match)
-                if results is not None:
+                # already archived if a backfill got to it first, or a crash cut settlement short
+                result = MatchResults.load_sync(session, open_match.match_id)
+                if result is None:
+                    results = self.league.get_game(open_match)
+                    summary = results['extra_data'].get('summary') if results is not None else None
+                    if results is not None and summary is None:
+                        print(f"match {open_match.match_id} is over but none of our players are in it")
+                    if summary is not None:
+                        result = MatchResults.store_sync(session, open_match.match_id, summary)
+                if result is not None:
                     print("match closed!")
-                    self.process_votes(session, open_match, results)
-                    open_match.finished = True
-                    session.add(open_match)
+                    payouts = self.process_votes(session, open_match, result)
                     session.commit()
+                    self.poll_scheduler.mark_game_over([match_player.league_user_id for match_player in open_match.match_players])
+                    self.finish_scheduler.finished(open_match.match_id)
+                    if payouts is None:
+                        print(f"match {open_match.match_id} was already settled")
+                        continue
                     
                     # we're in a side thread, to output to discord we need to post to the asyncio looper
                     # session can't carryover :(
-                    asyncio.run_coroutine_threadsafe(self.output_votes_results(open_match.match_id, results), self.loop)
+                    asyncio.run_coroutine_threadsafe(self.output_votes_results(result.our_team_won, payouts), self.loop)
                 else:
                     print("match is not closed")
+                    self.finish_scheduler.not_finished(open_match.match_id)
 
-    def process_votes(self, session, match: Match, results):
-        we_win = results['extra_data']['our_team_won']
-        for vote in match.votes:
-            if vote.type_of_vote == VoteType.WIN.value or vote.type_of_vote == VoteType.LOSE.value:
-                if vote.type_of_vote == VoteType.WIN.value and we_win:
-                    vote.voter.brancoins += vote.brancoins * 2
-                elif vote.type_of_vote == VoteType.LOSE.value and we_win == False:
-                    vote.voter.brancoins += vote.brancoins * 2
-                vote.processed = True
-                session.add(vote)
-        if we_win:
-            for match_player in match.match_players:
-                match_player.league_user.discord_user.brancoins += 50
-                session.add(match_player)
+    def process_votes(self, session, match: Match, result: MatchResult) -> Optional[List[Payout]]:
+        # also marks the match finished, see Settlement
+        payouts = Settlement.settle_sync(session, match.match_id, result.our_team_won)
+        if payouts is not None:
+            StatsAggregates.record_match_sync(session, match.match_id)
+        return payouts
 
-    async def output_votes_results(self, match_id: str, results):
+    async def output_votes_results(self, we_win: bool, payouts: List[Payout]):
         try:
-            with self.db.Session() as session:
+            async with self.async_db.Session() as session:
                 output = ""
-                match = session.query(Match).filter(Match.match_id == match_id).first()
-                we_win = results['extra_data']['our_team_won']
                 if we_win:
                     output += "The boys were victorious!"
                 else:
                     output += "These idiots lost."
-                for vote in match.votes:
-                    print(vote)
-                    guy = await self.fetch_user(vote.voter.user_id)
-                    if vote.type_of_vote == VoteType.WIN.value or vote.type_of_vote == VoteType.LOSE.value:
-                        if vote.type_of_vote == VoteType.WIN.value:
-                            if we_win:
-                                output += f"{guy.display_name } won {vote.brancoins} because the squad won their game! ::tada: :tada: :tada: \n"
-                            else:
-                                output += f"{guy.display_name } lost {vote.brancoins} ... don't know why you put your faith in clowns... :clown:  :clown:  :clown: \n"
-                        elif vote.type_of_vote == VoteType.LOSE.value:
-                            if we_win == False:
-                                output += f"{guy.display_name } won {vote.brancoins} because the squad is curzed! :tada: :tada: :tada: \n"
-                            else:
-                                output += f"{guy.display_name } lost {vote.brancoins} ... why didn't you believe in da boiz :clown:  :clown:  :clown: \n"
-                if we_win:    
-                    for match_player in match.match_players:
-                        guy = await self.fetch_user(match_player.league_user.discord_user.user_id)
-                        output += f"{guy.display_name} made 50 for winning ! :tada: \n"
+                for payout in payouts:
+                    guy = await self.fetch_user(payout.user_id)
+                    if payout.kind == "player":
+                        output += f"{guy.display_name} made {payout.brancoins} for winning ! :tada: \n"
+                    elif payout.type_of_vote == VoteType.WIN.value:
+                        if payout.won:
+                            output += f"{guy.display_name } won {payout.brancoins} because the squad won their game! ::tada: :tada: :tada: \n"
+                        else:
+                            output += f"{guy.display_name } lost {payout.brancoins} ... don't know why you put your faith in clowns... :clown:  :clown:  :clown: \n"
+                    elif payout.type_of_vote == VoteType.LOSE.value:
+                        if payout.won:
+                            output += f"{guy.display_name } won {payout.brancoins} because the squad is curzed! :tada: :tada: :tada: \n"
+                        else:
+                            output += f"{guy.display_name } lost {payout.brancoins} ... why didn't you believe in da boiz :clown:  :clown:  :clown: \n"
                 await self.broadcast_all_str(session, output)
         except Exception as e: 
             print(e)
@@ -224,7 +280,19 @@ class DiscordMonitorClient(commands.Bot):
         try:
             with self.db.Session() as session:
                 trackable_users = session.query(LeagueUser).filter(LeagueUser.trackable == True).all()
-                valid_games = self.league.get_valid_games(trackable_users, trackable_users)
+                if not self.poll_scheduler.seeded:
+                    last_seen = session.query(MatchPlayer.league_user_id, func.max(Match.start_time)).join(MatchPlayer.match).group_by(MatchPlayer.league_user_id).all()
+                    self.poll_scheduler.seed({league_user_id: start_time.timestamp() for league_user_id, start_time in last_seen})
+                # already in a game we're tracking, handle_finished_games takes it from here
+                busy_ids = [league_user_id for (league_user_id,) in session.query(MatchPlayer.league_user_id).join(MatchPlayer.match).filter(Match.finished == False).all()]
+                due_users = self.poll_scheduler.due(trackable_users, busy_ids)
+                print(f"polling {len(due_users)} of {len(trackable_users)} trackable players")
+                if len(due_users) == 0:
+                    return
+                valid_games, answered = self.league.get_valid_games(due_users, trackable_users)
+                # only back off players spectator answered for, the rest stay due for the next tick
+                self.poll_scheduler.mark_polled([league_user.id for league_user in due_users if league_user.puuid in answered])
+                self.poll_scheduler.mark_in_game([participant['league_user'].id for valid_game in valid_games for participant in valid_game['valid_participants']])
                 fresh_game_added = False
                 for valid_game in valid_games:
                     print("valid game found")
@@ -241,6 +309,7 @@ class DiscordMonitorClient(commands.Bot):
                     if session.query(Match).filter(Match.match_id == str(match.match_id)).count() == 0:
                         fresh_game_added = True
                         session.add(match)
+                        self.finish_scheduler.track(match.match_id, match.match_type, FinishScheduler.game_start(valid_game['spectator_data']))
                         print("adding valid game")
                     else:
                         print("game was already tracked")
@@ -256,8 +325,8 @@ class DiscordMonitorClient(commands.Bot):
     
     async def broadcast_open_matches(self):
         try:
-            with self.db.Session() as session:
-                open_matches = session.query(Match).filter(Match.finished == False).all()
+            async with self.async_db.Session() as session:
+                open_matches = (await session.scalars(ViewMatches.open_matches_query())).all()
                 for open_match in open_matches:
                     embedVar = await ViewMatches.generate_embed_for_match(open_match, self)
                     await self.broadcast_all(session, embedVar)
@@ -267,13 +336,13 @@ class DiscordMonitorClient(commands.Bot):
             print(traceback.format_exc())
 
     async def broadcast_all(self, session, embed: discord.Embed):
-        guilds = session.query(Guild).filter(Guild.broadcast_channel_id != None).all()
+        guilds = (await session.scalars(select(Guild).filter(Guild.broadcast_channel_id != None))).all()
         for guild in guilds:
             broadcast_channel = await self.fetch_channel(guild.broadcast_channel_id)
             await broadcast_channel.send(embed=embed)
 
     async def broadcast_all_str(self, session, msg):
-        guilds = session.query(Guild).filter(Guild.broadcast_channel_id != None).all()
+        guilds = (await session.scalars(select(Guild).filter(Guild.broadcast_channel_id != None))).all()
         for guild in guilds:
             broadcast_channel = await self.fetch_channel(guild.broadcast_channel_id)
             if guild.broadcast_role_id != None:
@@ -0,0 +1,60 @@
+from typing import Dict, List, Optional
+from discord.basecommand import BaseCommand
+
+
+class PrefixNode():
+    __slots__ = ("children", "command")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "PrefixNode"] = {}
+        self.command: Optional[BaseCommand] = None
+
+
+class CommandRouter():
+    """Indexes command prefixes in a token trie so each message is tokenized once
+    and handed to at most one prefixed command, plus any all-messages listeners."""
+
+    def __init__(self) -> None:
+        self.root = PrefixNode()
+        self.listeners: List[BaseCommand] = []
+        self.heads: tuple = ()
+        self.head_len = 0
+        self.max_depth = 0
+
+    def add_command(self, command: BaseCommand):
+        tokens = command.prefix.lower().split()
+        node = self.root
+        for token in tokens:
+            node = node.children.setdefault(token, PrefixNode())
+        if node.command is not None:
+            raise ValueError(f"prefix '{command.prefix}' registered twice")
+        node.command = command
+        self.max_depth = max(self.max_depth, len(tokens))
+        self.heads = tuple(self.root.children.keys())
+        self.head_len = max(len(head) for head in self.heads)
+
+    def add_listener(self, command: BaseCommand):
+        self.listeners.append(command)
+
+    def match(self, content: str) -> Optional[BaseCommand]:
+        # fast reject, nearly all chatter doesn't start with "bran"
+        if not content[:self.head_len].lower().startswith(self.heads):
+            return None
+
+        # only split off as many tokens as the deepest prefix needs
+        tokens = content.split(None, self.max_depth)[:self.max_depth]
+        node = self.root
+        found = None
+        for token in tokens:
+            node = node.children.get(token.lower())
+            if node is None:
+                break
+            if node.command is not None:
+                found = node.command
+        return found
+
+    def route(self, content: str) -> List[BaseCommand]:
+        command = self.match(content)
+        if command is None:
+            return self.listeners
+        return self.listeners + [command]
@@ -1,7 +1,8 @@
 
 import shlex
 from discord import Message
-from models.dbcontainer import DbService
+from sqlalchemy import select
+from models.dbcontainer import AsyncDbService
 from models.models import BoosterCard, BoosterSegment, Card, Guild, Image
 from discord.basecommand import BaseCommand
 
@@ -9,7 +10,7 @@ class AdminAddBooster(BaseCommand):
     prefix = "bran addbooster"
     usage = prefix + " \"pack\" \"segment\" card_id chance \n bran addbooster ls"
     admin = 114930910884790276
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
@@ -20,8 +21,8 @@ class AdminAddBooster(BaseCommand):
         command_breakdown = shlex.split(message.content)
 
         if "ls" in command_breakdown[2].lower():
-            with dbservice.Session() as session: 
-                segments = session.query(BoosterSegment).all()
+            async with dbservice.Session() as session: 
+                segments = (await session.scalars(select(BoosterSegment))).all()
                 output = ""
                 for segment in segments:
                     output = output + segment.booster_pack_id + ":" + segment.id +  "\n"
@@ -38,12 +39,12 @@ class AdminAddBooster(BaseCommand):
         booster_card.booster_segment_id = seg
         booster_card.chance = chance
 
-        with dbservice.Session() as session: 
-            card = session.query(Card).filter(Card.id == card_id).first()
+        async with dbservice.Session() as session: 
+            card = await session.get(Card, card_id)
             if not card:
                 await message.reply("Card not found")
                 return
             booster_card.card = card
             session.add(booster_card)
-            session.commit()
+            await session.commit()
             await message.reply("done")
\ No newline at end of file
@@ -1,6 +1,8 @@
 
 from discord import Message
-from models.dbcontainer import DbService
+from sqlalchemy import select
+from models.dbcontainer import AsyncDbService
+from models.identitycache import IdentityCache
 from models.models import Guild
 from discord.basecommand import BaseCommand
 
@@ -8,7 +10,7 @@ class AdminAddBroadcast(BaseCommand):
     prefix = "bran broadcast"
     usage = prefix
     admin = 114930910884790276
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
@@ -19,10 +21,11 @@ class AdminAddBroadcast(BaseCommand):
         new_broadcast_channel_id = message.channel.id
         new_broadcast_role = message.role_mentions[0] if len(message.role_mentions) > 0 else None
 
-        with dbservice.Session() as session: 
-            guild = session.query(Guild).filter(Guild.guild_id==str(message.guild.id)).first()
+        async with dbservice.Session() as session: 
+            guild = await session.scalar(select(Guild).filter(Guild.guild_id==str(message.guild.id)))
             guild.broadcast_channel_id = str(new_broadcast_channel_id)
             guild.broadcast_role_id = str(new_broadcast_role.id)
             session.add(guild)
-            session.commit()
+            await session.commit()
+            IdentityCache.invalidate_guild(message.guild.id)
             await message.reply("joever")
\ No newline at end of file
@@ -3,8 +3,10 @@
 import shlex
 from discord import Message
 import discord
+from sqlalchemy import select
+from sqlalchemy.orm import undefer
 from discord.drawutils import DrawUtils
-from models.dbcontainer import DbService
+from models.dbcontainer import AsyncDbService
 from models.models import Card, Guild, Image
 from discord.basecommand import BaseCommand
 
@@ -12,7 +14,7 @@ class AdminAddCard(BaseCommand):
     prefix = "bran addcard"
     usage = prefix + ' [save=True/False] [title="Title"] [description="desc"] [level] [atk] [defe] [card_style=normal] [attribute=Earth] [type="Monster/Cool"] [image_label] [cost] [shoppable = True/False]' 
     admin = 114930910884790276
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
@@ -38,12 +40,12 @@ class AdminAddCard(BaseCommand):
         card.shoppable = bool(command_breakdown[13] == "True")
 
         if save:
-            with dbservice.Session() as session: 
+            async with dbservice.Session() as session: 
                 session.add(card)
-                session.commit()
+                await session.commit()
                 await message.reply(f"done {card.id}")
         else:
-            with dbservice.Session() as session: 
-                card.image = session.query(Image).filter(Image.label == card.image_label).first()
-            await message.reply(file=discord.File(DrawUtils.card_to_byte_image(card), filename="preview.png"))
+            async with dbservice.Session() as session: 
+                card.image = await session.scalar(select(Image).options(undefer(Image.bin)).filter(Image.label == card.image_label))
+            await message.reply(file=discord.File(await DrawUtils.card_png(card), filename="preview.png"))
             
\ No newline at end of file
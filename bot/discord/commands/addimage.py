@@ -1,6 +1,6 @@
 
 from discord import Message
-from models.dbcontainer import DbService
+from models.dbcontainer import AsyncDbService
 from models.models import Guild, Image
 from discord.basecommand import BaseCommand
 
@@ -8,7 +8,7 @@ class AdminAddImage(BaseCommand):
     prefix = "bran addimage"
     usage = prefix + " label"
     admin = 114930910884790276
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
@@ -22,7 +22,7 @@ class AdminAddImage(BaseCommand):
         image.label = str(command_breakdown[2]) 
         image.bin = await message.attachments[0].read()
 
-        with dbservice.Session() as session: 
+        async with dbservice.Session() as session: 
             session.add(image)
-            session.commit()
+            await session.commit()
             await message.reply("done")
\ No newline at end of file
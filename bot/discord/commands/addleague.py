@@ -1,9 +1,11 @@
 
 
 from re import A
+import asyncio
 from discord import Message
 import discord
-from models.dbcontainer import DbService
+from models.dbcontainer import AsyncDbService
+from models.identitycache import IdentityCache
 from models.models import LeagueUser, User
 from discord.basecommand import BaseCommand
 from discord.ext.commands import Bot
@@ -20,7 +22,7 @@ class AdminAddLeague(BaseCommand):
     def __init__(self, league_service: LeagueService = Provide[LeagueContainer.service]):
         self.league_service = league_service
 
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
@@ -66,8 +68,8 @@ class AdminAddLeague(BaseCommand):
 
 
 
-        with dbservice.Session() as session: 
-            target_user_account = session.query(User).filter(User.guild_id==str(message.guild.id), User.user_id == str(tagged_user.id)).first()
+        async with dbservice.Session() as session: 
+            target_user_account = await IdentityCache.get_user(session, tagged_user.id, message.guild.id)
             league_entry = LeagueUser()
             league_entry.discord_user = target_user_account
             league_entry.summoner_name = league_name
@@ -75,7 +77,8 @@ class AdminAddLeague(BaseCommand):
             league_entry.trackable = tracking
             league_entry.voteable = voting
 
-            puuid = self.league_service.get_puuid(league_entry)
+            # the gateway may queue behind the rate limit, keep that off the event loop
+            puuid = await asyncio.to_thread(self.league_service.get_puuid, league_entry)
             if puuid:
                 league_entry.puuid = puuid
             else:
@@ -83,6 +86,6 @@ class AdminAddLeague(BaseCommand):
                 return
 
             session.add(league_entry)
-            session.commit()
+            await session.commit()
             
             await message.reply("donezo")
\ No newline at end of file
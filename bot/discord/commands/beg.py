@@ -1,6 +1,7 @@
 from discord import Message
-from models.dbcontainer import DbService
-from models.models import User
+from models.dbcontainer import AsyncDbService
+from models.balanceservice import BalanceService
+from models.identitycache import IdentityCache
 from discord.basecommand import BaseCommand
 
 
@@ -8,14 +9,15 @@ class Beg(BaseCommand):
     prefix = "bran uwu pwease gimme"
     usage = prefix
     dum_cache = []
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
-        with dbservice.Session() as session: 
-            guy = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
-            if guy and guy.brancoins <= 0  and guy.id not in self.dum_cache:
-                guy.brancoins = 10
-                session.add(guy)
-                session.commit()
-                self.dum_cache.append(guy.id)
-                await message.reply(f"Enjoy, you brokie \n {self.custom_emoji * 10}")
\ No newline at end of file
+        async with dbservice.Session() as session: 
+            guy_id = await IdentityCache.user_pk(session, message.author.id, message.guild.id)
+            if guy_id is None or guy_id in self.dum_cache:
+                return
+            topped_up = await BalanceService.top_up(session, guy_id, 10)
+            await session.commit()
+        if topped_up is not None:
+            self.dum_cache.append(guy_id)
+            await message.reply(f"Enjoy, you brokie \n {self.custom_emoji * 10}")
\ No newline at end of file
@@ -7,7 +7,11 @@ from discord import Message
 import discord
 import discord.ext
 import discord.ext.commands
-from models.dbcontainer import DbService
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager
+from models.dbcontainer import AsyncDbService
+from models.balanceservice import BalanceService
+from models.identitycache import IdentityCache
 from models.models import Card, Guild, OwnedCard, Shop, User
 from discord.basecommand import BaseCommand
 import random
@@ -17,30 +21,29 @@ class Buy(BaseCommand):
     prefix = "bran buy"
     usage = prefix + " [1/2/3/4]"
 
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
         command_breakdown = message.content.split()
         shop_idx = int(command_breakdown[2]) 
-        with dbservice.Session() as session: 
-            source = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
-            shop = session.query(Shop).join(Card, Shop.card).filter(Shop.date_added == datetime.date.today()).order_by(Card.cost.asc(), Card.id.asc()).all()
+        async with dbservice.Session() as session: 
+            source_id = await IdentityCache.user_pk(session, message.author.id, message.guild.id)
+            shop = (await session.scalars(select(Shop).join(Card, Shop.card).options(contains_eager(Shop.card)).filter(Shop.date_added == datetime.date.today()).order_by(Card.cost.asc(), Card.id.asc()))).all()
             selected_shop_item: Shop = shop[shop_idx - 1]
 
-            if source.brancoins < selected_shop_item.card.cost:
-                await message.reply("You broke son")
-                return
+            remaining = await BalanceService.debit(session, source_id, selected_shop_item.card.cost)
+            if remaining is not None:
+                ownedcard = OwnedCard()
+                ownedcard.card = selected_shop_item.card
+                ownedcard.owner_id = source_id
+                session.add(ownedcard)
+                await session.commit()
 
-            ownedcard = OwnedCard()
-            ownedcard.card = selected_shop_item.card
-            source.owned_cards.append(ownedcard)
-            source.brancoins -= selected_shop_item.card.cost
-            session.add(source)
-            
-            session.commit()
-
-            await message.reply(f"Congrats on the new card! {self.custom_emoji}")
+        if remaining is None:
+            await message.reply("You broke son")
+            return
+        await message.reply(f"Congrats on the new card! {self.custom_emoji}")
         
         
             
\ No newline at end of file
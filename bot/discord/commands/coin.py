@@ -2,7 +2,9 @@
 
 from discord import Message
 import discord
-from models.dbcontainer import DbService
+from sqlalchemy.orm import selectinload
+from models.dbcontainer import AsyncDbService
+from models.identitycache import IdentityCache
 from models.models import User
 from discord.basecommand import BaseCommand
 
@@ -10,12 +12,12 @@ from discord.basecommand import BaseCommand
 class Coin(BaseCommand):
     prefix = "bran coin"
     usage = prefix
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
-        with dbservice.Session() as session: 
-            guy = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
+        async with dbservice.Session() as session: 
+            guy = await IdentityCache.get_user(session, message.author.id, message.guild.id, options=[selectinload(User.league_users)])
             if guy:
                 embedVar = discord.Embed(title="Brancoins", description="", color=0xffcccc)
                 embedVar.set_author(name=message.author.nick, icon_url=message.author.display_avatar.url)
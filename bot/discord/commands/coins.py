@@ -2,7 +2,8 @@
 
 from discord import Message
 import discord
-from models.dbcontainer import DbService
+from sqlalchemy import select
+from models.dbcontainer import AsyncDbService
 from models.models import User
 from discord.basecommand import BaseCommand
 from discord.ext.commands import Bot
@@ -12,12 +13,12 @@ class Coins(BaseCommand):
     prefix = "bran board"
     usage = prefix
     lim = 10
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
-        with dbservice.Session() as session: 
-            top_users = session.query(User).filter(User.guild_id==str(message.guild.id)).order_by(User.brancoins.desc()).limit(self.lim).all()
+        async with dbservice.Session() as session: 
+            top_users = (await session.scalars(select(User).filter(User.guild_id==str(message.guild.id)).order_by(User.brancoins.desc()).limit(self.lim))).all()
             context = await ctx(message)
             bot: Bot = context.bot
 
@@ -3,18 +3,18 @@ from mimetypes import guess_type
 import random
 
 from discord import Message
-from models.dbcontainer import DbService
-from models.models import User
+from models.dbcontainer import AsyncDbService
+from models.balanceservice import BalanceService
+from models.identitycache import IdentityCache
 from discord.basecommand import BaseCommand
 
 
 class Discover(BaseCommand):
     chance_of_free_coin = 1 / 25
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if random.uniform(0, 1) < self.chance_of_free_coin:
-            with dbservice.Session() as session: 
-                guy = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
-                guy.brancoins = guy.brancoins + 1
-                session.add(guy)
-                session.commit()
+            async with dbservice.Session() as session: 
+                guy_id = await IdentityCache.user_pk(session, message.author.id, message.guild.id)
+                await BalanceService.credit(session, guy_id, 1)
+                await session.commit()
             await message.add_reaction(self.custom_emoji)   
\ No newline at end of file
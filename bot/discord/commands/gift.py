@@ -4,8 +4,9 @@ from discord import Message
 import discord
 import discord.ext
 import discord.ext.commands
-from models.dbcontainer import DbService
-from models.models import User
+from models.dbcontainer import AsyncDbService
+from models.balanceservice import BalanceService
+from models.identitycache import IdentityCache
 from discord.basecommand import BaseCommand
 import random
 
@@ -14,7 +15,7 @@ class Gift(BaseCommand):
     freebie_chance = 1/30
     prefix = "bran gift"
     usage = f"{prefix} [user] [num]"
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         command_breakdown = message.content.split()
@@ -34,23 +35,22 @@ class Gift(BaseCommand):
             await message.reply("How many coin???")
             return
         
-        with dbservice.Session() as session: 
-            source = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
-            dest = session.query(User).filter(User.user_id == str(tagged_user.id), User.guild_id == str(message.guild.id)).first()
-
-            if source.brancoins < num:
-                await message.reply("You ain't got the facilities for that big man")
+        async with dbservice.Session() as session: 
+            source_id = await IdentityCache.user_pk(session, message.author.id, message.guild.id)
+            dest_id = await IdentityCache.user_pk(session, tagged_user.id, message.guild.id)
+            if source_id is None or dest_id is None:
+                await message.reply("Who?")
                 return
 
-            if not is_freebie:
-                source.brancoins -= num
-            dest.brancoins += num
-            session.add(source)
-            session.add(dest)
-            session.commit()
-            
-            if not is_freebie:
-                await message.reply(f"Transfered {num} {self.custom_emoji} to {tagged_user.mention}")
-            else:
-                await message.reply(f"Transfered {num} {self.custom_emoji} to {tagged_user.mention}\nThe great Vivian Octave smiles upon you!!!\n :maracas::maracas: This gift will be granted for free! :maracas: :maracas:")
+            remaining = await BalanceService.transfer(session, source_id, dest_id, num, free=is_freebie)
+            await session.commit()
+
+        if remaining is None:
+            await message.reply("You ain't got the facilities for that big man")
+            return
+
+        if not is_freebie:
+            await message.reply(f"Transfered {num} {self.custom_emoji} to {tagged_user.mention}")
+        else:
+            await message.reply(f"Transfered {num} {self.custom_emoji} to {tagged_user.mention}\nThe great Vivian Octave smiles upon you!!!\n :maracas::maracas: This gift will be granted for free! :maracas: :maracas:")
             
\ No newline at end of file
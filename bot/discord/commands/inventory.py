@@ -1,13 +1,15 @@
 
 
-from io import BytesIO
 import math
 from typing import List
 from discord import Message
 import discord
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 from discord.drawutils import DrawUtils
-from models.dbcontainer import DbService
-from models.models import Card, User
+from models.dbcontainer import AsyncDbService
+from models.identitycache import IdentityCache
+from models.models import Card, OwnedCard, User
 from discord.basecommand import BaseCommand
 from PIL import Image
 
@@ -15,12 +17,12 @@ from PIL import Image
 class Inventory(BaseCommand):
     prefix = "bran inv"
     usage = prefix
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
-        with dbservice.Session() as session: 
-            guy = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
+        async with dbservice.Session() as session: 
+            guy = await IdentityCache.get_user(session, message.author.id, message.guild.id, options=Inventory.owned_card_options())
             if guy:
                 cards = []
                 for owned_card in guy.owned_cards:
@@ -29,6 +31,7 @@ class Inventory(BaseCommand):
                 if(len(cards) <= 0):
                     await message.reply("No cards")
                     return
+                await DrawUtils.preload_images(session, cards)
 
                 max_x = 6
                 max_y = 4
@@ -49,13 +52,16 @@ class Inventory(BaseCommand):
                         img_size = (1600, 1600)
                     print(img_size)
                     inv_img = await DrawUtils.draw_inv_card_spread(card_page, img_size , grid, draw_blanks=True, draw_idx=True, idx_offset=idx_counter)
-                    buffered = BytesIO()
-                    inv_img.save(buffered, format="PNG")
-                    discord_files.append(discord.File(BytesIO(buffered.getvalue()), filename=f"page{idx}.png"))
+                    discord_files.append(discord.File(inv_img, filename=f"page{idx}.png"))
                     idx_counter += len(card_page)
                 await message.reply(f"Inventory:", files=discord_files)
             else:
                 await message.reply("Who are you?")
 
+    @staticmethod
+    def owned_card_options():
+        # constant number of queries however big the inventory is, Image.bin stays deferred
+        return [selectinload(User.owned_cards).selectinload(OwnedCard.card).selectinload(Card.image)]
+
     def split(self, arr, size):
         return [arr[i:i+size] for i in range(0,len(arr),size)]
\ No newline at end of file
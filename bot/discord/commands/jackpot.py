@@ -4,7 +4,8 @@ import cachetools
 from cachetools.keys import hashkey
 from discord import Message
 import discord
-from models.dbcontainer import DbService
+from sqlalchemy import select
+from models.dbcontainer import AsyncDbService
 from models.models import Guild, Match, User
 from discord.basecommand import BaseCommand
 from discord.ext.commands import Bot
@@ -13,12 +14,12 @@ from discord.ext.commands import Bot
 class ViewJackpot(BaseCommand):
     prefix = "bran jackpot"
     usage = prefix
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
-        with dbservice.Session() as session: 
-            guild = session.query(Guild).filter(Guild.guild_id == str(message.guild.id)).first()
+        async with dbservice.Session() as session: 
+            guild = await session.scalar(select(Guild).filter(Guild.guild_id == str(message.guild.id)))
             await message.reply(f"Jackpot is currently {guild.brancoins} {self.custom_emoji}")
 
     @staticmethod
@@ -3,7 +3,6 @@
 from asyncio import Semaphore
 import asyncio
 import datetime
-from io import BytesIO
 import math
 from typing import List
 import PIL
@@ -11,8 +10,12 @@ from discord import Message
 import discord
 import discord.ext
 import discord.ext.commands
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 from discord.drawutils import DrawUtils
-from models.dbcontainer import DbService
+from models.dbcontainer import AsyncDbService
+from models.balanceservice import BalanceService
+from models.identitycache import IdentityCache
 from models.models import BoosterCard, BoosterPack, BoosterSegment, Card, Guild, OwnedCard, Shop, User
 from discord.basecommand import BaseCommand
 import random
@@ -21,34 +24,33 @@ class OpenPack(BaseCommand):
     prefix = "bran buypack"
     usage = prefix + " [pack_name]"
 
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
         command_breakdown = message.content.split()
         pack_name = str(command_breakdown[2]) 
-        with dbservice.Session() as session: 
-            user = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
-            pack = session.query(BoosterPack).filter(BoosterPack.id == pack_name).first()
+        async with dbservice.Session() as session: 
+            user_id = await IdentityCache.user_pk(session, message.author.id, message.guild.id)
+            pack = await session.scalar(OpenPack.pack_query(pack_name))
             if pack is None:
                 await message.reply("can't find pack with that name")
                 return
 
-            if user.brancoins < pack.cost:
+            if await BalanceService.debit(session, user_id, pack.cost) is None:
                 await message.reply("You broke son")
                 return
             
             drawn_card_segments = self.draw_cards_from_pack(pack)
+            await DrawUtils.preload_images(session, [card for segment in drawn_card_segments for card in segment[1]])
             for drawn_card_segment in drawn_card_segments:
                 for drawn_card in drawn_card_segment[1]:
                     owned_card = OwnedCard()
                     owned_card.card = drawn_card
-                    user.owned_cards.append(owned_card)
+                    owned_card.owner_id = user_id
+                    session.add(owned_card)
 
-            user.brancoins -= pack.cost
-
-            session.add(user)
-            session.commit()
+            await session.commit()
 
             
             await message.reply(f"Opening a {pack_name} pack!")
@@ -59,6 +61,10 @@ class OpenPack(BaseCommand):
 
             await message.reply(f"Congrats on the new cards!")
 
+    @staticmethod
+    def pack_query(pack_name: str):
+        return select(BoosterPack).options(selectinload(BoosterPack.booster_segments).selectinload(BoosterSegment.booster_cards).selectinload(BoosterCard.card).selectinload(Card.image)).filter(BoosterPack.id == pack_name)
+
     async def display_segment(self, segment: BoosterSegment, cards: List[Card]):
         bg = "boostermat.jpeg" if segment.bg_fname == None else segment.bg_fname
         return await self.card_spread(cards, bg)
@@ -69,9 +75,7 @@ class OpenPack(BaseCommand):
         for idx, card_page in enumerate(card_pages):      
             grid = (len(card_page), 1)
             inv_img = await DrawUtils.draw_inv_card_spread(card_page,  (1400, 400), grid, draw_blanks=True, bg=bg)
-            buffered = BytesIO()
-            inv_img.save(buffered, format="PNG")
-            discord_files.append(discord.File(BytesIO(buffered.getvalue()), filename=f"page{idx}.png"))
+            discord_files.append(discord.File(inv_img, filename=f"page{idx}.png"))
         return discord_files
         
     def draw_cards_from_pack(self, pack: BoosterPack) -> List[tuple[BoosterSegment, List[Card]]]:
@@ -5,10 +5,12 @@ import math
 from typing import List
 from discord import Message
 import discord
+from discord.commands.inventory import Inventory
 from discord.commands.viewcard import ViewCard
 from discord.drawutils import DrawUtils
-from models.dbcontainer import DbService
-from models.models import Card, User
+from models.dbcontainer import AsyncDbService
+from models.identitycache import IdentityCache
+from models.models import Card, OwnedCard, User
 from discord.basecommand import BaseCommand
 from PIL import Image
 
@@ -16,14 +18,14 @@ from PIL import Image
 class SelectCard(BaseCommand):
     prefix = "bran summon"
     usage = prefix + " [1/2/3/'some title'/'some desc']"
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
         command_breakdown = message.content.split()
         
-        with dbservice.Session() as session: 
-            guy = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
+        async with dbservice.Session() as session: 
+            guy = await IdentityCache.get_user(session, message.author.id, message.guild.id, options=Inventory.owned_card_options())
             
             selected_card = None
             if self.represents_int(command_breakdown[2]):
@@ -31,10 +33,12 @@ class SelectCard(BaseCommand):
                 if guy and card_idx < len(guy.owned_cards):
                     selected_card = guy.owned_cards[card_idx].card
             else:
-                selected_card = ViewCard.find_card_by_text(session, guy, message.content.removeprefix(self.prefix)).card
+                owned_card = await ViewCard.find_card_by_text(session, guy, message.content.removeprefix(self.prefix))
+                selected_card = owned_card.card if owned_card else None
 
             if selected_card is not None:
-                file = discord.File(DrawUtils.summon(selected_card), filename=f"summon.gif")
+                await DrawUtils.preload_images(session, [selected_card])
+                file = discord.File(await DrawUtils.summon(selected_card), filename=f"summon.{DrawUtils.summon_format}")
                 await message.reply(f"Behold! I'll activate {selected_card.title}!!!", file=file)
             else:
                 await message.reply("???")
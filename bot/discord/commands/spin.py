@@ -12,7 +12,9 @@ import discord.ext
 import discord.ext.commands
 from discord.commands.jackpot import ViewJackpot
 from discord.CardBonusType import CardBonusType
-from models.dbcontainer import DbService
+from models.dbcontainer import AsyncDbService, DbService
+from models.balanceservice import BalanceService
+from models.identitycache import IdentityCache
 from models.models import Card, CardBonus, Guild, OwnedCard, User
 from discord.basecommand import BaseCommand
 import random
@@ -68,7 +70,7 @@ class Spin(BaseCommand):
                 return 1 + bonus_rolls
         return 1
 
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
@@ -83,16 +85,13 @@ class Spin(BaseCommand):
         output_msg = ""
         with self.dbservice.Session() as session: 
             is_freebie = True if random.uniform(0, 1) < self.freebie_chance else False
-            source = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
-            guild = session.query(Guild).filter(Guild.guild_id == str(message.guild.id)).first()
-
-            if guild.broadcast_channel_id is not None and str(message.channel.id) != guild.broadcast_channel_id:
+            guild_config = IdentityCache.guild_config_sync(session, message.guild.id)
+            if guild_config.broadcast_channel_id is not None and str(message.channel.id) != guild_config.broadcast_channel_id:
                 return (f"<@{message.author.id}> Wrong channel, you clown :clown:")
 
-            coin_change = 0
+            source_id = IdentityCache.user_pk_sync(session, message.author.id, message.guild.id)
 
-            if source.brancoins < self.cost:
-                return (f"<@{message.author.id}> You ain't got the facilities for that big man")
+            coin_change = 0
 
             if not is_freebie:
                 coin_change -= self.cost
@@ -104,18 +103,21 @@ class Spin(BaseCommand):
                     win_val = win[1]
                     break
             
-            jackpot_chance_dynamic = max(200, math.ceil(ViewJackpot.upper_class_wealth(session, str(guild.guild_id)) * 0.1))
+            jackpot_chance_dynamic = max(200, math.ceil(ViewJackpot.upper_class_wealth(session, guild_config.guild_id) * 0.1))
             won_jackpot = spin_val < (1/jackpot_chance_dynamic)
 
-            jackpot_value = guild.brancoins
-            if won_jackpot:
-                coin_change += jackpot_value
-                guild.brancoins = 0
-            else:
-                guild.brancoins += self.cost
+            if not won_jackpot:
                 coin_change += win_val
 
-            source.brancoins += coin_change
+            # the outcome is decided up front so the balance check, cost and winnings are a single update
+            if BalanceService.adjust_sync(session, source_id, coin_change, required=self.cost) is None:
+                return (f"<@{message.author.id}> You ain't got the facilities for that big man")
+
+            if won_jackpot:
+                jackpot_value = BalanceService.claim_jackpot_sync(session, guild_config.guild_id) or 0
+                BalanceService.credit_sync(session, source_id, jackpot_value)
+            else:
+                BalanceService.add_to_jackpot_sync(session, guild_config.guild_id, self.cost)
 
             if won_jackpot:
                 output_msg = (f"<@{message.author.id}> :rotating_light: :rotating_light: :rotating_light: YOU WON THE JACKPOT OF {jackpot_value} {self.custom_emoji} !!!   :rotating_light: :rotating_light: :rotating_light: ")
@@ -131,8 +133,6 @@ class Spin(BaseCommand):
                     else:
                         output_msg = (f"<@{message.author.id}> Paid nothing!!! Farhan smiles upon you!!\nWon {win_val}!!!! Time to convert!!!!:maracas: <:Prayge:1038601127052193814> :maracas:")
 
-            session.add(guild)
-            session.add(source)
             session.commit()
         return output_msg
             
\ No newline at end of file
@@ -5,8 +5,12 @@ import math
 from typing import List
 from discord import Message
 import discord
+from sqlalchemy import delete
+from sqlalchemy.orm import selectinload
 from discord.drawutils import DrawUtils
-from models.dbcontainer import DbService
+from models.dbcontainer import AsyncDbService
+from models.balanceservice import BalanceService
+from models.identitycache import IdentityCache
 from models.models import Card, OwnedCard, User
 from discord.basecommand import BaseCommand
 from PIL import Image
@@ -15,23 +19,27 @@ from PIL import Image
 class DeleteCard(BaseCommand):
     prefix = "bran torch"
     usage = prefix + " [1,2,3]"
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
         command_breakdown = message.content.split()
         card_idx = int(command_breakdown[2]) - 1
         
-        with dbservice.Session() as session: 
-            guy = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
+        async with dbservice.Session() as session: 
+            guy = await IdentityCache.get_user(session, message.author.id, message.guild.id, options=[selectinload(User.owned_cards).selectinload(OwnedCard.card)])
+            torched = None
             if guy and card_idx < len(guy.owned_cards):
                 owned_card = guy.owned_cards[card_idx]
-                value = owned_card.card.cost
-                title = owned_card.card.title
-                guy.brancoins += math.ceil(value/6)
-                session.query(OwnedCard).filter(OwnedCard.id == owned_card.id).delete()
-                session.add(guy)
-                session.commit()
-                await message.reply(f"{title} has been sent to the shadow realm!!! {math.ceil(value/6)}{self.custom_emoji} restored. \n**card inventory indexes have changed, be careful when deleting in a chain**")
-            else:
-                await message.reply("???")
+                # only pay out if this command is the one that actually deleted the card
+                torched = await session.scalar(delete(OwnedCard).filter(OwnedCard.id == owned_card.id).returning(OwnedCard.id))
+                if torched is not None:
+                    value = owned_card.card.cost
+                    title = owned_card.card.title
+                    await BalanceService.credit(session, guy.id, math.ceil(value/6))
+                    await session.commit()
+
+        if torched is not None:
+            await message.reply(f"{title} has been sent to the shadow realm!!! {math.ceil(value/6)}{self.custom_emoji} restored. \n**card inventory indexes have changed, be careful when deleting in a chain**")
+        else:
+            await message.reply("???")
@@ -5,9 +5,12 @@ import math
 from typing import List
 from discord import Message
 import discord
-from sqlalchemy import text
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import joinedload
 from discord.drawutils import DrawUtils
-from models.dbcontainer import DbService
+from models.dbcontainer import AsyncDbService
+from models.balanceservice import BalanceService
+from models.identitycache import IdentityCache
 from models.models import Card, OwnedCard, User
 from discord.basecommand import BaseCommand
 from PIL import Image
@@ -16,38 +19,42 @@ from PIL import Image
 class DeleteDupeCards(BaseCommand):
     prefix = "bran torchdupes"
     usage = prefix
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    dupes_query = text(
+        "select id FROM "
+        "( "
+            "select ownedcards.card_id, min(ownedcards.id) as saved_id "
+            "from ownedcards "
+            "where owner_id=:ownerid "
+            "group by ownedcards.card_id having count(*) > 1 "
+        ") as dupes_to_keep "
+        "INNER JOIN " 
+        "ownedcards "
+        "on ownedcards.card_id = dupes_to_keep.card_id "
+        "where ownedcards.id > dupes_to_keep.saved_id AND owner_id=:ownerid limit 10"
+    )
+
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
-        with dbservice.Session() as session: 
-            guy = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
-            if guy:
-                query_text = text(
-                    "select id FROM "
-                    "( "
-                        "select ownedcards.card_id, min(ownedcards.id) as saved_id "
-                        "from ownedcards "
-                        "where owner_id=:ownerid "
-                        "group by ownedcards.card_id having count(*) > 1 "
-                    ") as dupes_to_keep "
-                    "INNER JOIN " 
-                    "ownedcards "
-                    "on ownedcards.card_id = dupes_to_keep.card_id "
-                    "where ownedcards.id > dupes_to_keep.saved_id AND owner_id=:ownerid limit 10"
-                )
-                dupe_owned_card_ids = session.execute(query_text, {"ownerid": guy.id}).scalars()
-                outputs = []
-                for dupe_owned_card_id in dupe_owned_card_ids:
-                    dupe_owned_card = session.query(OwnedCard).filter(OwnedCard.id == dupe_owned_card_id).first()
-                    value = dupe_owned_card.card.cost
-                    title = dupe_owned_card.card.title
-                    guy.brancoins += math.ceil(value/6)
-                    session.add(guy)
-                    session.query(OwnedCard).filter(OwnedCard.id == dupe_owned_card_id).delete()
-                    outputs.append(f"{title} for {math.ceil(value/6)}{self.custom_emoji}")
-                output = ','.join(outputs)
-                await message.reply(f"torching: {output}")
-                session.commit()
-            else:
+        async with dbservice.Session() as session: 
+            guy_id = await IdentityCache.user_pk(session, message.author.id, message.guild.id)
+            if guy_id is None:
                 await message.reply("???")
+                return
+            dupe_owned_card_ids = (await session.execute(self.dupes_query, {"ownerid": guy_id})).scalars().all()
+            dupe_owned_cards = (await session.scalars(select(OwnedCard).options(joinedload(OwnedCard.card)).filter(OwnedCard.id.in_(dupe_owned_card_ids)).order_by(OwnedCard.id))).all()
+            # a concurrent torch may have beaten us to some of them, only pay for what we deleted
+            torched_ids = set((await session.scalars(delete(OwnedCard).filter(OwnedCard.id.in_(dupe_owned_card_ids)).returning(OwnedCard.id))).all())
+            outputs = []
+            total = 0
+            for dupe_owned_card in dupe_owned_cards:
+                if dupe_owned_card.id not in torched_ids:
+                    continue
+                value = math.ceil(dupe_owned_card.card.cost/6)
+                total += value
+                outputs.append(f"{dupe_owned_card.card.title} for {value}{self.custom_emoji}")
+            await BalanceService.credit(session, guy_id, total)
+            await session.commit()
+        output = ','.join(outputs)
+        await message.reply(f"torching: {output}")
@@ -5,9 +5,12 @@ import math
 from typing import List
 from discord import Message
 import discord
-from sqlalchemy import text
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import contains_eager
+from discord.commands.inventory import Inventory
 from discord.drawutils import DrawUtils
-from models.dbcontainer import DbService
+from models.dbcontainer import AsyncDbService
+from models.identitycache import IdentityCache
 from models.models import Card, OwnedCard, User
 from discord.basecommand import BaseCommand
 from PIL import Image
@@ -16,7 +19,7 @@ from PIL import Image
 class ViewCard(BaseCommand):
     prefix = "bran viewcard"
     usage = prefix + " [1/2/3/'some title'/'some desc']"
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
@@ -25,34 +28,39 @@ class ViewCard(BaseCommand):
         selected_card = None
         if self.represents_int(command_breakdown[2]):
             card_idx = int(command_breakdown[2]) - 1
-            with dbservice.Session() as session: 
-                guy = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
+            async with dbservice.Session() as session: 
+                guy = await IdentityCache.get_user(session, message.author.id, message.guild.id, options=Inventory.owned_card_options())
                 if guy and card_idx < len(guy.owned_cards):
                     card = guy.owned_cards[card_idx].card
-                    file = discord.File(DrawUtils.card_to_byte_image(card), filename=f"card.png")
+                    await DrawUtils.preload_images(session, [card])
+                    file = discord.File(await DrawUtils.card_png(card), filename=f"card.png")
                     await message.reply(f"Behold! I'll activate {card.title}!!!", file=file)
                 else:
                     await message.reply("???")
         else :
-            with dbservice.Session() as session: 
-                guy = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
-                card = ViewCard.find_card_by_text(session, guy, message.content.removeprefix(self.prefix)).card
+            async with dbservice.Session() as session: 
+                guy = await IdentityCache.get_user(session, message.author.id, message.guild.id)
+                owned_card = await ViewCard.find_card_by_text(session, guy, message.content.removeprefix(self.prefix))
+                card = owned_card.card if owned_card else None
                 if card is not None:
-                    file = discord.File(DrawUtils.card_to_byte_image(card), filename=f"card.png")
+                    await DrawUtils.preload_images(session, [card])
+                    file = discord.File(await DrawUtils.card_png(card), filename=f"card.png")
                     await message.reply(f"Behold! I'll activate {card.title}!!!", file=file)
                 else:
                     await message.reply("???")
 
     @staticmethod
-    def find_card_by_text(session, owner: User, search_text: str):
-        query_text = text(
-            "Select ownedcards.id, cards.cost, similarity(cards.title, :str_search) as sim from ownedcards inner join cards on ownedcards.card_id = cards.id where ownedcards.owner_id = :ownerid "
-            "UNION ALL "
-            "Select ownedcards.id, cards.cost, similarity(cards.description, :str_search) as sim from ownedcards inner join cards on ownedcards.card_id = cards.id where ownedcards.owner_id = :ownerid "
-            "order by sim desc, cost desc ")
-        closest_owned_card = session.execute(query_text, {"ownerid": owner.id, "str_search": search_text}).first()
-        owned_card = session.query(OwnedCard).join(Card, OwnedCard.card).filter(OwnedCard.id == closest_owned_card[0]).first()
-        return owned_card
+    async def find_card_by_text(session, owner: User, search_text: str):
+        # % only keeps cards above pg_trgm.similarity_threshold (Env.trigram_threshold) and can use the gin
+        # trigram indexes, the owned card comes back with its card and image in the same round trip
+        if owner is None:
+            return None
+        search_text = search_text.strip()
+        sim = func.greatest(func.similarity(Card.title, search_text), func.similarity(Card.description, search_text))
+        query = select(OwnedCard).join(Card, OwnedCard.card).options(contains_eager(OwnedCard.card).joinedload(Card.image)) \
+            .filter(OwnedCard.owner_id == owner.id, or_(Card.title.op("%")(search_text), Card.description.op("%")(search_text))) \
+            .order_by(sim.desc(), Card.cost.desc()).limit(1)
+        return await session.scalar(query)
 
     def split(self, arr, size):
         return [arr[i:i+size] for i in range(0,len(arr),size)]
@@ -4,21 +4,23 @@ from discord import Message
 import discord
 import discord.ext
 import discord.ext.commands
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
 from discord.VoteType import VoteType
-from models.dbcontainer import DbService
-from models.models import Match, User, Guild
+from models.dbcontainer import AsyncDbService
+from models.models import LeagueUser, Match, MatchPlayer, User, Guild, Votes
 from discord.basecommand import BaseCommand
 from discord.ext.commands import Bot
 
 class ViewMatches(BaseCommand):
     prefix = "bran matches"
     usage = prefix
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
-        with dbservice.Session() as session: 
-            open_matches = session.query(Match).filter(Match.finished == False).all()
+        async with dbservice.Session() as session: 
+            open_matches = (await session.scalars(ViewMatches.open_matches_query())).all()
             context: discord.ext.commands.Context = await ctx(message)
             bot: Bot = context.bot
             for open_match in open_matches:
@@ -28,6 +30,14 @@ class ViewMatches(BaseCommand):
             if len(open_matches) == 0:
                 await message.reply("No pending matches")
 
+    @staticmethod
+    def open_matches_query():
+        # everything generate_embed_for_match touches, async sessions can't lazy load it
+        return select(Match).options(
+            selectinload(Match.match_players).joinedload(MatchPlayer.league_user).joinedload(LeagueUser.discord_user),
+            selectinload(Match.votes).joinedload(Votes.voter)
+        ).filter(Match.finished == False)
+
     @staticmethod
     async def generate_embed_for_match(match: Match, bot: Bot):
         embedVar = discord.Embed(title=f"id: {match.match_id}", description="", color=0xccccff)
@@ -2,7 +2,6 @@
 
 from asyncio import Semaphore
 import datetime
-from io import BytesIO
 import math
 from typing import List
 import PIL
@@ -10,9 +9,10 @@ from discord import Message
 import discord
 import discord.ext
 import discord.ext.commands
+from discord.commands.openpack import OpenPack
 from discord.drawutils import DrawUtils
-from models.dbcontainer import DbService
-from models.models import BoosterCard, BoosterPack, Card, Guild, OwnedCard, Shop, User
+from models.dbcontainer import AsyncDbService
+from models.models import BoosterCard, BoosterPack, BoosterSegment, Card, Guild, OwnedCard, Shop, User
 from discord.basecommand import BaseCommand
 import random
 
@@ -22,7 +22,7 @@ class ViewPackCards(BaseCommand):
     usage = prefix + " [pack_name]"
     admin = 114930910884790276
 
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
@@ -32,8 +32,8 @@ class ViewPackCards(BaseCommand):
         
         command_breakdown = message.content.split()
         pack_name = str(command_breakdown[2]) 
-        with dbservice.Session() as session: 
-            pack = session.query(BoosterPack).filter(BoosterPack.id == pack_name).first()
+        async with dbservice.Session() as session: 
+            pack = await session.scalar(OpenPack.pack_query(pack_name))
             if pack is None:
                 await message.reply("can't find pack")
                 return
@@ -43,9 +43,8 @@ class ViewPackCards(BaseCommand):
                 for card in segment.booster_cards:
                     print_cards.append(card.card)
 
+            await DrawUtils.preload_images(session, print_cards)
             grid = (math.ceil(math.sqrt(len(print_cards))), math.ceil(math.sqrt(len(print_cards))))
             inv_img = await DrawUtils.draw_inv_card_spread(print_cards,  (1000, 1000), grid, draw_blanks=True)
-            buffered = BytesIO()
-            inv_img.save(buffered, format="PNG")
-            discord_file = discord.File(BytesIO(buffered.getvalue()), filename=f"previewpack.png")
+            discord_file = discord.File(inv_img, filename=f"previewpack.png")
             await message.reply(file=discord_file)
\ No newline at end of file
@@ -1,17 +1,16 @@
 import base64
 import datetime
-from io import BytesIO
 import math
-import os
-from PIL import Image, ImageFont, ImageDraw
 from cachetools import cached
 from cachetools.keys import hashkey
 from discord import Message
 import discord
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.orm import contains_eager, selectinload
 from discord.drawutils import DrawUtils
-from models.dbcontainer import DbService
-from models.models import BoosterCard, BoosterPack, Card, Shop, User
+from models.dbcontainer import AsyncDbService
+from models.identitycache import IdentityCache
+from models.models import BoosterCard, BoosterPack, Card, OwnedCard, Shop, User
 from discord.basecommand import BaseCommand
 from discord.ext.commands import Bot
 
@@ -43,21 +42,21 @@ class ViewShop(BaseCommand):
     ]
 
 
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
         
-        with dbservice.Session() as session: 
-            if session.query(Shop).filter(Shop.date_added == datetime.date.today()).count() < 4:
+        async with dbservice.Session() as session: 
+            if await session.scalar(select(func.count()).select_from(Shop).filter(Shop.date_added == datetime.date.today())) < 4:
                 print("no shop, populating")
-                featured_cards = session.query(Card).filter(Card.featured == True).all()
+                featured_cards = (await session.scalars(select(Card).filter(Card.featured == True))).all()
                 drawn_cards = []
-                drawn_cards.append(session.query(Card).filter(Card.shoppable == True, Card.cost <= 100).order_by(func.random()).first())
-                drawn_cards.append(session.query(Card).filter(Card.shoppable == True, Card.cost > 100, Card.cost <= 500).order_by(func.random()).first())
-                drawn_cards.append(session.query(Card).filter(Card.shoppable == True, Card.cost > 100).order_by(func.random()).first())
-                drawn_cards.append(session.query(Card).filter(Card.shoppable == True, Card.cost > 1000).order_by(func.random()).first())
-                drawn_cards.append(session.query(Card).filter(Card.shoppable == True).order_by(func.random()).first())
-                drawn_cards.append(session.query(Card).filter(Card.shoppable == True).order_by(func.random()).first())
+                drawn_cards.append(await session.scalar(select(Card).filter(Card.shoppable == True, Card.cost <= 100).order_by(func.random()).limit(1)))
+                drawn_cards.append(await session.scalar(select(Card).filter(Card.shoppable == True, Card.cost > 100, Card.cost <= 500).order_by(func.random()).limit(1)))
+                drawn_cards.append(await session.scalar(select(Card).filter(Card.shoppable == True, Card.cost > 100).order_by(func.random()).limit(1)))
+                drawn_cards.append(await session.scalar(select(Card).filter(Card.shoppable == True, Card.cost > 1000).order_by(func.random()).limit(1)))
+                drawn_cards.append(await session.scalar(select(Card).filter(Card.shoppable == True).order_by(func.random()).limit(1)))
+                drawn_cards.append(await session.scalar(select(Card).filter(Card.shoppable == True).order_by(func.random()).limit(1)))
 
                 filtered_drawn_cards = list(filter(lambda x: x is not None, drawn_cards))
                 
@@ -78,24 +77,23 @@ class ViewShop(BaseCommand):
                         newShopCard.date_added = datetime.date.today()
                         session.add(newShopCard)
 
-                session.commit()
+                await session.commit()
 
         
         cards = []
-        card_images = []
         card_labels = []
         card_costs = []
-        with dbservice.Session() as session: 
-            shop_items = session.query(Shop).join(Card, Shop.card).filter(Shop.date_added == datetime.date.today()).order_by(Card.cost.asc(), Card.id.asc()).all()
+        async with dbservice.Session() as session: 
+            shop_items = (await session.scalars(select(Shop).join(Card, Shop.card).options(contains_eager(Shop.card).selectinload(Card.image)).filter(Shop.date_added == datetime.date.today()).order_by(Card.cost.asc(), Card.id.asc()))).all()
+            await DrawUtils.preload_images(session, [shop_item.card for shop_item in shop_items])
             for idx, shop_item in enumerate(shop_items):
                 cards.append(shop_item.card)
-                card_images.append(DrawUtils.card_to_image(shop_item.card))
                 card_costs.append(shop_item.card.cost)
                 card_labels.append(f"[bran buy {idx + 1}] to buy {shop_item.card.title} {shop_item.card.card_style} for [**{shop_item.card.cost}** {self.custom_emoji}]!")
         
         shop_image = None
-        if len(card_images) == 4:
-            shop_image = self.draw_shop_image(card_images, card_costs)
+        if len(cards) == 4:
+            shop_image = await self.draw_shop_image(cards, card_costs)
         else: 
             shop_image = await self.draw_shop_image_flex(cards)
         discord_shop_item = discord.File(shop_image, filename="shop.png")
@@ -103,36 +101,24 @@ class ViewShop(BaseCommand):
         await message.reply(f"**Welcome to the Bran Shop!**\n{card_label_joined}", file=discord_shop_item)
         await self.show_pack_shop(dbservice, message)
 
-    def draw_shop_image(self, card_images, card_costs):
-        shop_map = Image.open(os.path.dirname(__file__) + "/../../assets/shopmat.png")
-        font = ImageFont.truetype(os.path.dirname(__file__) + "/../../assets/Jersey M54.ttf", 40)
-        shop_draw = ImageDraw.Draw(shop_map)
-        for idx, card_image in enumerate(card_images):
-            shop_map.paste(card_image.resize((self.card_width, self.card_height)), self.card_coords[idx])
-            shop_draw.text(self.text_coords[idx], str(card_costs[idx]), (0, 0, 0), font)
-
-        buffered = BytesIO()
-        shop_map.save(buffered, format="PNG")
-        return BytesIO(buffered.getvalue())
+    async def draw_shop_image(self, cards, card_costs):
+        return await DrawUtils.draw_shop(cards, card_costs, (self.card_width, self.card_height), self.card_coords, self.text_coords)
     
     async def draw_shop_image_flex(self, cards):
-        shop_map = await DrawUtils.draw_inv_card_spread(cards, (math.floor(1600/4*len(cards)), 900), (len(cards), 1), draw_blanks=False)
-        buffered = BytesIO()
-        shop_map.save(buffered, format="PNG")
-        return BytesIO(buffered.getvalue())
+        return await DrawUtils.draw_inv_card_spread(cards, (math.floor(1600/4*len(cards)), 900), (len(cards), 1), draw_blanks=False)
     
-    async def show_pack_shop(self, dbservice: DbService, message: discord.Message):
-        with dbservice.Session() as session:
-            packs = session.query(BoosterPack).all()
+    async def show_pack_shop(self, dbservice: AsyncDbService, message: discord.Message):
+        async with dbservice.Session() as session:
+            packs = (await session.scalars(select(BoosterPack))).all()
             if packs is None or len(packs) == 0:
                 await message.reply("can't find any packs")
                 return
             
-            source = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
-            owned_card_ids = [x.card_id for x in source.owned_cards]
+            source_id = await IdentityCache.user_pk(session, message.author.id, message.guild.id)
+            owned_card_ids = (await session.scalars(select(OwnedCard.card_id).filter(OwnedCard.owner_id == source_id))).all()
             missing_cards_text = []
             for pack in packs:
-                distinct_cards_in_pack = session.query((func.distinct(BoosterCard.card_id))).filter(BoosterCard.booster_pack_id == pack.id).all()
+                distinct_cards_in_pack = (await session.execute(select(func.distinct(BoosterCard.card_id)).filter(BoosterCard.booster_pack_id == pack.id))).all()
                 distinct_card_ids = [x.tuple()[0] for x in distinct_cards_in_pack]
                 missing_card_ids = [x for x in distinct_card_ids if x not in owned_card_ids]
                 missing_cards_text.append(f"\nYou're missing {len(missing_card_ids)} cards from this pack!")
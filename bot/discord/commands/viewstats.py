@@ -0,0 +1,71 @@
+from discord import Message
+import discord
+from sqlalchemy import select
+from models.dbcontainer import AsyncDbService
+from models.identitycache import IdentityCache
+from models.models import LeagueUser, User
+from models.statsaggregates import StatsAggregates
+from discord.basecommand import BaseCommand
+from discord.ext.commands import Bot
+
+
+class ViewStats(BaseCommand):
+    prefix = "bran stats"
+    usage = prefix + " [user]"
+    lim = 5
+
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
+        if not self.does_prefix_match(self.prefix, message.content):
+            return
+
+        async with dbservice.Session() as session:
+            context = await ctx(message)
+            bot: Bot = context.bot
+            if len(message.mentions) > 0:
+                embedVar = await self.user_stats(session, bot, message.mentions[0], message.guild.id)
+            else:
+                embedVar = await self.guild_stats(session, bot, message.author, message.guild.id)
+            await message.reply(embed=embedVar)
+
+    @staticmethod
+    def win_rate(games, wins) -> str:
+        return f"{wins}W {games - wins}L ({round(100 * wins / games)}%)" if games else "no games"
+
+    async def guild_stats(self, session, bot: Bot, author, guild_id) -> discord.Embed:
+        embedVar = discord.Embed(title="Stats", description="", color=0xccffcc)
+        embedVar.add_field(name="Players: ", value="", inline=False)
+        for summoner_name, games, wins in await StatsAggregates.players(session, guild_id, self.lim):
+            embedVar.add_field(name=summoner_name, value=self.win_rate(games, wins), inline=True)
+
+        embedVar.add_field(name="\u200b", value="", inline=False)
+        embedVar.add_field(name="Best bettors: ", value="", inline=False)
+        for user_id, votes, wins, profit in await StatsAggregates.voters(session, guild_id, self.lim):
+            disc_user = await bot.fetch_user(user_id)
+            embedVar.add_field(name=str(disc_user.display_name), value=f"{profit:+} {self.custom_emoji} over {votes} votes", inline=False)
+
+        user_pk = await IdentityCache.user_pk(session, author.id, guild_id)
+        mine = await StatsAggregates.voter(session, user_pk) if user_pk is not None else None
+        if mine is not None:
+            embedVar.add_field(name="\u200b", value="", inline=False)
+            embedVar.add_field(name="You: ", value=f"{mine.profit:+} {self.custom_emoji}, {self.win_rate(mine.votes, mine.wins)} on {mine.wagered} bet", inline=False)
+        return embedVar
+
+    async def user_stats(self, session, bot: Bot, member, guild_id) -> discord.Embed:
+        embedVar = discord.Embed(title=f"Stats for {member.display_name}", description="", color=0xccffcc)
+        league_user_ids = (await session.scalars(select(LeagueUser.id).join(User, User.id == LeagueUser.discord_user_id)
+                                                 .filter(User.user_id == str(member.id), User.guild_id == str(guild_id)))).all()
+        if len(league_user_ids) > 0:
+            embedVar.add_field(name="Modes: ", value="", inline=False)
+            for match_type, games, wins in await StatsAggregates.by_match_type(session, league_user_ids):
+                embedVar.add_field(name=match_type or "Unknown", value=self.win_rate(games, wins), inline=True)
+            embedVar.add_field(name="\u200b", value="", inline=False)
+            embedVar.add_field(name="Champions: ", value="", inline=False)
+            for champion, games, wins, kills, deaths, assists in await StatsAggregates.by_champion(session, league_user_ids, self.lim):
+                embedVar.add_field(name=champion, value=f"{self.win_rate(games, wins)} {kills}/{deaths}/{assists}", inline=True)
+
+        user_pk = await IdentityCache.user_pk(session, member.id, guild_id)
+        voter = await StatsAggregates.voter(session, user_pk) if user_pk is not None else None
+        if voter is not None:
+            embedVar.add_field(name="\u200b", value="", inline=False)
+            embedVar.add_field(name="Betting: ", value=f"{voter.profit:+} {self.custom_emoji}, {self.win_rate(voter.votes, voter.wins)} on {voter.wagered} bet", inline=False)
+        return embedVar
@@ -4,16 +4,20 @@ from discord import Message
 import discord
 import discord.ext
 import discord.ext.commands
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
 from discord.VoteType import VoteType
-from models.dbcontainer import DbService
-from models.models import Match, User, Votes
+from models.dbcontainer import AsyncDbService
+from models.balanceservice import BalanceService
+from models.identitycache import IdentityCache
+from models.models import LeagueUser, Match, MatchPlayer, User, Votes
 from discord.basecommand import BaseCommand
 
 
 class AddVote(BaseCommand):
     prefix = "bran vote"
     usage = f"{prefix} [win/lose] [num_coins] [optional: match_id]"
-    async def process(self, ctx, message: Message, dbservice: DbService):
+    async def process(self, ctx, message: Message, dbservice: AsyncDbService):
         if not self.does_prefix_match(self.prefix, message.content):
             return
 
@@ -22,7 +26,7 @@ class AddVote(BaseCommand):
         if command_breakdown[2] == "win" or command_breakdown[2] == "lose":
             await self.add_win_loss_vote(dbservice, command_breakdown[2:], message)
 
-    async def add_win_loss_vote(self, db: DbService, arggs, message: discord.Message):
+    async def add_win_loss_vote(self, db: AsyncDbService, arggs, message: discord.Message):
         vote_type = None
         if arggs[0] == "win":
             vote_type = VoteType.WIN
@@ -38,20 +42,14 @@ class AddVote(BaseCommand):
         if num_coins <= 0:
             return
 
-        with db.Session() as session:
-            source_user = session.query(User).filter(User.user_id == str(message.author.id), User.guild_id == str(message.guild.id)).first()
-            if source_user.brancoins < num_coins:
-                await message.reply("Stop doing gamba broke boi")
-                return
-            source_user.brancoins -= num_coins
-
-            match_fetch_query = session.query(Match).filter(Match.finished == False)
+        async with db.Session() as session:
+            match_fetch_query = select(Match).options(selectinload(Match.match_players).joinedload(MatchPlayer.league_user).joinedload(LeagueUser.discord_user)).filter(Match.finished == False)
             if match_id:
                 match_fetch_query = match_fetch_query.filter(Match.match_id == match_id)
-            target_match = match_fetch_query.first()
+            target_match = await session.scalar(match_fetch_query.limit(1))
 
             for match_player in target_match.match_players:
-                if vote_type == VoteType.LOSE and source_user.user_id == match_player.league_user.discord_user.user_id:
+                if vote_type == VoteType.LOSE and str(message.author.id) == match_player.league_user.discord_user.user_id:
                     await message.reply("Leave the throwing to tapson, dufus")
                     return
 
@@ -59,14 +57,19 @@ class AddVote(BaseCommand):
                 await message.reply("Too late idiot")
                 return
 
+            # the balance check and the debit are one statement, so two quick votes can't both spend the same coins
+            source_id = await IdentityCache.user_pk(session, message.author.id, message.guild.id)
+            if await BalanceService.debit(session, source_id, num_coins) is None:
+                await message.reply("Stop doing gamba broke boi")
+                return
+
             new_vote = Votes()
             new_vote.type_of_vote = vote_type.value
             new_vote.processed = False
-            new_vote.voter = source_user
+            new_vote.voter_id = source_id
             new_vote.brancoins = num_coins
-            target_match.votes.append(new_vote)
+            new_vote.match_id = target_match.match_id
             
-            session.add(source_user)
-            session.add(target_match)
-            session.commit()
+            session.add(new_vote)
+            await session.commit()
         await message.reply("Vote placed")
\ No newline at end of file
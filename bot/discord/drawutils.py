@@ -1,125 +1,142 @@
 import asyncio
-from functools import lru_cache, partial, wraps
+import hashlib
 from io import BytesIO
-import os
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
-from cachetools import LRUCache, cached
-from models.models import Card
-from PIL import Image, ImageDraw, ImageOps, ImageSequence, ImageFont
-from cardmaker import CardConstructor
-from cachetools.keys import hashkey
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import undefer
+from discord import renderjobs
+from discord.renderbackend import RenderBackend
+from discord.renderjobs import CardJob
+from discord.renderstore import RenderMemory, RenderStore
+from envvars import Env
+from metrics import Metrics
+from models.models import Card, Image as StoredImage
 
 
 class DrawUtils:
 
-    def to_async(func):
-        @wraps(func)  # Makes sure that function is returned for e.g. func.__name__ etc.
-        async def run(*args, loop=None, executor=None, **kwargs):
-            if loop is None:
-                loop = asyncio.get_event_loop() # Make event loop of nothing exists
-            pfunc = partial(func, *args, **kwargs)  # Return function with variables (event) filled in
-            return await loop.run_in_executor(executor, pfunc)
-        return run
+    render_cache = RenderMemory(maxsize=150)
+    render_store = RenderStore(Env.render_cache_dir, Env.render_cache_bytes)
+    render_backend = RenderBackend(Env.render_backend, Env.render_workers)
+    # finished summon animations by render_key, the same card summoned again is just a lookup
+    summon_cache = RenderMemory(maxsize=16)
+    summon_format = Env.summon_format
 
     @staticmethod
-    @cached(cache=LRUCache(maxsize=150), key=lambda card: hashkey(card.id, card.card_style, card.title, card.attribute, card.level, card.type, card.description, card.atk, card.defe, card.cost, card.image_label))
-    def card_to_byte_image_internal(card: Card):
-        print(f"card draw {card.title}")
-        addons = []
-        if card.cost > 400:
-            addons.append("foil_txt")
-        elif card.cost > 300:
-            addons.append("guild_txt")
-        if card.cost > 500:
-            addons.append("foil_pic")
-        input_data = {
-            "card": card.card_style,
-            "Title": card.title,
-            "attribute": card.attribute,
-            "Level": int(card.level),
-            "Type": card.type,
-            "Descripton": str(card.description).replace('\\n','\n'),
-            "Atk": card.atk,
-            "Def": card.defe,
-            "Addons": addons
-            }
-        input_data["image_card"] = Image.open(BytesIO(card.image.bin))
-        output = CardConstructor(input_data)
-        return output.generateCard()
-    
+    def render_key(card: Card) -> str:
+        # what the card looks like rather than which card it is, so identical cards share a render
+        # and an edited card or image gets a new one. the digest is filled in by postgres, an image
+        # added in this session may not have it yet
+        image = card.image
+        source = image.digest if image is not None and image.digest else card.image_label
+        fields = (card.card_style, card.title, card.attribute, card.level, card.type, card.description, card.atk, card.defe, card.cost, source)
+        return hashlib.sha256(repr(fields).encode()).hexdigest()
+
+    @staticmethod
+    async def preload_images(session, cards: List[Card]):
+        # Image.bin is deferred, so pull the source bytes up front in one query, only for cards the render
+        # cache is missing. lookups touch the lru so those entries stay put, and a set too big to stay cached
+        # just loads everything. it's only a guess, an entry can still go before the render, card_pngs
+        # loads whatever it ends up missing
+        distinct_cards = list({card.id: card for card in cards}.values())
+        if not DrawUtils.render_store.loaded:
+            await asyncio.to_thread(DrawUtils.render_store.ensure_loaded)
+        if len(distinct_cards) > DrawUtils.render_cache.maxsize // 2:
+            missing = distinct_cards
+        else:
+            missing = [card for card in distinct_cards
+                       if not DrawUtils.render_cache.contains(DrawUtils.render_key(card)) and not DrawUtils.render_store.contains(DrawUtils.render_key(card))]
+        labels = {card.image_label for card in missing if card.image is not None and 'bin' in inspect(card.image).unloaded}
+        if len(labels) > 0:
+            await session.execute(select(StoredImage).options(undefer(StoredImage.bin)).filter(StoredImage.label.in_(labels)))
+
+    @staticmethod
+    def cached_render(key: str) -> Optional[bytes]:
+        png = DrawUtils.render_cache.get(key)
+        if png is None:
+            png = DrawUtils.render_store.get(key)
+            if png is not None:
+                DrawUtils.render_cache.put(key, png)
+        return png
+
+    @staticmethod
+    def keep_renders(rendered: Dict[str, bytes]):
+        for key, png in rendered.items():
+            DrawUtils.render_cache.put(key, png)
+            DrawUtils.render_store.put(key, png)
+
+    @staticmethod
+    def card_to_byte_image_internal(card: Card) -> bytes:
+        # renders in the calling thread, for the places without a loop (the /preview endpoint)
+        key = DrawUtils.render_key(card)
+        png = DrawUtils.cached_render(key)
+        if png is None:
+            png = renderjobs.render_card(CardJob.from_card(card, card.image.bin))
+            DrawUtils.keep_renders({key: png})
+        return png
+
     @staticmethod
     def card_to_byte_image(card: Card):
         return BytesIO(DrawUtils.card_to_byte_image_internal(card))
-    
-    @staticmethod 
-    def summon(card: Card):
-        im = Image.open(os.path.dirname(__file__) + f"/../assets/summon.gif")
-        frames = [frame.copy() for frame in ImageSequence.Iterator(im)]
-        for idx, frame in enumerate(frames):
-            if idx > len(frames) - 4:
-                card_size = (250, 270)
-                pos = (60,-15)
-                card_image = DrawUtils.card_to_image(card)
-                card_image = card_image.resize(card_size)
-
-                width, height = card_image.size
-                m = -0.5
-                xshift = abs(m) * width
-                new_width = width + int(round(xshift))
-                card_image = card_image.transform((new_width, height), Image.AFFINE,
-                        (1, m, -xshift if m > 0 else 0, 0, 1, 0), Image.BICUBIC)
-                
-                card_image = card_image.rotate(15, expand=1)
-
-                frame.paste(card_image, pos, card_image)
-                
-        buffered = BytesIO()
-        frames[0].save(buffered, format="GIF", save_all=True, append_images=frames[1:])
-        return BytesIO(buffered.getvalue())
 
     @staticmethod
-    def card_to_image(card: Card):
-        return Image.open(DrawUtils.card_to_byte_image(card))
-    
-    @to_async
+    async def card_pngs(cards: List[Card]) -> List[bytes]:
+        # each distinct look is looked up once and only the misses go to the render backend, all at once,
+        # so a page of new cards spreads over the workers. the disk tier is read off the loop
+        keys = [DrawUtils.render_key(card) for card in cards]
+        found: Dict[str, bytes] = {}
+        jobs: Dict[str, CardJob] = {}
+        for card, key in zip(cards, keys):
+            if key in found or key in jobs:
+                continue
+            png = DrawUtils.render_cache.get(key)
+            if png is None:
+                png = await asyncio.to_thread(DrawUtils.render_store.get, key)
+                if png is not None:
+                    DrawUtils.render_cache.put(key, png)
+            if png is not None:
+                found[key] = png
+            else:
+                # evicted since preload_images looked, or never preloaded. awaited, a plain lazy load
+                # on an async session raises
+                jobs[key] = CardJob.from_card(card, await card.image.awaitable_attrs.bin)
+        if len(jobs) > 0:
+            rendered = dict(zip(jobs, await asyncio.gather(*[DrawUtils.render_backend.run(renderjobs.render_card, job) for job in jobs.values()])))
+            await asyncio.to_thread(DrawUtils.keep_renders, rendered)
+            found.update(rendered)
+        return [found[key] for key in keys]
+
+    @staticmethod
+    async def card_png(card: Card) -> BytesIO:
+        return BytesIO((await DrawUtils.card_pngs([card]))[0])
+
+    @staticmethod
+    async def summon(card: Card) -> BytesIO:
+        key = DrawUtils.render_key(card)
+        animation = DrawUtils.summon_cache.get(key)
+        if animation is None:
+            card_png = (await DrawUtils.card_pngs([card]))[0]
+            animation = await DrawUtils.render_backend.run(renderjobs.compose_summon, card_png, DrawUtils.summon_format.upper())
+            DrawUtils.summon_cache.put(key, animation)
+        return BytesIO(animation)
+
+    @staticmethod
+    async def keyed_pngs(cards: List[Card]) -> List[Tuple[str, bytes]]:
+        # the render key lets the render process reuse its scaled tile of a card instead of the png
+        return list(zip([DrawUtils.render_key(card) for card in cards], await DrawUtils.card_pngs(cards)))
+
+    @staticmethod
+    async def draw_shop(cards: List[Card], card_costs: List[int], card_size, card_coords, text_coords) -> BytesIO:
+        card_pngs = await DrawUtils.keyed_pngs(cards)
+        return BytesIO(await DrawUtils.render_backend.run(renderjobs.compose_shop, card_pngs, card_costs, card_size, card_coords, text_coords))
+
     @staticmethod
-    def draw_inv_card_spread(cards: List[Card], bg_size, card_grid, draw_blanks, bg = "inventorybg.jpg", draw_idx = False, idx_offset = 1):
-        spread = Image.open(os.path.dirname(__file__) + f"/../assets/{bg}")
-        spread = spread.resize(bg_size)
-        
-        margin_x = 20
-        margin_y = 20
-
-        draw = ImageDraw.Draw(spread)   
-        rect_size = (int(bg_size[0]/card_grid[0] - (margin_x*1.5)), int(bg_size[1]/card_grid[1] - (1.5*margin_y)))
-        
-        font = ImageFont.truetype(os.path.dirname(__file__) + "/../assets/Jersey M54.ttf", 20)
-
-        card_idx = 0
-        for y in range(card_grid[1]):
-            for x in range(card_grid[0]):
-                top_left_x = rect_size[0]*x + margin_x*(x+1)
-                top_left_y = rect_size[1]*y + margin_y*(y+1)
-
-                bot_right_x = top_left_x + rect_size[0]
-                bot_right_y = top_left_y + rect_size[1]
-                pos = (top_left_x, top_left_y, bot_right_x, bot_right_y)
-                # draw.rectangle(pos, fill ="#ffff33", outline ="red")  
-                if card_idx < len(cards) or draw_blanks:
-                    image_card = DrawUtils.card_to_image(cards[card_idx]) if card_idx < len(cards) else DrawUtils.card_to_image(cards[0])
-                    image_bg = Image.new('RGBA', (image_card.size[0] + 20, image_card.size[1] + 20), (203, 189, 147))
-                    if card_idx < len(cards):
-                        image_bg.paste(image_card, (10, 10))
-                    image_sized = ImageOps.contain(image_bg, rect_size)
-
-                    gap_x = rect_size[0] - image_sized.size[0]
-                    gap_y = rect_size[1] - image_sized.size[1]
-
-                    spread.paste(image_sized, (top_left_x + int(gap_x/2), top_left_y + int(gap_y/2)))
-                    
-                    if draw_idx:
-                        draw.text(xy = (top_left_x + int(gap_x/2) - margin_x, top_left_y + int(gap_y/2)- margin_y) , text=str(card_idx + idx_offset), fill=(255, 255, 255), font=font)
-                card_idx += 1
-
-        return spread
\ No newline at end of file
+    async def draw_inv_card_spread(cards: List[Card], bg_size, card_grid, draw_blanks, bg = "inventorybg.jpg", draw_idx = False, idx_offset = 1) -> BytesIO:
+        card_pngs = await DrawUtils.keyed_pngs(cards)
+        return BytesIO(await DrawUtils.render_backend.run(renderjobs.compose_spread, card_pngs, bg_size, card_grid, draw_blanks, bg, draw_idx, idx_offset))
+
+
+Metrics.watch_cache("render", DrawUtils.render_cache.cache_info)
+Metrics.watch_cache("render_store", DrawUtils.render_store.cache_info)
+Metrics.watch_cache("summon", DrawUtils.summon_cache.cache_info)
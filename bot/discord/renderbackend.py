@@ -0,0 +1,59 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+from typing import Optional
+
+from discord import renderjobs
+
+
+class RenderBackend():
+    """Where discord.renderjobs run. "thread" is a pool in this process, cheap to hand work to but
+    CardConstructor and PIL hold the GIL for most of a render, so concurrent inventories take turns.
+    "process" is a pool of worker processes that render on separate cores, at the cost of pickling
+    card images and pngs across. Workers are spawned rather than forked so they don't inherit the
+    bot's threads and connections (app.py keeps its startup under a main guard for this).
+    The pool is created on first use, warm() starts every worker up front."""
+
+    kinds = ("thread", "process")
+
+    def __init__(self, kind: str, workers: int) -> None:
+        if kind not in self.kinds:
+            raise ValueError(f"render backend must be one of {self.kinds}, not {kind!r}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.executor: Optional[Executor] = None
+        self.lock = threading.Lock()
+
+    def get_executor(self) -> Executor:
+        with self.lock:
+            if self.executor is None:
+                if self.kind == "process":
+                    self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=renderjobs.warm)
+                else:
+                    self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="render", initializer=renderjobs.warm)
+            return self.executor
+
+    async def run(self, func, *args):
+        executor = self.get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # a worker died (oom killed, usually) and took the pool with it, the next call gets a fresh one
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = None
+            raise
+
+    def warm(self):
+        # blocking, call it from a thread
+        executor = self.get_executor()
+        pids = set(future.result() for future in [executor.submit(renderjobs.ready, 0.2) for _ in range(self.workers)])
+        print(f"render backend: {self.kind}, {len(pids) if self.kind == 'process' else self.workers} workers up")
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
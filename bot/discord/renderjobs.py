@@ -0,0 +1,208 @@
+"""
+The CPU heavy half of DrawUtils: card renders and the spreads, shop mat and summon gif built from
+them. Everything here takes plain picklable data (card fields, image bytes) and hands back encoded
+bytes, with no database or discord objects, so RenderBackend can run it in a worker process as
+easily as in a thread.
+"""
+from io import BytesIO
+import os
+import threading
+import time
+from typing import List, NamedTuple, Tuple
+
+from cachetools import LRUCache
+from PIL import Image, ImageDraw, ImageOps
+from cardmaker import CardConstructor
+from discord.assetcache import AssetCache
+from envvars import Env
+
+
+class CardJob(NamedTuple):
+    card_style: str
+    title: str
+    attribute: str
+    level: str
+    type: str
+    description: str
+    atk: str
+    defe: str
+    cost: int
+    image: bytes
+
+    @staticmethod
+    def from_card(card, image: bytes) -> "CardJob":
+        # image is passed in rather than read off card.image, on an async session bin has to be awaited
+        return CardJob(card.card_style, card.title, card.attribute, card.level, card.type, card.description,
+                       card.atk, card.defe, card.cost, image)
+
+
+def render_card(job: CardJob) -> bytes:
+    print(f"card draw {job.title}")
+    addons = []
+    if job.cost > 400:
+        addons.append("foil_txt")
+    elif job.cost > 300:
+        addons.append("guild_txt")
+    if job.cost > 500:
+        addons.append("foil_pic")
+    input_data = {
+        "card": job.card_style,
+        "Title": job.title,
+        "attribute": job.attribute,
+        "Level": int(job.level),
+        "Type": job.type,
+        "Descripton": str(job.description).replace('\\n','\n'),
+        "Atk": job.atk,
+        "Def": job.defe,
+        "Addons": addons
+        }
+    input_data["image_card"] = Image.open(BytesIO(job.image))
+    output = CardConstructor(input_data)
+    return output.generateCard()
+
+
+class TileCache():
+    """Card renders already decoded and scaled to a layout cell: a 6x4 inventory cell, a pack row
+    cell, a shop slot, by (render key, cell size). Spreads and the shop mat paste these instead of
+    decoding and downsampling a full size png per cell, and the same card twice in a spread is one
+    tile. Tiles are only ever pasted from, so they're shared rather than copied. Each render process
+    keeps its own, bounded by decoded bytes."""
+
+    framed_bg = (203, 189, 147)
+    frame = 10
+
+    lock = threading.Lock()
+    tiles = LRUCache(maxsize=Env.render_tile_bytes, getsizeof=lambda tile: tile.width * tile.height * len(tile.getbands()))
+
+    @staticmethod
+    def get(key: str, png: bytes, size, framed: bool) -> Image.Image:
+        tile_key = (key, tuple(size), framed)
+        with TileCache.lock:
+            tile = TileCache.tiles.get(tile_key)
+        if tile is None:
+            tile = TileCache.make(png, size, framed)
+            # cachetools raises on anything bigger than the whole cache, RENDER_TILE_BYTES=0 turns it off
+            if TileCache.tiles.getsizeof(tile) <= TileCache.tiles.maxsize:
+                with TileCache.lock:
+                    TileCache.tiles[tile_key] = tile
+        return tile
+
+    @staticmethod
+    def make(png: bytes, size, framed: bool) -> Image.Image:
+        image_card = Image.open(BytesIO(png))
+        if not framed:
+            return image_card.resize(size)
+        image_bg = Image.new('RGBA', (image_card.size[0] + 2 * TileCache.frame, image_card.size[1] + 2 * TileCache.frame), TileCache.framed_bg)
+        image_bg.paste(image_card, (TileCache.frame, TileCache.frame))
+        return ImageOps.contain(image_bg, size)
+
+    @staticmethod
+    def blank(key: str, png: bytes, size) -> Image.Image:
+        # an empty frame the size the card's would be, for the unfilled cells of a grid
+        return Image.new('RGBA', TileCache.get(key, png, size, True).size, TileCache.framed_bg)
+
+
+def to_png(image: Image.Image) -> bytes:
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def compose_spread(card_pngs: List[Tuple[str, bytes]], bg_size, card_grid, draw_blanks, bg: str, draw_idx: bool, idx_offset: int) -> bytes:
+    spread = AssetCache.image(bg, bg_size)
+
+    margin_x = 20
+    margin_y = 20
+
+    draw = ImageDraw.Draw(spread)
+    rect_size = (int(bg_size[0]/card_grid[0] - (margin_x*1.5)), int(bg_size[1]/card_grid[1] - (1.5*margin_y)))
+
+    font = AssetCache.font(20)
+
+    card_idx = 0
+    for y in range(card_grid[1]):
+        for x in range(card_grid[0]):
+            top_left_x = rect_size[0]*x + margin_x*(x+1)
+            top_left_y = rect_size[1]*y + margin_y*(y+1)
+            if card_idx < len(card_pngs) or draw_blanks:
+                image_sized = TileCache.get(*card_pngs[card_idx], rect_size, True) if card_idx < len(card_pngs) else TileCache.blank(*card_pngs[0], rect_size)
+
+                gap_x = rect_size[0] - image_sized.size[0]
+                gap_y = rect_size[1] - image_sized.size[1]
+
+                spread.paste(image_sized, (top_left_x + int(gap_x/2), top_left_y + int(gap_y/2)))
+
+                if draw_idx:
+                    draw.text(xy = (top_left_x + int(gap_x/2) - margin_x, top_left_y + int(gap_y/2)- margin_y) , text=str(card_idx + idx_offset), fill=(255, 255, 255), font=font)
+            card_idx += 1
+
+    return to_png(spread)
+
+
+def compose_shop(card_pngs: List[Tuple[str, bytes]], card_costs: List[int], card_size, card_coords, text_coords) -> bytes:
+    shop_map = AssetCache.image("shopmat.png")
+    font = AssetCache.font(40)
+    shop_draw = ImageDraw.Draw(shop_map)
+    for idx, (key, card_png) in enumerate(card_pngs):
+        shop_map.paste(TileCache.get(key, card_png, card_size, False), card_coords[idx])
+        shop_draw.text(text_coords[idx], str(card_costs[idx]), (0, 0, 0), font)
+    return to_png(shop_map)
+
+
+summon_card_size = (250, 270)
+summon_card_pos = (60, -15)
+# the card shows up on the last few frames
+summon_overlaid = 3
+
+
+def summon_overlay(card_png: bytes) -> Image.Image:
+    card_image = Image.open(BytesIO(card_png))
+    card_image = card_image.resize(summon_card_size)
+
+    width, height = card_image.size
+    m = -0.5
+    xshift = abs(m) * width
+    new_width = width + int(round(xshift))
+    card_image = card_image.transform((new_width, height), Image.AFFINE,
+            (1, m, -xshift if m > 0 else 0, 0, 1, 0), Image.BICUBIC)
+
+    return card_image.rotate(15, expand=1)
+
+
+def compose_summon(card_png: bytes, image_format: str = "GIF") -> bytes:
+    overlay = summon_overlay(card_png)
+    frames = AssetCache.frames("summon.gif")
+    for frame in frames[-summon_overlaid:]:
+        frame.paste(overlay, summon_card_pos, overlay)
+    durations = [frame.info.get("duration", 100) for frame in frames]
+
+    buffered = BytesIO()
+    if image_format == "WEBP":
+        # no loop extension in a gif means it plays once, in webp that's 1 rather than 0
+        frames[0].save(buffered, format="WEBP", save_all=True, append_images=frames[1:], duration=durations, loop=frames[0].info.get("loop", 1), quality=80, method=4)
+    else:
+        # the frames without the card come already quantized, only the ones it's pasted on need it
+        frames = AssetCache.frames("summon.gif", palette=True)[:-summon_overlaid] + [
+            frame if frame.mode == "P" else frame.convert("P", palette=Image.Palette.ADAPTIVE) for frame in frames[-summon_overlaid:]]
+        frames[0].save(buffered, format="GIF", save_all=True, append_images=frames[1:], duration=durations)
+    return buffered.getvalue()
+
+
+# what the commands ask for, decoded before the first of them does
+warm_assets = [("inventorybg.jpg", (1600, 1200)), ("inventorybg.jpg", (1600, 1600)), ("boostermat.jpeg", (1400, 400)), ("shopmat.png", None)]
+
+
+def warm():
+    # worker initializer
+    Image.init()
+    for name, size in warm_assets:
+        AssetCache.image(name, size)
+    AssetCache.frames("summon.gif", palette=True)
+    AssetCache.font(20)
+    AssetCache.font(40)
+
+
+def ready(hold: float) -> int:
+    # held briefly so each of RenderBackend.warm's calls lands on a different worker
+    time.sleep(hold)
+    return os.getpid()
@@ -0,0 +1,169 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from cachetools import LRUCache
+
+
+class StoreInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class RenderMemory():
+    """Recently used renders in memory, in front of RenderStore. Lookups and renders happen in
+    different places (the loop checks, a RenderBackend worker renders), so this counts its own hits
+    instead of leaning on cachetools' cached()."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.cache = LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def maxsize(self) -> int:
+        return self.cache.maxsize
+
+    def contains(self, key: str) -> bool:
+        # touches the entry like a hit would, without counting as one
+        with self.lock:
+            return self.cache.get(key) is not None
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            data = self.cache.get(key)
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        with self.lock:
+            self.cache[key] = data
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def cache_info(self) -> StoreInfo:
+        with self.lock:
+            return StoreInfo(self.hits, self.misses, self.cache.maxsize, self.cache.currsize)
+
+
+class RenderStore():
+    """Rendered card PNGs on disk, keyed by DrawUtils.render_key (a hash of what the card looks like,
+    not its id), behind the in-memory render cache. It outlives restarts so a cold bot serves
+    inventories without re-rendering, and the /preview endpoint reads the same directory.
+    Bounded by total bytes, least recently used goes first. The index is built from the directory
+    on first use, ordered by mtime, and a hit bumps the mtime so the order survives a restart too."""
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and self.max_bytes > 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def load(self):
+        # caller holds the lock
+        if self.loaded:
+            return
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".png"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                found.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total += size
+        self.loaded = True
+        print(f"render store: {len(self.entries)} renders, {self.total / 1024 / 1024:.1f}MB in {self.directory}")
+
+    def ensure_loaded(self):
+        # the first load walks the whole directory, the loop calls this from a thread before contains
+        if not self.enabled:
+            return
+        with self.lock:
+            self.load()
+
+    def contains(self, key: str) -> bool:
+        # only a hint, the file can be evicted or deleted before it's read
+        if not self.enabled:
+            return False
+        with self.lock:
+            self.load()
+            return key in self.entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        with self.lock:
+            self.load()
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+        try:
+            with open(self.path(key), "rb") as fp:
+                data = fp.read()
+            os.utime(self.path(key))
+        except OSError:
+            # evicted or cleared underneath us
+            with self.lock:
+                self.total -= self.entries.pop(key, 0)
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        if not self.enabled:
+            return
+        path = self.path(key)
+        with self.lock:
+            self.load()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written aside and swapped in, a reader never sees half a png
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as fp:
+                fp.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"render store: couldn't write {key}: {e}")
+            return
+        with self.lock:
+            self.total += len(data) - self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            evicted = []
+            while self.total > self.max_bytes and len(self.entries) > 1:
+                old_key, size = self.entries.popitem(last=False)
+                self.total -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self.path(old_key))
+            except OSError:
+                pass
+
+    def cache_info(self) -> StoreInfo:
+        with self.lock:
+            return StoreInfo(self.hits, self.misses, self.max_bytes, len(self.entries))
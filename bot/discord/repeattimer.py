@@ -1,6 +1,8 @@
 from threading import Timer
+from metrics import Metrics
 
 class RepeatTimer(Timer):
     def run(self):
         while not self.finished.wait(self.interval):
-            self.function(*self.args, **self.kwargs)
\ No newline at end of file
+            with Metrics.timer_tick.labels(self.function.__name__).time():
+                self.function(*self.args, **self.kwargs)
\ No newline at end of file
@@ -7,12 +7,35 @@ class Env():
     db_name = os.environ['POSTGRES_DB']
     
     db_conn_str = f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}/{db_name}"
+    db_conn_str_async = f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}/{db_name}"
     discord_token = os.environ['DISCORD_TOKEN']
     discord_token_debug = os.environ['DISCORD_TOKEN_DEBUG']
     is_debug = os.environ['IS_DEBUG']
     league_token = os.environ['LEAGUE_TOKEN']
     web_port = os.environ['WEB_PORT']
     active_discord_token = discord_token if is_debug == "false" else discord_token_debug
+    # similarity cutoff for the % operator in card search, lower finds looser matches
+    trigram_threshold = os.environ.get('TRIGRAM_THRESHOLD', '0.3')
+    # riot key limits in X-App-Rate-Limit / X-Method-Rate-Limit format, defaults are a dev key's
+    riot_app_limits = os.environ.get('RIOT_APP_LIMITS', '20:1,100:120')
+    riot_spectator_limits = os.environ.get('RIOT_SPECTATOR_LIMITS', '20000:10,1200000:600')
+    riot_poll_workers = int(os.environ.get('RIOT_POLL_WORKERS', '8'))
+    # seconds a polling tick gets before stragglers are dropped
+    riot_poll_deadline = float(os.environ.get('RIOT_POLL_DEADLINE', '20'))
+    # ask spectator whether an open match is still going before fetching the match itself
+    spectator_finish_check = os.environ.get('SPECTATOR_FINISH_CHECK', 'true') == 'true'
+    # send riot calls somewhere other than *.api.riotgames.com, e.g. tools.riot_standin for load tests
+    riot_base_url = os.environ.get('RIOT_BASE_URL', '')
+    # rendered cards on disk behind the in-memory cache, empty dir turns it off
+    render_cache_dir = os.environ.get('RENDER_CACHE_DIR', '/var/cache/brancoin/render')
+    render_cache_bytes = int(os.environ.get('RENDER_CACHE_BYTES', str(512 * 1024 * 1024)))
+    # "thread" or "process", a process pool renders concurrent requests on separate cores
+    render_backend = os.environ.get('RENDER_BACKEND', 'thread')
+    render_workers = int(os.environ.get('RENDER_WORKERS', str(os.cpu_count() or 2)))
+    # decoded, pre-scaled cards kept for spread cells, per render process
+    render_tile_bytes = int(os.environ.get('RENDER_TILE_BYTES', str(64 * 1024 * 1024)))
+    # "gif" or "webp" for bran summon, webp is a fraction of the size
+    summon_format = os.environ.get('SUMMON_FORMAT', 'gif')
 
     pushover_token = os.environ['PUSHOVER_TOKEN']
     pushover_user = os.environ['PUSHOVER_USER']
\ No newline at end of file
@@ -0,0 +1,71 @@
+import json
+import os
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+
+class Champion(NamedTuple):
+    key: str
+    id: str
+    name: str
+    title: str
+    tags: Tuple[str, ...]
+    image: str
+    version: str
+
+    def icon_url(self) -> str:
+        return f"https://ddragon.leagueoflegends.com/cdn/{self.version}/img/champion/{self.image}"
+
+
+class ChampionIndex():
+    """Process wide index over league/champion.json (a Data Dragon champion dump).
+    Built on first use and rebuilt only when the file's mtime changes, see tools.regen_champions."""
+
+    path = os.path.dirname(__file__) + "/champion.json"
+    lock = threading.Lock()
+    mtime = None
+    by_key: Dict[str, Champion] = {}
+    by_name: Dict[str, Champion] = {}
+
+    @staticmethod
+    def build(champion_data) -> Tuple[Dict[str, Champion], Dict[str, Champion]]:
+        version = champion_data.get("version", "")
+        by_key = {}
+        by_name = {}
+        for champion_id, value in champion_data["data"].items():
+            champion = Champion(str(value["key"]), champion_id, value.get("name", champion_id), value.get("title", ""),
+                                tuple(value.get("tags", [])), value.get("image", {}).get("full", f"{champion_id}.png"), value.get("version", version))
+            by_key[champion.key] = champion
+            # reverse lookups work on either the id ("MonkeyKing") or the display name ("Wukong")
+            by_name[champion.id.lower()] = champion
+            by_name[champion.name.lower()] = champion
+        return by_key, by_name
+
+    @classmethod
+    def refresh(cls):
+        mtime = os.stat(cls.path).st_mtime
+        if mtime == cls.mtime:
+            return
+        with cls.lock:
+            if mtime == cls.mtime:
+                return
+            with open(cls.path) as fp:
+                by_key, by_name = cls.build(json.load(fp))
+            # swapped in whole so lookups on other threads never see a half built index
+            cls.by_key, cls.by_name, cls.mtime = by_key, by_name, mtime
+            print(f"loaded {len(by_key)} champions from {cls.path}")
+
+    @classmethod
+    def get(cls, key) -> Optional[Champion]:
+        cls.refresh()
+        return cls.by_key.get(str(key))
+
+    @classmethod
+    def find(cls, name: str) -> Optional[Champion]:
+        cls.refresh()
+        return cls.by_name.get(name.lower())
+
+    @classmethod
+    def name(cls, key) -> str:
+        champion = cls.get(key)
+        return champion.id if champion else "Unknown"
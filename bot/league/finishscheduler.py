@@ -0,0 +1,100 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class FinishState():
+    __slots__ = ("game_start", "match_type", "phase", "next_check", "backoff")
+
+    def __init__(self, game_start: float, match_type: Optional[str], phase: str, next_check: float, backoff: float) -> None:
+        # wall clock, game_start is when the game itself started, not when we noticed it
+        self.game_start = game_start
+        self.match_type = match_type
+        self.phase = phase
+        self.next_check = next_check
+        self.backoff = backoff
+
+
+class FinishScheduler():
+    """Decides when handle_finished_games looks at an open match. Nothing is checked before the
+    game could plausibly be over for its mode. After that a tracked player is checked in spectator
+    (small, and it tells us how long the game has been going), and the match payload is only fetched
+    once they've left the game. match.by_id retries back off since the result can lag the game ending."""
+
+    # earliest a game of this mode is realistically over (surrenders), and a typical length
+    durations = {"ARAM": (10 * 60, 18 * 60), "CLASSIC": (15 * 60, 28 * 60), "URF": (10 * 60, 17 * 60)}
+    default_duration = (15 * 60, 25 * 60)
+    spectator_interval = (60, 5 * 60)
+    match_backoff = (30, 5 * 60)
+
+    def __init__(self, use_spectator: bool = True) -> None:
+        self.use_spectator = use_spectator
+        self.states: Dict[str, FinishState] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def game_start(spectator_data) -> float:
+        # gameStartTime is 0 while the game is still loading
+        if spectator_data.get('gameStartTime', 0) > 0:
+            return spectator_data['gameStartTime'] / 1000
+        return time.time() - spectator_data.get('gameLength', 0)
+
+    def duration(self, match_type: Optional[str]):
+        return self.durations.get(match_type, self.default_duration)
+
+    def track(self, match_id, match_type: Optional[str], game_start: float):
+        shortest, typical = self.duration(match_type)
+        if self.use_spectator:
+            state = FinishState(game_start, match_type, "spectator", game_start + shortest, self.match_backoff[0])
+        else:
+            state = FinishState(game_start, match_type, "match", game_start + (shortest + typical) / 2, self.match_backoff[0])
+        with self.lock:
+            self.states[str(match_id)] = state
+
+    def state(self, match_id, match_type: Optional[str], fallback_start: float) -> FinishState:
+        # matches from before a restart only have Match.start_time, which is when we found them
+        with self.lock:
+            state = self.states.get(str(match_id))
+        if state is None:
+            self.track(match_id, match_type, fallback_start)
+        return self.states[str(match_id)]
+
+    def due(self, match_id, match_type: Optional[str], fallback_start: float, now: float = None) -> Optional[str]:
+        now = time.time() if now is None else now
+        state = self.state(match_id, match_type, fallback_start)
+        return state.phase if state.next_check <= now else None
+
+    def still_playing(self, match_id, game_length: float, now: float = None):
+        now = time.time() if now is None else now
+        state = self.states[str(match_id)]
+        _, typical = self.duration(state.match_type)
+        # halve what's left of a typical game, so checks close in as the end gets near
+        wait = min(max((typical - game_length) / 2, self.spectator_interval[0]), self.spectator_interval[1])
+        with self.lock:
+            state.game_start = now - game_length
+            state.next_check = now + wait
+
+    def left_game(self, match_id, now: float = None):
+        now = time.time() if now is None else now
+        state = self.states[str(match_id)]
+        with self.lock:
+            state.phase = "match"
+            state.next_check = now
+            state.backoff = self.match_backoff[0]
+
+    def not_finished(self, match_id, now: float = None):
+        now = time.time() if now is None else now
+        state = self.states[str(match_id)]
+        with self.lock:
+            state.next_check = now + state.backoff
+            state.backoff = min(state.backoff * 2, self.match_backoff[1])
+
+    def retry_later(self, match_id, now: float = None):
+        now = time.time() if now is None else now
+        state = self.states[str(match_id)]
+        with self.lock:
+            state.next_check = now + self.spectator_interval[0]
+
+    def finished(self, match_id):
+        with self.lock:
+            self.states.pop(str(match_id), None)
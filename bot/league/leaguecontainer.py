@@ -2,22 +2,36 @@
 from dependency_injector import containers, providers
 
 from league.leagueservice import LeagueService
+from league.riotgateway import RiotGateway
 from riotwatcher import LolWatcher, RiotWatcher
 from envvars import Env
 
 class LeagueContainer(containers.DeclarativeContainer):
+    # budgets are per key, so everything that talks to riot has to share this one
+    gateway = providers.Singleton(
+        RiotGateway,
+        app_limits=Env.riot_app_limits,
+        method_limits={"SpectatorApiV5.by_summoner": Env.riot_spectator_limits},
+    )
+
+    # a hung call would hold a polling worker past the tick deadline
     api_client = providers.Singleton(
         LolWatcher,
         api_key=Env.league_token,
+        timeout=10,
+        rate_limiter=gateway,
     )
 
     riot_api_client = providers.Singleton(
         RiotWatcher,
         api_key=Env.league_token,
+        timeout=10,
+        rate_limiter=gateway,
     )
 
-    service = providers.Factory(
+    service = providers.Singleton(
         LeagueService,
         lol_watcher=api_client,
-        riot_watcher=riot_api_client
+        riot_watcher=riot_api_client,
+        gateway=gateway
     )
\ No newline at end of file
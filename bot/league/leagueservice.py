@@ -1,45 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor, wait
 from functools import lru_cache
 import json
 from os import name
 import os
+import threading
+import time
 import traceback
 from riotwatcher import LolWatcher, RiotWatcher
 import riotwatcher
 from riotwatcher.LolWatcher import MatchApiV5
+from riotwatcher._apis import UrlConfig
 
+from envvars import Env
+from league.championindex import ChampionIndex
+from league.riotgateway import RiotGateway
 from models.models import LeagueUser, Match
 
+class PollTick():
+    # shared by one get_valid_games pass. every puuid seen in a spectator response (or 404'd, not in
+    # a game) is resolved for the rest of the tick, so a premade only costs the first of its calls
+    def __init__(self, deadline: float = None) -> None:
+        self.deadline = deadline
+        self.resolved = set()
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def claim(self, puuid: str) -> bool:
+        with self.lock:
+            if puuid in self.resolved:
+                self.skipped += 1
+                return False
+            return True
+
+    def resolve(self, puuids):
+        with self.lock:
+            self.resolved.update(puuids)
+
+    def answered(self, puuids) -> set:
+        with self.lock:
+            return self.resolved.intersection(puuids)
+
 class LeagueService():
     region_riot_api = "americas"
     region_lol = "NA1"
 
-    def __init__(self, lol_watcher: LolWatcher, riot_watcher: RiotWatcher) -> None:
+    # the spectator fan-out runs here, the gateway keeps it inside the key's limits
+    poll_pool = ThreadPoolExecutor(max_workers=Env.riot_poll_workers, thread_name_prefix="spectator")
+    # puuid -> the last game id we saw them in, players who last played together get polled as a group
+    last_games = {}
+
+    def __init__(self, lol_watcher: LolWatcher, riot_watcher: RiotWatcher, gateway: RiotGateway, base_url: str = Env.riot_base_url) -> None:
         self.api_riot_watcher = riot_watcher
         self.api_lol_watcher = lol_watcher
         self.api_match : MatchApiV5 = lol_watcher.match
+        self.gateway = gateway
+        if base_url:
+            self.point_at(base_url)
+
+    @staticmethod
+    def point_at(base_url: str):
+        # riotwatcher's kernel_url would also drop the rate limiter, so only the host is swapped.
+        # it's process wide, and LolWatcher resets it when constructed
+        UrlConfig.root_url = base_url.rstrip("/") + "/{platform}"
+        UrlConfig.riot_url = base_url.rstrip("/") + "/{platform}"
+        print(f"riot calls go to {base_url}")
 
     def get_puuid(self, league_user: LeagueUser):
-        return self.api_riot_watcher.account.by_riot_id(region=self.region_riot_api, game_name=league_user.summoner_name, tag_line=league_user.tag)['puuid']
+        return self.gateway.call("account.by_riot_id", self.api_riot_watcher.account.by_riot_id, region=self.region_riot_api, game_name=league_user.summoner_name, tag_line=league_user.tag)['puuid']
 
     def get_matches(self, league_user: LeagueUser):
-        return self.api_match.matchlist_by_puuid(self.region_lol, league_user.puuid)
+        return self.gateway.call("match.matchlist_by_puuid", self.api_match.matchlist_by_puuid, self.region_lol, league_user.puuid)
 
-    def get_valid_game(self, league_user: LeagueUser, trackable_users: list[LeagueUser]):
+    def get_valid_game(self, league_user: LeagueUser, trackable_users: list[LeagueUser], tick: PollTick = None):
+        tick = tick or PollTick()
         print("get valid game for " )
         try:
             puuid = league_user.puuid
             if puuid:
-                spectator_data = self.api_lol_watcher.spectator.by_summoner(self.region_lol, puuid)
+                if not tick.claim(puuid):
+                    return None
+                spectator_data = self.gateway.call("spectator.by_summoner", self.api_lol_watcher.spectator.by_summoner, self.region_lol, puuid, deadline=tick.deadline)
             else: return None
-        except:
+        except Exception as e:
+            if getattr(getattr(e, "response", None), "status_code", None) == 404:
+                # not in a game, that's an answer too
+                tick.resolve([puuid])
             return None
         print ("got active game for " )
 
+        participants = {participant['puuid']: participant for participant in spectator_data['participants']}
+        tick.resolve(participants.keys())
+        for user in trackable_users:
+            if user.puuid in participants:
+                self.last_games[user.puuid] = spectator_data['gameId']
+
         if spectator_data['gameMode'] != "ARAM" and spectator_data['gameMode'] != "CLASSIC" and spectator_data['gameMode'] != "URF":
             print("Not a valid game mode")
             return None
 
-        user_participant = list(map(lambda user: {'league_user': user, 'participant_json': self.find_participant(user, spectator_data['participants'])}, trackable_users))
+        user_participant = list(map(lambda user: {'league_user': user, 'participant_json': self.find_participant(user, participants)}, trackable_users))
         valid_participants = list(filter(lambda x: x['participant_json'] is not None, user_participant))
 
         if len(valid_participants) > 0:
@@ -52,42 +111,122 @@ class LeagueService():
             print("Not enough valid players")
             return None
 
-    def get_valid_games(self, league_users: list[LeagueUser], trackable_users: list[LeagueUser]):
+    def get_valid_games(self, league_users: list[LeagueUser], trackable_users: list[LeagueUser], deadline_seconds: float = Env.riot_poll_deadline):
+        # a tick takes as long as its slowest call, whatever is still running at the deadline is left for the next tick.
+        # also returns the puuids spectator actually answered for, calls that were dropped, failed or
+        # didn't finish in time say nothing about whether the player is playing
+        tick = PollTick(time.monotonic() + deadline_seconds)
+        # premades usually queue again together. polling each group in order on one worker means the
+        # first response resolves the rest, in parallel they'd all be in flight before it came back
+        groups = {}
+        for league_user in league_users:
+            groups.setdefault(self.last_games.get(league_user.puuid, league_user.puuid), []).append(league_user)
+        futures = [self.poll_pool.submit(self.get_valid_group, group, trackable_users, tick) for group in groups.values()]
+        done, not_done = wait(futures, timeout=deadline_seconds)
+        if len(not_done) > 0:
+            print(f"{len(not_done)} of {len(futures)} spectator groups missed the tick deadline")
+        if tick.skipped > 0:
+            print(f"skipped {tick.skipped} spectator calls for players already found in a game this tick")
         all_valid_games = []
+        for future in done:
+            try:
+                all_valid_games.extend(future.result())
+            except Exception as e:
+                print(e)
+        unique_valid_games = {x['spectator_data']['gameId']: x for x in all_valid_games}.values()
+        return unique_valid_games, tick.answered(league_user.puuid for league_user in league_users)
+
+    def get_valid_group(self, league_users: list[LeagueUser], trackable_users: list[LeagueUser], tick: PollTick):
+        valid_games = []
         for league_user in league_users:
-            valid_game = self.get_valid_game(league_user, trackable_users)
+            valid_game = self.get_valid_game(league_user, trackable_users, tick)
             if valid_game:
-                all_valid_games.append(valid_game)
-        unique_valid_games = {x['spectator_data']['gameId']: x for x in all_valid_games}.values()
-        return unique_valid_games
+                valid_games.append(valid_game)
+        return valid_games
 
     def champ_id_to_name(self, search_id):
-        with open(os.path.dirname(__file__) + '/champion.json') as fp:
-            champion_data = json.load(fp)
-            for attribute, value in champion_data['data'].items():
-                if value['key'] == str(search_id):
-                    return attribute
-        return "Unknown"
+        return ChampionIndex.name(search_id)
+
 
+    def find_participant(self, user_to_find: LeagueUser, participants_by_puuid: dict):
+        return participants_by_puuid.get(user_to_find.puuid)
 
-    def find_participant(self, user_to_find: LeagueUser, participants_to_search):
-        return next(filter(lambda participant: participant['puuid'] == user_to_find.puuid, participants_to_search), None)
+    def get_live_game_length(self, match: Match):
+        # seconds into the game while any of our players is still in it, None once none of them are.
+        # one player leaving, dodging or requeueing says nothing about the rest, so each is asked until
+        # one is found in it. raises if spectator couldn't say for someone and nobody was found
+        error = None
+        for match_player in match.match_players:
+            puuid = match_player.league_user.puuid
+            if not puuid:
+                continue
+            try:
+                spectator_data = self.gateway.call("spectator.by_summoner", self.api_lol_watcher.spectator.by_summoner, self.region_lol, puuid)
+            except Exception as e:
+                if getattr(getattr(e, "response", None), "status_code", None) != 404:
+                    error = e
+                continue
+            if str(spectator_data['gameId']) == str(match.match_id):
+                return spectator_data['gameLength']
+        if error is not None:
+            raise error
+        return None
+
+    @staticmethod
+    def summarize_game(game, match: Match):
+        # what we keep of a match-v5 payload in match_result.summary. the full thing is ~25kB of
+        # timeline, perks and pings for all ten players, this is the team results plus our players.
+        # short keys since it's repeated for every row
+        info = game['info']
+        participants = {p['puuid']: p for p in info['participants']}
+        players = {}
+        for match_player in match.match_players:
+            participant = participants.get(match_player.league_user.puuid)
+            if participant is None:
+                continue
+            players[str(match_player.league_user_id)] = {
+                "champ": participant['championId'],
+                "team": participant['teamId'],
+                "win": participant['win'] == True,
+                "k": participant['kills'],
+                "d": participant['deaths'],
+                "a": participant['assists'],
+                "dmg": participant['totalDamageDealtToChampions'],
+                "gold": participant['goldEarned'],
+                "cs": participant['totalMinionsKilled'] + participant.get('neutralMinionsKilled', 0),
+                "pos": participant.get('teamPosition', ""),
+            }
+        if len(players) == 0:
+            return None
+        return {
+            "v": 1,
+            "mode": info.get('gameMode'),
+            "queue": info.get('queueId'),
+            "patch": ".".join(info.get('gameVersion', "").split(".")[:2]),
+            "duration": info['gameDuration'],
+            "end": info.get('gameEndTimestamp'),
+            "won": next(iter(players.values()))['win'],
+            "teams": {str(team['teamId']): {"win": team['win'], "kills": team['objectives']['champion']['kills']} for team in info['teams']},
+            "players": players,
+        }
 
     def get_game(self, game_to_check: Match):
         try:
-            game = self.api_lol_watcher.match.by_id(self.region_lol, f"NA1_{str(game_to_check.match_id)}")
+            game = self.gateway.call("match.by_id", self.api_lol_watcher.match.by_id, self.region_lol, f"NA1_{str(game_to_check.match_id)}")
             extra_data = {}
             try:
                 our_players = game_to_check.match_players
                 our_team_id = None
                 damage_dealt = []
+                participants = {p['puuid']: p for p in game['info']['participants']}
                 for our_player in our_players:
                     puuid = our_player.league_user.puuid
-                    participant_data = next(filter(lambda p : p['puuid'] == puuid, game['info']['participants']))
+                    participant_data = participants[puuid]
                     damage_dealt.append((our_player.league_user, participant_data['totalDamageDealtToChampions']))
                     extra_data['our_team_won'] = participant_data['win'] == True
 
                 extra_data['damage_dealt'] = damage_dealt
+                extra_data['summary'] = self.summarize_game(game, game_to_check)
                 print("extra_data")
                 print(extra_data)
             except Exception as e:
@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+class PollState():
+    __slots__ = ("next_poll", "interval", "last_seen")
+
+    def __init__(self, next_poll: float, interval: float, last_seen: Optional[float]) -> None:
+        self.next_poll = next_poll
+        self.interval = interval
+        # wall clock of the last time we saw them in a game, None if never
+        self.last_seen = last_seen
+
+
+class PollScheduler():
+    """Decides which trackable players look_for_open_games actually asks spectator about.
+    Each player has a next poll time: it starts at base_interval and doubles every time they're
+    not in a game, capped by how long ago we last saw them play. Players already in an open match
+    are skipped until it finishes, and a finished game puts them straight back to the base interval
+    since people tend to queue again."""
+
+    base_interval = 30
+    # (seen within this many seconds, max interval)
+    caps = [(3 * 60 * 60, 45), (7 * 24 * 60 * 60, 10 * 60)]
+    never_seen_cap = 10 * 60
+    dormant_cap = 30 * 60
+
+    def __init__(self) -> None:
+        self.states: Dict[int, PollState] = {}
+        self.lock = threading.Lock()
+        self.seeded = False
+
+    def seed(self, last_seen: Dict[int, float]):
+        # from the match history, so a restart doesn't treat everyone as brand new
+        with self.lock:
+            for league_user_id, seen in last_seen.items():
+                state = self.state(league_user_id)
+                state.last_seen = max(state.last_seen or 0, seen)
+            self.seeded = True
+
+    def state(self, league_user_id: int) -> PollState:
+        if league_user_id not in self.states:
+            self.states[league_user_id] = PollState(0, self.base_interval, None)
+        return self.states[league_user_id]
+
+    def cap_for(self, state: PollState, now_wall: float) -> float:
+        if state.last_seen is None:
+            return self.never_seen_cap
+        idle = now_wall - state.last_seen
+        for window, cap in self.caps:
+            if idle < window:
+                return cap
+        return self.dormant_cap
+
+    def due(self, league_users: Iterable, busy_ids: Iterable[int], now: float = None) -> List:
+        now = time.monotonic() if now is None else now
+        busy_ids = set(busy_ids)
+        with self.lock:
+            return [league_user for league_user in league_users
+                    if league_user.id not in busy_ids and self.state(league_user.id).next_poll <= now]
+
+    def mark_polled(self, league_user_ids: Iterable[int], now: float = None):
+        now = time.monotonic() if now is None else now
+        now_wall = time.time()
+        with self.lock:
+            for league_user_id in league_user_ids:
+                state = self.state(league_user_id)
+                state.next_poll = now + state.interval
+                state.interval = min(state.interval * 2, self.cap_for(state, now_wall))
+
+    def mark_in_game(self, league_user_ids: Iterable[int]):
+        now_wall = time.time()
+        with self.lock:
+            for league_user_id in league_user_ids:
+                state = self.state(league_user_id)
+                state.last_seen = now_wall
+                state.interval = self.base_interval
+
+    def mark_game_over(self, league_user_ids: Iterable[int], now: float = None):
+        now = time.monotonic() if now is None else now
+        now_wall = time.time()
+        with self.lock:
+            for league_user_id in league_user_ids:
+                state = self.state(league_user_id)
+                state.last_seen = now_wall
+                state.interval = self.base_interval
+                state.next_poll = now
+
+    def stats(self) -> str:
+        with self.lock:
+            if len(self.states) == 0:
+                return "poll scheduler: no players"
+            intervals = sorted(state.interval for state in self.states.values())
+            return f"poll scheduler: {len(intervals)} players, interval min {intervals[0]:.0f}s median {intervals[len(intervals) // 2]:.0f}s max {intervals[-1]:.0f}s"
@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import List, Optional
+
+
+class TokenBucket():
+    def __init__(self, limit: int, per_seconds: float) -> None:
+        self.per_seconds = per_seconds
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+        self.set_limit(limit)
+
+    def set_limit(self, limit: int):
+        self.limit = max(1, limit)
+        self.rate = self.limit / self.per_seconds
+        self.tokens = min(self.tokens, self.limit)
+
+    def refill(self, now: float):
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def __repr__(self) -> str:
+        return f"TokenBucket({self.limit}:{self.per_seconds}, tokens={self.tokens:.1f})"
+
+
+class RateLimiter():
+    """A request needs a token from every bucket, so an app limiter's buckets can be shared into
+    each method limiter. Specs use Riot's header format, "20:1,100:120" is 20 per second and 100 per 2 minutes."""
+
+    # taking from several buckets has to be atomic, there's only ever a handful of riot threads
+    lock = threading.Lock()
+
+    def __init__(self, buckets: List[TokenBucket]) -> None:
+        self.buckets = buckets
+
+    @staticmethod
+    def parse(spec: str) -> "RateLimiter":
+        buckets = []
+        for entry in spec.split(","):
+            if entry.strip():
+                limit, per_seconds = entry.split(":")
+                buckets.append(TokenBucket(int(limit), float(per_seconds)))
+        return RateLimiter(buckets)
+
+    def combine(self, other: "RateLimiter") -> "RateLimiter":
+        return RateLimiter(self.buckets + other.buckets)
+
+    def sync(self, limits: str, counts: str, headroom: float = 1.0):
+        # riot's X-*-Rate-Limit and X-*-Rate-Limit-Count headers, keyed by window.
+        # headroom < 1 keeps a few requests in reserve so we queue before riot starts answering 429
+        used = {}
+        for entry in counts.split(","):
+            if entry.strip():
+                count, per_seconds = entry.split(":")
+                used[float(per_seconds)] = int(count)
+        with RateLimiter.lock:
+            by_window = {bucket.per_seconds: bucket for bucket in self.buckets}
+            buckets = []
+            for entry in limits.split(","):
+                if not entry.strip():
+                    continue
+                limit, per_seconds = entry.split(":")
+                per_seconds = float(per_seconds)
+                bucket = by_window.get(per_seconds) or TokenBucket(int(limit), per_seconds)
+                bucket.set_limit(int(int(limit) * headroom))
+                bucket.refill(time.monotonic())
+                if per_seconds in used:
+                    bucket.tokens = min(bucket.tokens, max(0, bucket.limit - used[per_seconds]))
+                buckets.append(bucket)
+            self.buckets = buckets
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        # deadline is a time.monotonic() value, gives up instead of sleeping past it
+        while True:
+            with RateLimiter.lock:
+                now = time.monotonic()
+                for bucket in self.buckets:
+                    bucket.refill(now)
+                wait = max((bucket.wait_time() for bucket in self.buckets), default=0)
+                if wait == 0:
+                    for bucket in self.buckets:
+                        bucket.tokens -= 1
+                    return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
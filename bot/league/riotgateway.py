@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Dict, Optional
+from cachetools import LRUCache, TTLCache
+from cachetools.keys import hashkey
+from riotwatcher import RateLimiter as WatcherRateLimiter
+from league.ratelimiter import RateLimiter
+from metrics import Metrics
+
+
+class RiotBudgetExceeded(Exception):
+    pass
+
+
+class RiotGateway(WatcherRateLimiter):
+    """The one way out to the Riot API, shared by the polling timers, on_ready backfill and AdminAddLeague.
+    It's handed to both watchers as their rate_limiter, so every request waits for a token from its
+    region's app buckets and its method's buckets, and the buckets are corrected from the limit/count
+    headers on every response. A 429 blocks its scope for Retry-After and the call is retried.
+    Idempotent lookups are cached: a match only exists once it's finished so those are kept for good,
+    riot ids change rarely enough to keep for hours."""
+
+    headroom = 0.9
+    max_retries = 2
+    account_ttl = 6 * 60 * 60
+
+    def __init__(self, app_limits: str, method_limits: Dict[str, str]) -> None:
+        self.app_limits = app_limits
+        self.method_limits = method_limits
+        self.limiters: Dict[tuple, RateLimiter] = {}
+        self.blocked_until: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.caches = {
+            "account.by_riot_id": TTLCache(maxsize=2000, ttl=self.account_ttl),
+            "match.by_id": LRUCache(maxsize=200),
+        }
+        self.cache_lock = threading.Lock()
+
+    def limiter(self, scope: tuple, spec: Optional[str]) -> RateLimiter:
+        with self.lock:
+            if scope not in self.limiters:
+                self.limiters[scope] = RateLimiter.parse(spec or "")
+            return self.limiters[scope]
+
+    def scopes(self, region: str, endpoint_name: str, method_name: str):
+        return ("app", region), ("method", region, endpoint_name, method_name)
+
+    def wait_until(self, region: str, endpoint_name: str, method_name: str):
+        # riotwatcher calls this right before sending. we block here instead of handing back a time
+        # so the budget is taken atomically, and give up if the caller's deadline would pass
+        deadline = getattr(self.local, "deadline", None)
+        app_scope, method_scope = self.scopes(region, endpoint_name, method_name)
+        with self.lock:
+            blocked_until = max(self.blocked_until.get(app_scope, 0), self.blocked_until.get(method_scope, 0))
+        wait = blocked_until - time.monotonic()
+        if wait > 0:
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RiotBudgetExceeded(f"{endpoint_name}.{method_name} is rate limited for another {wait:.1f}s")
+            time.sleep(wait)
+
+        app = self.limiter(app_scope, self.app_limits)
+        method = self.limiter(method_scope, self.method_limits.get(f"{endpoint_name}.{method_name}"))
+        if not app.combine(method).acquire(deadline):
+            raise RiotBudgetExceeded(f"no budget left for {endpoint_name}.{method_name} before the deadline")
+        return None
+
+    def record_response(self, region: str, endpoint_name: str, method_name: str, status: int, headers: Dict[str, str]):
+        app_scope, method_scope = self.scopes(region, endpoint_name, method_name)
+        if "X-App-Rate-Limit" in headers:
+            self.limiter(app_scope, self.app_limits).sync(headers["X-App-Rate-Limit"], headers.get("X-App-Rate-Limit-Count", ""), self.headroom)
+        if "X-Method-Rate-Limit" in headers:
+            self.limiter(method_scope, None).sync(headers["X-Method-Rate-Limit"], headers.get("X-Method-Rate-Limit-Count", ""), self.headroom)
+        if status == 429:
+            retry_after = float(headers.get("Retry-After", 1))
+            # service limits come from riot's side of one method, treat them like a method limit
+            scope = app_scope if headers.get("X-Rate-Limit-Type") == "application" else method_scope
+            print(f"riot 429 on {endpoint_name}.{method_name} ({headers.get('X-Rate-Limit-Type')}), backing off {retry_after}s")
+            with self.lock:
+                self.blocked_until[scope] = max(self.blocked_until.get(scope, 0), time.monotonic() + retry_after)
+
+    def call(self, endpoint: str, func, *args, deadline: float = None, **kwargs):
+        cache = self.caches.get(endpoint)
+        key = hashkey(*args, **kwargs)
+        if cache is not None:
+            with self.cache_lock:
+                cached = cache.get(key)
+            if cached is not None:
+                Metrics.riot_calls.labels(endpoint, "cached").inc()
+                return cached
+
+        self.local.deadline = deadline
+        try:
+            for attempt in range(self.max_retries + 1):
+                start = time.perf_counter()
+                status = "200"
+                try:
+                    result = func(*args, **kwargs)
+                    break
+                except Exception as e:
+                    # riotwatcher's ApiError carries the http response, anything else is a transport failure or our own budget
+                    status = str(getattr(getattr(e, "response", None), "status_code", type(e).__name__))
+                    # record_response has already blocked the scope, the retry waits in wait_until
+                    if status != "429" or attempt == self.max_retries:
+                        raise
+                finally:
+                    Metrics.riot_latency.labels(endpoint).observe(time.perf_counter() - start)
+                    Metrics.riot_calls.labels(endpoint, status).inc()
+        finally:
+            self.local.deadline = None
+
+        if cache is not None:
+            with self.cache_lock:
+                cache[key] = result
+        return result
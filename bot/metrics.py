@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+class StateCollector():
+    # pools and caches already keep their own numbers, so they're read at scrape time instead of mirrored
+    def __init__(self) -> None:
+        self.engines = {}
+        self.caches = {}
+        self.lock = threading.Lock()
+
+    def collect(self):
+        with self.lock:
+            engines = list(self.engines.items())
+            caches = list(self.caches.items())
+
+        size = GaugeMetricFamily("brancoin_db_pool_size", "Connections the pool keeps open", labels=["engine"])
+        checked_out = GaugeMetricFamily("brancoin_db_pool_checked_out", "Connections currently in use", labels=["engine"])
+        overflow = GaugeMetricFamily("brancoin_db_pool_overflow", "Connections opened past pool_size", labels=["engine"])
+        for name, engine in engines:
+            # read through the engine, dispose() swaps the pool out
+            pool = engine.pool
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(0, pool.overflow()))
+        yield size
+        yield checked_out
+        yield overflow
+
+        hits = CounterMetricFamily("brancoin_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("brancoin_cache_misses", "Cache misses", labels=["cache"])
+        entries = GaugeMetricFamily("brancoin_cache_entries", "Entries currently cached", labels=["cache"])
+        for name, cache_info in caches:
+            info = cache_info()
+            hits.add_metric([name], info.hits)
+            misses.add_metric([name], info.misses)
+            entries.add_metric([name], info.currsize)
+        yield hits
+        yield misses
+        yield entries
+
+
+class Metrics():
+    """Prometheus metrics for the bot, served by webserver.web on /metrics.
+    Everything is class level so the event loop, timer threads and the web thread share it."""
+
+    command_latency = Histogram("brancoin_command_seconds", "Time spent in a command's process() from on_message", ["command"],
+                                buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+    command_errors = Counter("brancoin_command_errors", "Commands that raised out of process()", ["command"])
+    db_checkout_wait = Histogram("brancoin_db_checkout_wait_seconds", "Time to get a connection from the pool, including connecting", ["engine"],
+                                 buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30))
+    riot_calls = Counter("brancoin_riot_calls", "Riot API calls by endpoint and status, cache hits are status=cached", ["endpoint", "status"])
+    riot_latency = Histogram("brancoin_riot_call_seconds", "Riot API call latency", ["endpoint"],
+                             buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+    timer_tick = Histogram("brancoin_timer_tick_seconds", "Duration of one RepeatTimer job run", ["job"],
+                           buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300))
+    loop_lag = Histogram("brancoin_event_loop_lag_seconds", "How late the event loop wakes up a sleeping task",
+                         buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5))
+
+    state = StateCollector()
+    REGISTRY.register(state)
+
+    @staticmethod
+    def watch_engine(name: str, engine):
+        with Metrics.state.lock:
+            Metrics.state.engines[name] = engine
+
+    @staticmethod
+    def watch_cache(name: str, cache_info):
+        with Metrics.state.lock:
+            Metrics.state.caches[name] = cache_info
+
+    @staticmethod
+    async def watch_loop_lag(interval: float = 0.5):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            Metrics.loop_lag.observe(max(0, time.perf_counter() - start - interval))
+
+    @staticmethod
+    def render():
+        return CONTENT_TYPE_LATEST, generate_latest(REGISTRY)
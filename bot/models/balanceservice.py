@@ -0,0 +1,89 @@
+from typing import Optional
+from sqlalchemy import text, update
+from models.models import Guild, User
+
+
+class BalanceService():
+    """Atomic brancoin changes. Every call is a single conditional UPDATE ... RETURNING, so concurrent
+    commands can't lose each other's updates and nothing holds a row lock across a discord await.
+    Methods return the new balance, or None when the condition failed (too broke, unknown user).
+    Async versions are for commands, the _sync ones for the timer and spin threads."""
+
+    # one statement: the debit only happens if the source can afford it, the credit only if the debit did.
+    # cost is 0 for freebies, the source still has to be able to afford the amount
+    transfer_sql = text(
+        "WITH debit AS ( "
+            "UPDATE user_account SET brancoins = brancoins - :cost "
+            "WHERE id = :source_id AND brancoins >= :amount "
+            "RETURNING brancoins "
+        ") "
+        "UPDATE user_account SET brancoins = user_account.brancoins + :amount "
+        "FROM debit WHERE user_account.id = :dest_id "
+        "RETURNING debit.brancoins"
+    )
+
+    # returning can only see the new row, so read the old jackpot in the same statement
+    claim_jackpot_sql = text(
+        "UPDATE guild SET brancoins = 0 "
+        "FROM (SELECT brancoins FROM guild WHERE guild_id = :guild_id FOR UPDATE) AS previous "
+        "WHERE guild.guild_id = :guild_id "
+        "RETURNING previous.brancoins"
+    )
+
+    @staticmethod
+    def adjust_statement(user_pk: int, delta: int, required: int = None):
+        statement = update(User).where(User.id == user_pk).values(brancoins=User.brancoins + delta).returning(User.brancoins)
+        if required is not None:
+            statement = statement.where(User.brancoins >= required)
+        return statement.execution_options(synchronize_session=False)
+
+    @staticmethod
+    def top_up_statement(user_pk: int, amount: int):
+        return update(User).where(User.id == user_pk, User.brancoins <= 0).values(brancoins=amount) \
+            .returning(User.brancoins).execution_options(synchronize_session=False)
+
+    @staticmethod
+    def jackpot_statement(guild_id: str, amount: int, below: int = None):
+        statement = update(Guild).where(Guild.guild_id == str(guild_id)).values(brancoins=Guild.brancoins + amount).returning(Guild.brancoins)
+        if below is not None:
+            statement = statement.where(Guild.brancoins < below)
+        return statement.execution_options(synchronize_session=False)
+
+    @staticmethod
+    def transfer_params(source_pk: int, dest_pk: int, amount: int, free: bool):
+        return {"source_id": source_pk, "dest_id": dest_pk, "amount": amount, "cost": 0 if free else amount}
+
+    @staticmethod
+    async def debit(session, user_pk: int, amount: int) -> Optional[int]:
+        return await session.scalar(BalanceService.adjust_statement(user_pk, -amount, required=amount))
+
+    @staticmethod
+    async def credit(session, user_pk: int, amount: int) -> Optional[int]:
+        return await session.scalar(BalanceService.adjust_statement(user_pk, amount))
+
+    @staticmethod
+    async def top_up(session, user_pk: int, amount: int) -> Optional[int]:
+        return await session.scalar(BalanceService.top_up_statement(user_pk, amount))
+
+    @staticmethod
+    async def transfer(session, source_pk: int, dest_pk: int, amount: int, free: bool = False) -> Optional[int]:
+        if source_pk == dest_pk:
+            # postgres won't update the same row twice in one statement
+            return await session.scalar(BalanceService.adjust_statement(source_pk, amount if free else 0, required=amount))
+        return await session.scalar(BalanceService.transfer_sql, BalanceService.transfer_params(source_pk, dest_pk, amount, free))
+
+    @staticmethod
+    def adjust_sync(session, user_pk: int, delta: int, required: int = None) -> Optional[int]:
+        return session.scalar(BalanceService.adjust_statement(user_pk, delta, required))
+
+    @staticmethod
+    def credit_sync(session, user_pk: int, amount: int) -> Optional[int]:
+        return session.scalar(BalanceService.adjust_statement(user_pk, amount))
+
+    @staticmethod
+    def add_to_jackpot_sync(session, guild_id: str, amount: int, below: int = None) -> Optional[int]:
+        return session.scalar(BalanceService.jackpot_statement(guild_id, amount, below))
+
+    @staticmethod
+    def claim_jackpot_sync(session, guild_id: str) -> Optional[int]:
+        return session.scalar(BalanceService.claim_jackpot_sql, {"guild_id": str(guild_id)})
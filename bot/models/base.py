@@ -1,3 +1,4 @@
+from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase
-class Base(DeclarativeBase):
+class Base(AsyncAttrs, DeclarativeBase):
     pass
\ No newline at end of file
@@ -1,16 +1,55 @@
-
 from curses import echo
+import time
 from dependency_injector import containers, providers
 
 from sqlalchemy import create_engine, true
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from envvars import Env
+from metrics import Metrics
+
+
+class TimedQueuePool(QueuePool):
+    # _do_get is where a checkout blocks on a full pool, or opens a new connection
+    metrics_label = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            Metrics.db_checkout_wait.labels(self.metrics_label).observe(time.perf_counter() - start)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            Metrics.db_checkout_wait.labels(self.metrics_label).observe(time.perf_counter() - start)
 
 
 class DbService():
     def __init__(self, url) -> None:
-        self.engine = create_engine(url, pool_size=20)
+        self.engine = create_engine(url, pool_size=20, poolclass=TimedQueuePool)
         self.Session = sessionmaker(self.engine)
+        Metrics.watch_engine(TimedQueuePool.metrics_label, self.engine)
+
+
+class AsyncDbService():
+    # used from the discord event loop, timer threads stay on DbService.
+    # nothing can lazy load in here so commands have to eager load what they touch,
+    # and objects stay usable after commit since we're often still replying to discord
+    def __init__(self, url, trigram_threshold: str) -> None:
+        # set per connection so a fuzzy search stays a single round trip
+        self.engine = create_async_engine(url, pool_size=20, poolclass=TimedAsyncQueuePool,
+                                          connect_args={"server_settings": {"pg_trgm.similarity_threshold": trigram_threshold}})
+        self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+        Metrics.watch_engine(TimedAsyncQueuePool.metrics_label, self.engine)
 
 
 class DbContainer(containers.DeclarativeContainer):
@@ -19,3 +58,8 @@ class DbContainer(containers.DeclarativeContainer):
         url=Env.db_conn_str
     )
 
+    async_service = providers.Singleton(
+        AsyncDbService,
+        url=Env.db_conn_str_async,
+        trigram_threshold=Env.trigram_threshold
+    )
@@ -0,0 +1,128 @@
+import threading
+from typing import NamedTuple, Optional
+from cachetools import LRUCache
+from sqlalchemy import select
+from metrics import Metrics
+from models.models import Guild, User
+
+
+class GuildConfig(NamedTuple):
+    guild_id: str
+    broadcast_channel_id: Optional[str]
+    broadcast_role_id: Optional[str]
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class IdentityCache():
+    """Process wide cache of (discord user, guild) -> user_account.id and of guild broadcast config.
+    user_account rows are never deleted so the id mapping can't go stale, guild config has to be
+    invalidated by whatever changes it. Shared by the event loop and the timer/spin threads."""
+
+    user_pks = LRUCache(maxsize=20000)
+    guild_configs = LRUCache(maxsize=1000)
+    lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def lookup(cls, cache, key):
+        with cls.lock:
+            value = cache.get(key)
+            if value is None:
+                cls.misses += 1
+            else:
+                cls.hits += 1
+            return value
+
+    @classmethod
+    def store(cls, cache, key, value):
+        if value is not None:
+            with cls.lock:
+                cache[key] = value
+
+    @staticmethod
+    def user_query(key, options):
+        return select(User).options(*options).filter(User.user_id == key[0], User.guild_id == key[1])
+
+    @staticmethod
+    def to_guild_config(guild: Guild) -> Optional[GuildConfig]:
+        if guild is None:
+            return None
+        return GuildConfig(guild.guild_id, guild.broadcast_channel_id, guild.broadcast_role_id)
+
+    @classmethod
+    async def get_user(cls, session, user_id, guild_id, options=()) -> Optional[User]:
+        key = (str(user_id), str(guild_id))
+        pk = cls.lookup(cls.user_pks, key)
+        if pk is not None:
+            return await session.get(User, pk, options=options)
+        # a miss costs the same single query as before, it just remembers the id
+        user = await session.scalar(cls.user_query(key, options))
+        cls.store(cls.user_pks, key, user.id if user else None)
+        return user
+
+    @classmethod
+    def get_user_sync(cls, session, user_id, guild_id, options=()) -> Optional[User]:
+        key = (str(user_id), str(guild_id))
+        pk = cls.lookup(cls.user_pks, key)
+        if pk is not None:
+            return session.get(User, pk, options=options)
+        user = session.scalar(cls.user_query(key, options))
+        cls.store(cls.user_pks, key, user.id if user else None)
+        return user
+
+    @classmethod
+    async def user_pk(cls, session, user_id, guild_id) -> Optional[int]:
+        key = (str(user_id), str(guild_id))
+        pk = cls.lookup(cls.user_pks, key)
+        if pk is None:
+            pk = await session.scalar(select(User.id).filter(User.user_id == key[0], User.guild_id == key[1]))
+            cls.store(cls.user_pks, key, pk)
+        return pk
+
+    @classmethod
+    def user_pk_sync(cls, session, user_id, guild_id) -> Optional[int]:
+        key = (str(user_id), str(guild_id))
+        pk = cls.lookup(cls.user_pks, key)
+        if pk is None:
+            pk = session.scalar(select(User.id).filter(User.user_id == key[0], User.guild_id == key[1]))
+            cls.store(cls.user_pks, key, pk)
+        return pk
+
+    @classmethod
+    async def guild_config(cls, session, guild_id) -> Optional[GuildConfig]:
+        key = str(guild_id)
+        config = cls.lookup(cls.guild_configs, key)
+        if config is None:
+            config = cls.to_guild_config(await session.get(Guild, key))
+            cls.store(cls.guild_configs, key, config)
+        return config
+
+    @classmethod
+    def guild_config_sync(cls, session, guild_id) -> Optional[GuildConfig]:
+        key = str(guild_id)
+        config = cls.lookup(cls.guild_configs, key)
+        if config is None:
+            config = cls.to_guild_config(session.get(Guild, key))
+            cls.store(cls.guild_configs, key, config)
+        return config
+
+    @classmethod
+    def invalidate_guild(cls, guild_id):
+        with cls.lock:
+            cls.guild_configs.pop(str(guild_id), None)
+
+    @classmethod
+    def cache_info(cls) -> CacheInfo:
+        # both caches together, read by /metrics as the "identity" cache
+        with cls.lock:
+            return CacheInfo(cls.hits, cls.misses, cls.user_pks.maxsize + cls.guild_configs.maxsize, len(cls.user_pks) + len(cls.guild_configs))
+
+
+Metrics.watch_cache("identity", IdentityCache.cache_info)
@@ -0,0 +1,34 @@
+import datetime
+from sqlalchemy.dialects.postgresql import insert
+from models.models import MatchResult
+
+
+class MatchResults():
+    """match_result holds one summarized row per finished match (see LeagueService.summarize_game),
+    written in the same transaction that settles it. Settlement, the broadcast and anything after
+    read it from here, so a match costs one match.by_id call for good."""
+
+    @staticmethod
+    def statement(match_id, summary):
+        end = summary.get("end")
+        return insert(MatchResult).values(
+            match_id=str(match_id),
+            our_team_won=summary["won"],
+            game_duration=summary["duration"],
+            game_end=datetime.datetime.fromtimestamp(end / 1000) if end else None,
+            summary=summary,
+        ).on_conflict_do_nothing(index_elements=[MatchResult.match_id])
+
+    @staticmethod
+    def load_sync(session, match_id) -> MatchResult:
+        return session.get(MatchResult, str(match_id))
+
+    @staticmethod
+    async def load(session, match_id) -> MatchResult:
+        return await session.get(MatchResult, str(match_id))
+
+    @staticmethod
+    def store_sync(session, match_id, summary) -> MatchResult:
+        # a backfill racing the timer is fine, whichever wrote first wins
+        session.execute(MatchResults.statement(match_id, summary))
+        return MatchResults.load_sync(session, match_id)
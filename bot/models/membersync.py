@@ -0,0 +1,47 @@
+from typing import Iterable, List, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from models.identitycache import IdentityCache
+from models.models import Guild, User
+
+
+class MemberSync():
+    """Keeps user_account in step with guild membership. A whole guild is one read of the ids we
+    already have plus one INSERT ... ON CONFLICT DO NOTHING for the rest, so startup doesn't do a
+    round trip per member. Conflicts on user_guild_uc are expected when two syncs overlap.
+    The syncs hand back the inserted (pk, user_id) rows, the caller passes them to remember once
+    its commit went through, so IdentityCache never holds a pk for a row that was rolled back."""
+
+    # asyncpg caps a statement at 32767 bind params, each row is two
+    batch_size = 10000
+
+    @staticmethod
+    def guild_statement(guild_id):
+        return insert(Guild).values(guild_id=str(guild_id), brancoins=10).on_conflict_do_nothing(index_elements=[Guild.guild_id])
+
+    @staticmethod
+    def users_statement(guild_id, user_ids: Iterable):
+        rows = [{"user_id": str(user_id), "guild_id": str(guild_id)} for user_id in user_ids]
+        return insert(User).values(rows).on_conflict_do_nothing(constraint="user_guild_uc").returning(User.id, User.user_id)
+
+    @staticmethod
+    def remember(guild_id, inserted):
+        for pk, user_id in inserted:
+            IdentityCache.store(IdentityCache.user_pks, (user_id, str(guild_id)), pk)
+
+    @staticmethod
+    async def ensure_guild(session, guild_id) -> bool:
+        return (await session.execute(MemberSync.guild_statement(guild_id))).rowcount > 0
+
+    @staticmethod
+    async def sync_guild(session, guild_id, member_ids: Iterable) -> List[Tuple[int, str]]:
+        existing = set((await session.scalars(select(User.user_id).filter(User.guild_id == str(guild_id)))).all())
+        missing = sorted({str(member_id) for member_id in member_ids} - existing)
+        inserted = []
+        for start in range(0, len(missing), MemberSync.batch_size):
+            inserted.extend((await session.execute(MemberSync.users_statement(guild_id, missing[start:start + MemberSync.batch_size]))).all())
+        return inserted
+
+    @staticmethod
+    async def add_member(session, guild_id, user_id) -> List[Tuple[int, str]]:
+        return (await session.execute(MemberSync.users_statement(guild_id, [user_id]))).all()
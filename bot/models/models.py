@@ -1,9 +1,10 @@
 import datetime
 from typing import List
 from typing import Optional
-from sqlalchemy import BLOB, Float, ForeignKey, ForeignKeyConstraint, Integer, LargeBinary, PrimaryKeyConstraint, UniqueConstraint, null, true
+from sqlalchemy import BLOB, Float, ForeignKey, ForeignKeyConstraint, Index, Integer, LargeBinary, PrimaryKeyConstraint, UniqueConstraint, null, text, true
 from sqlalchemy import String
 import sqlalchemy
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 from sqlalchemy.orm import relationship
@@ -21,6 +22,7 @@ class User(Base):
 
     __table_args__ = (
         UniqueConstraint('user_id', 'guild_id', name='user_guild_uc'),
+        Index('ix_user_account_guild_brancoins', 'guild_id', text('brancoins DESC')),
     )
     
     def __repr__(self) -> str:
@@ -52,12 +54,28 @@ class Match(Base):
     match_players: Mapped[List["MatchPlayer"]] = relationship(back_populates="match")
     votes: Mapped[List["Votes"]] = relationship()
 
+    __table_args__ = (
+        Index('ix_match_unfinished', 'match_id', postgresql_where=text('finished = false')),
+    )
+
     def get_time_since_start(self) -> datetime.timedelta:
         return datetime.datetime.now() - self.start_time
     
     def __repr__(self) -> str:
         return f"tag(match_id={self.match_id!r}, finished={self.finished!r}, start_time={self.start_time!r})"
 
+class MatchResult(Base):
+    __tablename__ = "match_result"
+    match_id: Mapped[str] = mapped_column(ForeignKey("match.match_id"), primary_key=True)
+    our_team_won: Mapped[bool]
+    game_duration: Mapped[int]
+    game_end: Mapped[datetime.datetime] = mapped_column(nullable=True)
+    # LeagueService.summarize_game's projection of the match-v5 payload, not the payload itself
+    summary = mapped_column(JSONB)
+
+    def __repr__(self) -> str:
+        return f"MatchResult(match_id={self.match_id!r}, our_team_won={self.our_team_won!r}, game_duration={self.game_duration!r})"
+
 class MatchPlayer(Base):
     __tablename__ = "match_player"
     match_id: Mapped[str] = mapped_column(ForeignKey("match.match_id"), primary_key=True)
@@ -75,6 +93,37 @@ class MatchPlayer(Base):
         return f"MatchPlayer(match_id={self.match_id!r}, league_user_id={self.league_user_id!r}, champion={self.champion!r},)"
 
 
+class PlayerStats(Base):
+    __tablename__ = "player_stats"
+    # one row per player, mode and champion, kept up to date by StatsAggregates at settlement
+    league_user_id = mapped_column(Integer, ForeignKey("league_user.id"), primary_key=True)
+    match_type: Mapped[str] = mapped_column(primary_key=True)
+    champion: Mapped[str] = mapped_column(primary_key=True)
+    games: Mapped[int]
+    wins: Mapped[int]
+    kills: Mapped[int]
+    deaths: Mapped[int]
+    assists: Mapped[int]
+
+    def __repr__(self) -> str:
+        return f"PlayerStats(league_user_id={self.league_user_id!r}, match_type={self.match_type!r}, champion={self.champion!r}, games={self.games!r}, wins={self.wins!r})"
+
+class VoterStats(Base):
+    __tablename__ = "voter_stats"
+    user_id = mapped_column(Integer, ForeignKey("user_account.id"), primary_key=True)
+    guild_id: Mapped[str]
+    votes: Mapped[int]
+    wins: Mapped[int]
+    wagered: Mapped[int]
+    profit: Mapped[int]
+
+    __table_args__ = (
+        Index('ix_voter_stats_guild_profit', 'guild_id', text('profit DESC')),
+    )
+
+    def __repr__(self) -> str:
+        return f"VoterStats(user_id={self.user_id!r}, votes={self.votes!r}, profit={self.profit!r})"
+
 class Guild(Base):
     __tablename__ = "guild"
     guild_id: Mapped[str] = mapped_column(primary_key=True, unique=True)
@@ -89,7 +138,7 @@ class Votes(Base):
     __tablename__ = "votes"
     id = mapped_column(Integer, primary_key=True, autoincrement=True, unique=True)
     voter_id: Mapped[str] = mapped_column(ForeignKey("user_account.id"))
-    match_id: Mapped[str] = mapped_column(ForeignKey("match.match_id"))
+    match_id: Mapped[str] = mapped_column(ForeignKey("match.match_id"), index=True)
     target_league_player: Mapped[str] = mapped_column(ForeignKey("league_user.id"), nullable=True)
     processed: Mapped[bool] = mapped_column(server_default="False")
     type_of_vote: Mapped[int]
@@ -104,7 +153,10 @@ class Votes(Base):
 class Image(Base):
     __tablename__ = "images"
     label = mapped_column(String, primary_key=True, unique=True)
-    bin = mapped_column(LargeBinary)
+    # only needed on a render cache miss, see DrawUtils.preload_images
+    bin = mapped_column(LargeBinary, deferred=True)
+    # part of DrawUtils.render_key, so a render can be found without loading bin
+    digest = mapped_column(String, sqlalchemy.Computed("encode(sha256(bin), 'hex')", persisted=True))
 
     def __repr__(self) -> str:
         return f"Images(label={self.label!r}"
@@ -113,8 +165,8 @@ class OwnedCard(Base):
     __tablename__ = "ownedcards"
     
     id = mapped_column(Integer, primary_key=True, autoincrement=True, unique=True)
-    owner_id: Mapped[str] = mapped_column(ForeignKey("user_account.id"))
-    card_id: Mapped[Integer] = mapped_column(ForeignKey("cards.id"))
+    owner_id: Mapped[str] = mapped_column(ForeignKey("user_account.id"), index=True)
+    card_id: Mapped[Integer] = mapped_column(ForeignKey("cards.id"), index=True)
 
     owner: Mapped["User"] = relationship(back_populates="owned_cards")
     card: Mapped["Card"] = relationship()
@@ -140,6 +192,11 @@ class Card(Base):
     featured: Mapped[bool] = mapped_column(server_default="f")
     bonuses: Mapped[List["CardBonus"]] = relationship()
 
+    __table_args__ = (
+        Index('ix_cards_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('ix_cards_description_trgm', 'description', postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'}),
+    )
+
     def __repr__(self) -> str:
         return f"Card(title={self.title!r}"
     
@@ -158,7 +215,7 @@ class Shop(Base):
     id = mapped_column(Integer, primary_key=True, autoincrement=True, unique=True)
     card_id: Mapped[Integer] = mapped_column(ForeignKey("cards.id"))
     card: Mapped["Card"] = relationship()
-    date_added: Mapped[datetime.date] = mapped_column(server_default=str(datetime.date.today()))
+    date_added: Mapped[datetime.date] = mapped_column(server_default=str(datetime.date.today()), index=True)
 
 class BoosterPack(Base):
     __tablename__ = "booster_pack"
@@ -193,4 +250,5 @@ class BoosterCard(Base):
 
     __table_args__ = (ForeignKeyConstraint(["booster_pack_id", "booster_segment_id"],
                                            ["booster_segments.booster_pack_id", "booster_segments.id"]),
+                      Index('ix_booster_card_segment', 'booster_pack_id', 'booster_segment_id'),
                       {})
\ No newline at end of file
@@ -0,0 +1,40 @@
+from typing import List
+from sqlalchemy import event
+
+
+class QueryCounter():
+    """Counts the statements an engine sends while the block runs.
+
+        with QueryCounter(dbservice.engine) as counter:
+            ...
+        counter.assert_at_most(4, "inventory")
+    """
+
+    def __init__(self, engine) -> None:
+        # AsyncEngine only exposes events through its sync_engine
+        self.engine = getattr(engine, "sync_engine", engine)
+        self.statements: List[str] = []
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # savepoints come from the test harness wrapping sessions, not from the code being measured
+        if statement.startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")):
+            return
+        self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self.on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self.on_execute)
+        return False
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def assert_at_most(self, limit: int, label: str):
+        if self.count > limit:
+            joined = "\n".join(self.statements)
+            raise AssertionError(f"{label}: expected at most {limit} queries, got {self.count}\n{joined}")
@@ -0,0 +1,65 @@
+from typing import List, NamedTuple, Optional
+from sqlalchemy import text
+from discord.VoteType import VoteType
+
+
+class Payout(NamedTuple):
+    kind: str
+    user_id: str
+    type_of_vote: Optional[int]
+    brancoins: int
+    won: bool
+
+
+class Settlement():
+    """Settles a finished match in one statement. Flipping match.finished is the claim: votes are
+    only marked processed, and balances only credited, off the back of that update, so running it
+    again for the same match (a retry after a crash, a second bot instance) does nothing.
+    Returns what the announcement needs, or None if the match was already settled."""
+
+    player_bonus = 50
+
+    # a player who also voted is one row in payouts, postgres won't update a row twice in a statement
+    settle_sql = text(
+        "WITH claimed AS ( "
+            "UPDATE match SET finished = true "
+            "WHERE match_id = :match_id AND finished = false "
+            "RETURNING match_id "
+        "), settled AS ( "
+            "UPDATE votes SET processed = true FROM claimed "
+            "WHERE votes.match_id = claimed.match_id AND votes.processed = false AND votes.type_of_vote IN (:win_vote, :lose_vote) "
+            "RETURNING votes.voter_id, votes.type_of_vote, votes.brancoins, (votes.type_of_vote = :win_vote) = :we_win AS won "
+        "), players AS ( "
+            "SELECT user_account.id, user_account.user_id FROM claimed "
+            "JOIN match_player ON match_player.match_id = claimed.match_id "
+            "JOIN league_user ON league_user.id = match_player.league_user_id "
+            "JOIN user_account ON user_account.id = league_user.discord_user_id "
+            "WHERE :we_win "
+        "), payouts AS ( "
+            "UPDATE user_account SET brancoins = user_account.brancoins + owed.amount "
+            "FROM (SELECT id, sum(amount) AS amount FROM ( "
+                "SELECT voter_id AS id, brancoins * 2 AS amount FROM settled WHERE won "
+                "UNION ALL SELECT id, :player_bonus FROM players "
+            ") AS owing GROUP BY id) AS owed "
+            "WHERE user_account.id = owed.id "
+            "RETURNING user_account.id "
+        ") "
+        "SELECT 'match' AS kind, NULL AS user_id, NULL AS type_of_vote, 0 AS brancoins, :we_win AS won FROM claimed "
+        "UNION ALL "
+        "SELECT 'vote', user_account.user_id, settled.type_of_vote, settled.brancoins, settled.won "
+        "FROM settled JOIN user_account ON user_account.id = settled.voter_id "
+        "UNION ALL "
+        "SELECT 'player', players.user_id, NULL, :player_bonus, true FROM players"
+    )
+
+    @staticmethod
+    def params(match_id, we_win: bool):
+        return {"match_id": str(match_id), "we_win": we_win, "win_vote": VoteType.WIN.value,
+                "lose_vote": VoteType.LOSE.value, "player_bonus": Settlement.player_bonus}
+
+    @staticmethod
+    def settle_sync(session, match_id, we_win: bool) -> Optional[List[Payout]]:
+        rows = session.execute(Settlement.settle_sql, Settlement.params(match_id, we_win)).all()
+        if not any(row.kind == "match" for row in rows):
+            return None
+        return [Payout(row.kind, row.user_id, row.type_of_vote, row.brancoins, row.won) for row in rows if row.kind != "match"]
@@ -0,0 +1,112 @@
+from sqlalchemy import func, select, text
+from discord.VoteType import VoteType
+from models.models import LeagueUser, PlayerStats, User, VoterStats
+
+
+class StatsAggregates():
+    """player_stats and voter_stats, folded in one match at a time at settlement so `bran stats` only
+    reads the rows it shows. Both are derived from match_player, match_result and votes, and
+    rebuild_sync recomputes them from scratch with the same queries (tools.rebuild_stats).
+    Matches without a match_result (settled before it existed, see tools.backfill_match_results)
+    are left out."""
+
+    # {where} picks the matches, one for record and every finished one for a rebuild
+    player_rows = (
+        "SELECT league_user_id, match_type, champion, count(*) AS games, count(*) FILTER (WHERE won) AS wins, "
+        "coalesce(sum(k), 0) AS kills, coalesce(sum(d), 0) AS deaths, coalesce(sum(a), 0) AS assists "
+        "FROM (SELECT match_player.league_user_id, coalesce(match.match_type, '') AS match_type, match_player.champion, "
+            # players aren't always on the same team, their own result wins over the match's
+            "coalesce((player->>'win')::boolean, match_result.our_team_won) AS won, "
+            "(player->>'k')::int AS k, (player->>'d')::int AS d, (player->>'a')::int AS a "
+            "FROM match_player "
+            "JOIN match ON match.match_id = match_player.match_id "
+            "JOIN match_result ON match_result.match_id = match_player.match_id "
+            "CROSS JOIN LATERAL (SELECT match_result.summary->'players'->(match_player.league_user_id::text) AS player) AS summary "
+            "WHERE {where}) AS played "
+        "GROUP BY league_user_id, match_type, champion"
+    )
+
+    # a won vote paid out double its stake, so it's up by the stake either way
+    voter_rows = (
+        "SELECT settled.voter_id AS user_id, user_account.guild_id, count(*) AS votes, count(*) FILTER (WHERE won) AS wins, "
+        "sum(settled.brancoins) AS wagered, sum(CASE WHEN won THEN settled.brancoins ELSE -settled.brancoins END) AS profit "
+        "FROM (SELECT votes.voter_id, votes.brancoins, (votes.type_of_vote = :win_vote) = match_result.our_team_won AS won "
+            "FROM votes JOIN match_result ON match_result.match_id = votes.match_id "
+            "WHERE votes.processed AND votes.type_of_vote IN (:win_vote, :lose_vote) AND {where}) AS settled "
+        "JOIN user_account ON user_account.id = settled.voter_id "
+        "GROUP BY settled.voter_id, user_account.guild_id"
+    )
+
+    player_columns = "(league_user_id, match_type, champion, games, wins, kills, deaths, assists)"
+    voter_columns = "(user_id, guild_id, votes, wins, wagered, profit)"
+
+    record_sql = text(
+        "WITH voters AS ( "
+            f"INSERT INTO voter_stats {voter_columns} " + voter_rows.format(where="votes.match_id = :match_id") + " "
+            "ON CONFLICT (user_id) DO UPDATE SET votes = voter_stats.votes + excluded.votes, wins = voter_stats.wins + excluded.wins, "
+            "wagered = voter_stats.wagered + excluded.wagered, profit = voter_stats.profit + excluded.profit "
+            "RETURNING 1 "
+        ") "
+        f"INSERT INTO player_stats {player_columns} " + player_rows.format(where="match_player.match_id = :match_id") + " "
+        "ON CONFLICT (league_user_id, match_type, champion) DO UPDATE SET games = player_stats.games + excluded.games, "
+        "wins = player_stats.wins + excluded.wins, kills = player_stats.kills + excluded.kills, "
+        "deaths = player_stats.deaths + excluded.deaths, assists = player_stats.assists + excluded.assists"
+    )
+
+    rebuild_sql = [
+        text("TRUNCATE player_stats, voter_stats"),
+        text(f"INSERT INTO player_stats {player_columns} " + player_rows.format(where="match.finished")),
+        text(f"INSERT INTO voter_stats {voter_columns} " + voter_rows.format(where="true")),
+    ]
+
+    vote_params = {"win_vote": VoteType.WIN.value, "lose_vote": VoteType.LOSE.value}
+
+    @staticmethod
+    def record_match_sync(session, match_id):
+        # only ever called from the settlement that claimed the match, in its transaction, so it counts once
+        session.execute(StatsAggregates.record_sql, dict(StatsAggregates.vote_params, match_id=str(match_id)))
+
+    @staticmethod
+    def rebuild_sync(session):
+        for statement in StatsAggregates.rebuild_sql:
+            session.execute(statement, StatsAggregates.vote_params)
+
+    @staticmethod
+    async def players(session, guild_id, limit: int):
+        games = func.sum(PlayerStats.games)
+        return (await session.execute(
+            select(LeagueUser.summoner_name, games, func.sum(PlayerStats.wins))
+            .select_from(PlayerStats)
+            .join(LeagueUser, LeagueUser.id == PlayerStats.league_user_id)
+            .join(User, User.id == LeagueUser.discord_user_id)
+            .filter(User.guild_id == str(guild_id))
+            .group_by(LeagueUser.id).order_by(games.desc()).limit(limit))).all()
+
+    @staticmethod
+    async def by_match_type(session, league_user_ids):
+        return (await session.execute(
+            select(PlayerStats.match_type, func.sum(PlayerStats.games), func.sum(PlayerStats.wins))
+            .filter(PlayerStats.league_user_id.in_(league_user_ids))
+            .group_by(PlayerStats.match_type).order_by(func.sum(PlayerStats.games).desc()))).all()
+
+    @staticmethod
+    async def by_champion(session, league_user_ids, limit: int):
+        games = func.sum(PlayerStats.games)
+        return (await session.execute(
+            select(PlayerStats.champion, games, func.sum(PlayerStats.wins), func.sum(PlayerStats.kills),
+                   func.sum(PlayerStats.deaths), func.sum(PlayerStats.assists))
+            .filter(PlayerStats.league_user_id.in_(league_user_ids))
+            .group_by(PlayerStats.champion).order_by(games.desc()).limit(limit))).all()
+
+    @staticmethod
+    async def voters(session, guild_id, limit: int):
+        return (await session.execute(
+            select(User.user_id, VoterStats.votes, VoterStats.wins, VoterStats.profit)
+            .select_from(VoterStats)
+            .join(User, User.id == VoterStats.user_id)
+            .filter(VoterStats.guild_id == str(guild_id))
+            .order_by(VoterStats.profit.desc()).limit(limit))).all()
+
+    @staticmethod
+    async def voter(session, user_pk: int):
+        return await session.get(VoterStats, user_pk)
@@ -0,0 +1,69 @@
+"""
+Fills match_result for finished matches from before it existed. Goes newest first, one match.by_id
+call per match through the same rate limited gateway as the bot, and commits every batch so it can be
+stopped and rerun. Riot only keeps match-v5 for about two years, anything older is reported and skipped.
+The bot's own counts come back in the rate limit headers, so it's safe to run alongside it.
+
+    python -m tools.backfill_match_results --batch 50
+"""
+import argparse
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from envvars import Env
+from league.leaguecontainer import LeagueContainer
+from models.dbcontainer import DbService
+from models.matchresults import MatchResults
+from models.models import Match, MatchPlayer, MatchResult
+
+
+def pending(session, batch: int, skipped: set):
+    statement = (select(Match)
+                 .outerjoin(MatchResult, MatchResult.match_id == Match.match_id)
+                 .filter(Match.finished == True, MatchResult.match_id == None)
+                 .options(selectinload(Match.match_players).joinedload(MatchPlayer.league_user))
+                 .order_by(Match.start_time.desc())
+                 .limit(batch))
+    if skipped:
+        statement = statement.filter(Match.match_id.not_in(skipped))
+    return session.scalars(statement).all()
+
+
+def main(args):
+    db = DbService(Env.db_conn_str)
+    league = LeagueContainer().service()
+    stored = 0
+    skipped = set()
+    start = time.perf_counter()
+    with db.Session() as session:
+        while args.limit == 0 or stored + len(skipped) < args.limit:
+            matches = pending(session, args.batch, skipped)
+            if len(matches) == 0:
+                break
+            for match in matches:
+                results = league.get_game(match)
+                summary = results['extra_data'].get('summary') if results is not None else None
+                if summary is None:
+                    print(f"{match.match_id} ({match.start_time:%Y-%m-%d}): {'no tracked players in it' if results else 'not available from riot'}")
+                    skipped.add(match.match_id)
+                    continue
+                if not args.dry_run:
+                    MatchResults.store_sync(session, match.match_id, summary)
+                stored += 1
+            if args.dry_run:
+                session.rollback()
+                # nothing was written so the same rows would come back
+                skipped.update(match.match_id for match in matches)
+            else:
+                session.commit()
+            print(f"{stored} stored, {len(skipped)} skipped, {stored / (time.perf_counter() - start):.1f}/s")
+    print(f"done: {stored} stored, {len(skipped)} skipped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=50, help="matches per commit")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many matches, 0 for all")
+    parser.add_argument("--dry-run", action="store_true", help="fetch and summarize without writing")
+    main(parser.parse_args())
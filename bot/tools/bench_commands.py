@@ -0,0 +1,253 @@
+"""
+Replays a mix of commands through DiscordMonitorClient.on_message with fake discord objects, no
+discord connection needed. Seeds a bench guild into the configured database, so point POSTGRES_DB at
+a scratch copy. Reports throughput, p50/p95/p99 per command and how many queries one of each costs.
+
+    python -m tools.bench_commands --concurrency 20 --requests 25 --mix spin=4,gift=2,inv=1,shop=1,buy=1,buypack=1,viewcard=2,vote=1,matches=1
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import random
+import time
+from io import BytesIO
+
+import discord
+from PIL import Image as PILImage
+from sqlalchemy import delete, insert, select
+from discord.bot_league_monitor import DiscordMonitorClient
+from envvars import Env
+from models.dbcontainer import AsyncDbService, DbService
+from models.models import BoosterCard, BoosterPack, BoosterSegment, Card, Guild, Image, LeagueUser, Match, MatchPlayer, OwnedCard, Shop, User, Votes
+from models.querycounter import QueryCounter
+from tools.benchstats import percentile
+
+guild_id = "bench_guild"
+user_prefix = "bench_user_"
+card_prefix = "bench card "
+pack_id = "benchpack"
+match_id = "bench_match"
+
+default_mix = "spin=4,gift=2,inv=1,shop=1,buy=1,buypack=1,viewcard=2,vote=1,matches=1"
+spin_timeout = 10
+
+
+class FakeUser():
+    def __init__(self, user_id: int) -> None:
+        self.id = user_id
+        self.display_name = f"bench {user_id}"
+        self.nick = self.display_name
+        self.mention = f"<@{user_id}>"
+        # keeps discord.ext's own prefix parser out of the timings, none of our commands look at it
+        self.bot = True
+
+
+class FakeChannel():
+    ids = itertools.count(1)
+
+    def __init__(self) -> None:
+        self.id = next(FakeChannel.ids)
+        self.sent = asyncio.Event()
+
+    async def send(self, content=None, **kwargs):
+        self.sent.set()
+
+
+class FakeGuild():
+    def __init__(self, id) -> None:
+        self.id = id
+
+
+class FakeMessage():
+    def __init__(self, content: str, author: FakeUser, guild: FakeGuild, mentions=()) -> None:
+        self.content = content
+        self.author = author
+        self.guild = guild
+        self.channel = FakeChannel()
+        self.mentions = list(mentions)
+        self.role_mentions = []
+        self.attachments = []
+        self.replies = 0
+
+    async def reply(self, content=None, **kwargs):
+        self.replies += 1
+
+    async def add_reaction(self, emoji):
+        pass
+
+
+def placeholder_image() -> bytes:
+    buffered = BytesIO()
+    PILImage.new("RGB", (256, 256), (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def cleanup(db: DbService):
+    with db.Session() as session:
+        users = select(User.id).filter(User.guild_id == guild_id)
+        cards = select(Card.id).filter(Card.title.startswith(card_prefix))
+        session.execute(delete(Votes).filter(Votes.match_id == match_id))
+        session.execute(delete(MatchPlayer).filter(MatchPlayer.match_id == match_id))
+        session.execute(delete(Match).filter(Match.match_id == match_id))
+        session.execute(delete(LeagueUser).filter(LeagueUser.discord_user_id.in_(users)))
+        session.execute(delete(OwnedCard).filter(OwnedCard.owner_id.in_(users)))
+        session.execute(delete(User).filter(User.guild_id == guild_id))
+        session.execute(delete(Guild).filter(Guild.guild_id == guild_id))
+        session.execute(delete(BoosterCard).filter(BoosterCard.booster_pack_id == pack_id))
+        session.execute(delete(BoosterSegment).filter(BoosterSegment.booster_pack_id == pack_id))
+        session.execute(delete(BoosterPack).filter(BoosterPack.id == pack_id))
+        session.execute(delete(Shop).filter(Shop.card_id.in_(cards)))
+        session.execute(delete(Card).filter(Card.title.startswith(card_prefix)))
+        session.execute(delete(Image).filter(Image.label.startswith("bench_")))
+        session.commit()
+
+
+def seed(db: DbService, args):
+    image_bin = placeholder_image()
+    # spread the costs over every shop tier so ViewShop can fill itself
+    costs = [50, 300, 700, 1500]
+    with db.Session() as session:
+        session.add(Guild(guild_id=guild_id, brancoins=10))
+        session.execute(insert(Image), [{"label": f"bench_{idx}", "bin": image_bin} for idx in range(args.cards)])
+        card_ids = session.scalars(insert(Card).returning(Card.id), [{
+            "card_style": "normal", "title": f"{card_prefix}{idx}", "attribute": "Earth", "level": "4", "type": "Monster",
+            "description": f"bench description {idx}", "atk": "1000", "defe": "1000", "cost": costs[idx % len(costs)],
+            "image_label": f"bench_{idx}", "shoppable": True, "featured": False,
+        } for idx in range(args.cards)]).all()
+        user_pks = session.scalars(insert(User).returning(User.id), [
+            {"user_id": f"{idx}", "guild_id": guild_id, "brancoins": 10_000_000} for idx in range(1, args.users + 1)
+        ]).all()
+        session.execute(insert(OwnedCard), [
+            {"owner_id": user_pk, "card_id": random.choice(card_ids)} for user_pk in user_pks for _ in range(args.cards_per_user)
+        ])
+
+        session.add(BoosterPack(id=pack_id, cost=1, image_label="bench_0", desc=""))
+        session.flush()
+        session.add(BoosterSegment(booster_pack_id=pack_id, id="common", num_cards_to_draw=3))
+        session.flush()
+        session.execute(insert(BoosterCard), [
+            {"card_id": card_id, "booster_pack_id": pack_id, "booster_segment_id": "common", "chance": 1} for card_id in card_ids
+        ])
+
+        league_user = LeagueUser(summoner_name="bench", tag="0000", trackable=False, voteable=True, discord_user_id=user_pks[0])
+        session.add(league_user)
+        # votes close 5 minutes after the start, the run has to fit inside that
+        session.add(Match(match_id=match_id, finished=False, start_time=datetime.datetime.now()))
+        session.flush()
+        session.add(MatchPlayer(match_id=match_id, league_user_id=league_user.id, champion="Teemo"))
+        session.commit()
+
+
+def build_message(command: str, args) -> FakeMessage:
+    guild = FakeGuild(guild_id)
+    author = FakeUser(random.randint(1, args.users))
+    if command == "spin":
+        return FakeMessage("bran spin", author, guild)
+    if command == "gift":
+        target = FakeUser(random.randint(1, args.users))
+        return FakeMessage(f"bran gift {target.mention} 1", author, guild, mentions=[target])
+    if command == "inv":
+        return FakeMessage("bran inv", author, guild)
+    if command == "shop":
+        return FakeMessage("bran shop", author, guild)
+    if command == "buy":
+        return FakeMessage(f"bran buy {random.randint(1, 4)}", author, guild)
+    if command == "buypack":
+        return FakeMessage(f"bran buypack {pack_id}", author, guild)
+    if command == "viewcard":
+        if random.uniform(0, 1) < 0.5:
+            return FakeMessage(f"bran viewcard {random.randint(1, args.cards_per_user)}", author, guild)
+        return FakeMessage(f"bran viewcard '{card_prefix}{random.randint(0, args.cards - 1)}'", author, guild)
+    if command == "vote":
+        return FakeMessage(f"bran vote win 1 {match_id}", author, guild)
+    if command == "matches":
+        return FakeMessage("bran matches", author, guild)
+    raise ValueError(f"unknown command {command}")
+
+
+async def run_command(client: DiscordMonitorClient, command: str, args) -> float:
+    message = build_message(command, args)
+    start = time.perf_counter()
+    await client.on_message(message)
+    if command == "spin":
+        # spins are buffered for a second on a worker thread and answered with channel.send
+        await asyncio.wait_for(message.channel.sent.wait(), spin_timeout)
+    return time.perf_counter() - start
+
+
+async def count_queries(client: DiscordMonitorClient, commands, args):
+    counts = {}
+    for command in commands:
+        # the spin worker thread is on the sync engine, everything else on the async one
+        with QueryCounter(client.async_db.engine) as async_counter, QueryCounter(client.db.engine) as sync_counter:
+            await run_command(client, command, args)
+        counts[command] = async_counter.count + sync_counter.count
+    return counts
+
+
+async def main(args):
+    mix = {}
+    for entry in args.mix.split(","):
+        command, weight = entry.split("=")
+        mix[command.strip()] = float(weight)
+
+    sync_db = DbService(Env.db_conn_str)
+    async_db = AsyncDbService(Env.db_conn_str_async, Env.trigram_threshold)
+    cleanup(sync_db)
+    seed(sync_db, args)
+
+    client = DiscordMonitorClient(intents=discord.Intents.default(), dbservice=sync_db, async_dbservice=async_db, league_service=None)
+    client.loop = asyncio.get_running_loop()
+    client.build_router()
+
+    latencies = {command: [] for command in mix}
+    errors = {command: 0 for command in mix}
+    try:
+        # warm up, also fills today's shop if it's empty
+        for command in mix:
+            await run_command(client, command, args)
+        queries = await count_queries(client, mix, args)
+
+        async def worker():
+            for _ in range(args.requests):
+                command = random.choices(list(mix), weights=list(mix.values()))[0]
+                try:
+                    latencies[command].append(await run_command(client, command, args))
+                except Exception as e:
+                    errors[command] += 1
+                    print(f"{command}: {e!r}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - start
+    finally:
+        await async_db.engine.dispose()
+        if not args.keep:
+            cleanup(sync_db)
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"concurrency={args.concurrency} requests={args.requests} users={args.users} cards={args.cards}")
+    print(f"{total} commands in {elapsed:.2f}s, {total / elapsed:.1f} cmd/s")
+    print(f"{'command':<10}{'n':>6}{'cmd/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'errors':>8}")
+    for command, samples in latencies.items():
+        if not samples:
+            print(f"{command:<10}{0:>6}{'-':>9}{'-':>10}{'-':>10}{'-':>10}{queries[command]:>9}{errors[command]:>8}")
+            continue
+        print(f"{command:<10}{len(samples):>6}{len(samples) / elapsed:>9.1f}{percentile(samples, 50)*1000:>10.1f}"
+              f"{percentile(samples, 95)*1000:>10.1f}{percentile(samples, 99)*1000:>10.1f}{queries[command]:>9}{errors[command]:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=25)
+    parser.add_argument("--mix", default=default_mix)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--cards", type=int, default=100)
+    parser.add_argument("--cards-per-user", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--keep", action="store_true", help="leave the seeded bench guild in the database")
+    parsed = parser.parse_args()
+    random.seed(parsed.seed)
+    asyncio.run(main(parsed))
@@ -0,0 +1,95 @@
+"""
+Command latency under concurrent load, blocking DbService on the event loop (before)
+vs AsyncDbService (after). Every simulated command does the usual user lookup plus the
+leaderboard query, --query-delay pads each command with a pg_sleep to stand in for a slow query.
+
+    python -m tools.bench_db --concurrency 50 --requests 20 --query-delay 0.01
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import func, select
+from envvars import Env
+from models.dbcontainer import AsyncDbService, DbService
+from models.models import User
+from tools.benchstats import percentile
+
+
+def sync_command(dbservice: DbService, guild_id: str, user_id: str, delay: float):
+    with dbservice.Session() as session:
+        session.scalar(select(User).filter(User.user_id == user_id, User.guild_id == guild_id))
+        session.scalars(select(User).filter(User.guild_id == guild_id).order_by(User.brancoins.desc()).limit(10)).all()
+        if delay > 0:
+            session.execute(select(func.pg_sleep(delay)))
+
+
+async def async_command(dbservice: AsyncDbService, guild_id: str, user_id: str, delay: float):
+    async with dbservice.Session() as session:
+        await session.scalar(select(User).filter(User.user_id == user_id, User.guild_id == guild_id))
+        (await session.scalars(select(User).filter(User.guild_id == guild_id).order_by(User.brancoins.desc()).limit(10))).all()
+        if delay > 0:
+            await session.execute(select(func.pg_sleep(delay)))
+
+
+async def measure_loop_lag(lags, stop: asyncio.Event, interval=0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_mode(mode, args, sync_db: DbService, async_db: AsyncDbService):
+    latencies = []
+
+    async def worker(worker_idx):
+        user_id = str(worker_idx)
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            if mode == "sync":
+                # what every command did before, a blocking query straight on the loop
+                sync_command(sync_db, args.guild, user_id, args.query_delay)
+                await asyncio.sleep(0)
+            else:
+                await async_command(async_db, args.guild, user_id, args.query_delay)
+            latencies.append(time.perf_counter() - start)
+
+    lags = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(idx) for idx in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await lag_task
+
+    return {
+        "mode": mode,
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "lag_p99": percentile(lags, 99) if lags else 0,
+    }
+
+
+async def main(args):
+    sync_db = DbService(Env.db_conn_str)
+    async_db = AsyncDbService(Env.db_conn_str_async, Env.trigram_threshold)
+    results = []
+    for mode in ["sync", "async"]:
+        results.append(await run_mode(mode, args, sync_db, async_db))
+    await async_db.engine.dispose()
+
+    print(f"concurrency={args.concurrency} requests={args.requests} query_delay={args.query_delay}s")
+    print(f"{'mode':<8}{'cmd/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'loop lag p99 ms':>18}")
+    for result in results:
+        print(f"{result['mode']:<8}{result['throughput']:>10.1f}{result['p50']*1000:>10.2f}{result['p99']*1000:>10.2f}{result['lag_p99']*1000:>18.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--query-delay", type=float, default=0.01)
+    parser.add_argument("--guild", default="0")
+    asyncio.run(main(parser.parse_args()))
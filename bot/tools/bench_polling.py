@@ -0,0 +1,193 @@
+"""
+Drives look_for_open_games, handle_finished_games and process_votes against tools.riot_standin, no
+riot key or discord connection needed. For each population size it seeds that many tracked players
+(and a few votes on every match they start) into the configured database, so point POSTGRES_DB at a
+scratch copy. Reports tick durations, riot calls per tick and settlement throughput.
+
+Game lengths and every scheduler interval are divided by --time-scale, so a few minutes of wall
+clock covers a couple of hours of play at the same call pattern.
+
+    python -m tools.bench_polling --players 10,100,1000 --duration 180 --latency 40 --rate-429 0.01
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+import discord
+from riotwatcher import LolWatcher, RiotWatcher
+from sqlalchemy import delete, insert, select
+from discord.VoteType import VoteType
+from discord.bot_league_monitor import DiscordMonitorClient
+from envvars import Env
+from league.finishscheduler import FinishScheduler
+from league.leagueservice import LeagueService
+from league.pollscheduler import PollScheduler
+from league.riotgateway import RiotGateway
+from models.dbcontainer import AsyncDbService, DbService
+from models.models import Guild, LeagueUser, Match, MatchPlayer, MatchResult, User, Votes
+from tools import riot_standin
+from tools.benchstats import percentile
+from tools.riot_standin import World
+
+guild_id = "bench_poll_guild"
+
+
+def cleanup(db: DbService):
+    with db.Session() as session:
+        league_ids = select(LeagueUser.id).join(User, LeagueUser.discord_user_id == User.id).filter(User.guild_id == guild_id)
+        match_ids = select(MatchPlayer.match_id).filter(MatchPlayer.league_user_id.in_(league_ids)).scalar_subquery()
+        session.execute(delete(Votes).filter(Votes.match_id.in_(match_ids)))
+        session.execute(delete(MatchResult).filter(MatchResult.match_id.in_(match_ids)))
+        # match_player goes before match, so keep the ids around
+        stale = session.scalars(select(MatchPlayer.match_id).filter(MatchPlayer.league_user_id.in_(league_ids))).all()
+        session.execute(delete(MatchPlayer).filter(MatchPlayer.match_id.in_(stale)))
+        session.execute(delete(Match).filter(Match.match_id.in_(stale)))
+        session.execute(delete(LeagueUser).filter(LeagueUser.id.in_(league_ids)))
+        session.execute(delete(User).filter(User.guild_id == guild_id))
+        session.execute(delete(Guild).filter(Guild.guild_id == guild_id))
+        session.commit()
+
+
+def seed(db: DbService, players: int):
+    with db.Session() as session:
+        session.execute(insert(Guild).values(guild_id=guild_id, brancoins=10))
+        user_pks = session.scalars(insert(User).returning(User.id),
+                                   [{"user_id": str(idx), "guild_id": guild_id, "brancoins": 1000} for idx in range(players)]).all()
+        session.execute(insert(LeagueUser), [
+            {"summoner_name": World.riot_id(idx)[0], "tag": World.riot_id(idx)[1], "trackable": True, "voteable": True,
+             "puuid": World.puuid(idx), "discord_user_id": user_pk} for idx, user_pk in enumerate(user_pks)])
+        session.commit()
+    return user_pks
+
+
+def seed_votes(db: DbService, user_pks, votes_per_match: int, voted: set):
+    with db.Session() as session:
+        open_ids = session.scalars(select(Match.match_id).filter(Match.finished == False)).all()
+        fresh = [match_id for match_id in open_ids if match_id not in voted]
+        rows = [{"voter_id": voter, "match_id": match_id, "type_of_vote": random.choice([VoteType.WIN.value, VoteType.LOSE.value]), "brancoins": 10}
+                for match_id in fresh for voter in random.sample(user_pks, min(votes_per_match, len(user_pks)))]
+        if rows:
+            session.execute(insert(Votes), rows)
+        session.commit()
+    voted.update(fresh)
+
+
+def scaled_schedulers(scale: float):
+    poll_scheduler = PollScheduler()
+    poll_scheduler.base_interval = PollScheduler.base_interval / scale
+    poll_scheduler.caps = [(window / scale, cap / scale) for window, cap in PollScheduler.caps]
+    poll_scheduler.never_seen_cap = PollScheduler.never_seen_cap / scale
+    poll_scheduler.dormant_cap = PollScheduler.dormant_cap / scale
+
+    finish_scheduler = FinishScheduler(use_spectator=Env.spectator_finish_check)
+    finish_scheduler.durations = {mode: (shortest / scale, typical / scale) for mode, (shortest, typical) in FinishScheduler.durations.items()}
+    finish_scheduler.default_duration = tuple(value / scale for value in FinishScheduler.default_duration)
+    finish_scheduler.spectator_interval = tuple(value / scale for value in FinishScheduler.spectator_interval)
+    finish_scheduler.match_backoff = tuple(value / scale for value in FinishScheduler.match_backoff)
+    return poll_scheduler, finish_scheduler
+
+
+def calls_between(before, after, kind: str = None):
+    return sum(count - before.get(key, 0) for key, count in after.items() if kind is None or key.startswith(kind + ":"))
+
+
+async def noop(*args, **kwargs):
+    pass
+
+
+def run_size(players: int, args, db: DbService, async_db: AsyncDbService, loop):
+    cleanup(db)
+    user_pks = seed(db, players)
+
+    args.players = players
+    args.game_seconds = 25 * 60 / args.time_scale
+    args.idle_seconds = 20 * 60 / args.time_scale
+    args.result_lag = 30 / args.time_scale
+    server = riot_standin.start(args)
+
+    gateway = RiotGateway(app_limits=args.app_limits, method_limits={"SpectatorApiV5.by_summoner": args.method_limits})
+    lol_watcher = LolWatcher(api_key="standin", timeout=10, rate_limiter=gateway)
+    riot_watcher = RiotWatcher(api_key="standin", timeout=10, rate_limiter=gateway)
+    league = LeagueService(lol_watcher, riot_watcher, gateway, base_url=f"http://{args.host}:{args.port}")
+    LeagueService.last_games.clear()
+
+    client = DiscordMonitorClient(intents=discord.Intents.default(), dbservice=db, async_dbservice=async_db, league_service=league)
+    client.loop = loop
+    # discord isn't part of this, the timers only hand these to the loop anyway
+    client.broadcast_open_matches = noop
+    client.output_votes_results = noop
+    client.poll_scheduler, client.finish_scheduler = scaled_schedulers(args.time_scale)
+
+    settle_times = []
+    process_votes = client.process_votes
+
+    def timed_process_votes(session, match, result):
+        start = time.perf_counter()
+        payouts = process_votes(session, match, result)
+        settle_times.append(time.perf_counter() - start)
+        return payouts
+    client.process_votes = timed_process_votes
+
+    ticks = {"look": ([], []), "handle": ([], [])}
+    voted = set()
+    cadence = {"look": 15 / args.time_scale, "handle": 30 / args.time_scale}
+    next_run = {"look": 0, "handle": cadence["handle"]}
+    start = time.monotonic()
+    while time.monotonic() - start < args.duration:
+        name = min(next_run, key=next_run.get)
+        time.sleep(max(0, start + next_run[name] - time.monotonic()))
+        before = server.snapshot()
+        tick_start = time.perf_counter()
+        if name == "look":
+            client.look_for_open_games()
+        else:
+            client.handle_finished_games()
+        ticks[name][0].append(time.perf_counter() - tick_start)
+        ticks[name][1].append(calls_between(before, server.snapshot()))
+        if name == "look":
+            seed_votes(db, user_pks, args.votes, voted)
+        next_run[name] += cadence[name]
+
+    server.shutdown()
+    server.server_close()
+    calls = server.snapshot()
+    with db.Session() as session:
+        settled = session.query(Match).join(MatchPlayer).join(LeagueUser).join(User, LeagueUser.discord_user_id == User.id).filter(
+            User.guild_id == guild_id, Match.finished == True).distinct().count()
+
+    print(f"\n{players} tracked players, {args.duration:.0f}s at {args.time_scale:g}x ({args.duration * args.time_scale / 60:.0f} simulated minutes)")
+    for name, (durations, call_counts) in ticks.items():
+        print(f"  {name:>6} ticks {len(durations):>4}  p50 {percentile(durations, 50) * 1000:8.1f}ms  p95 {percentile(durations, 95) * 1000:8.1f}ms  "
+              f"max {max(durations, default=0) * 1000:8.1f}ms  calls/tick avg {sum(call_counts) / max(len(call_counts), 1):6.1f} max {max(call_counts, default=0)}")
+    print(f"  riot calls {calls_between({}, calls)}: " + ", ".join(f"{key} {count}" for key, count in sorted(calls.items())))
+    print(f"  matches opened {len(voted)}, settled {settled}")
+    if settle_times:
+        print(f"  settlement p50 {percentile(settle_times, 50) * 1000:.1f}ms  p95 {percentile(settle_times, 95) * 1000:.1f}ms  "
+              f"{len(settle_times) / sum(settle_times):.0f} matches/s ({args.votes} votes each)")
+    cleanup(db)
+
+
+def main(args):
+    db = DbService(Env.db_conn_str)
+    async_db = AsyncDbService(Env.db_conn_str_async, Env.trigram_threshold)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    try:
+        for players in [int(size) for size in args.players.split(",")]:
+            run_size(players, args, db, async_db, loop)
+    finally:
+        cleanup(db)
+        loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    riot_standin.add_arguments(parser)
+    parser.set_defaults(app_limits=Env.riot_app_limits, method_limits=Env.riot_spectator_limits)
+    parser.add_argument("--players", default="10,100,1000", help="tracked population sizes to run, comma separated")
+    parser.add_argument("--duration", type=float, default=180, help="wall clock seconds per population size")
+    parser.add_argument("--time-scale", type=float, default=30)
+    parser.add_argument("--votes", type=int, default=5, help="votes placed on every match")
+    main(parser.parse_args())
@@ -0,0 +1,135 @@
+"""
+Compares the thread and process render backends on the image commands' render paths (an inventory
+page, a pack row, the shop mat and a summon gif) at increasing numbers of concurrent requests.
+Cards are made up in memory and the disk render cache is off, no database needed. Reports request
+latency, throughput and how far the event loop lagged behind while it waited on renders.
+
+By default every card is rendered once up front and requests measure the compositing that happens
+on every command. --cold gives each request cards nobody has rendered yet, so the card renders are
+measured too.
+
+    python -m tools.bench_render --backends thread,process --concurrency 1,2,4,8,16 --requests 32
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from io import BytesIO
+
+from PIL import Image as PILImage
+from discord.commands.viewshop import ViewShop
+from discord.drawutils import DrawUtils
+from discord.renderbackend import RenderBackend
+from discord.renderstore import RenderMemory, RenderStore
+from envvars import Env
+from models.models import Card, Image
+from tools.benchstats import percentile
+
+costs = [50, 300, 450, 700]
+
+
+def placeholder_image() -> bytes:
+    buffered = BytesIO()
+    PILImage.new("RGB", (256, 256), (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def make_cards(count: int, prefix: str):
+    image_bin = placeholder_image()
+    cards = []
+    for idx in range(count):
+        card = Card(id=idx, card_style="normal", title=f"{prefix} {idx}", attribute="Earth", level="4", type="Monster",
+                    description=f"bench description {idx}", atk="1000", defe="1000", cost=costs[idx % len(costs)], image_label=f"bench_{idx}")
+        card.image = Image(label=f"bench_{idx}", bin=image_bin)
+        cards.append(card)
+    return cards
+
+
+async def inventory_page(cards):
+    return await DrawUtils.draw_inv_card_spread(cards[:24], (1600, 1600), (6, 4), draw_blanks=True, draw_idx=True)
+
+
+async def pack_row(cards):
+    return await DrawUtils.draw_inv_card_spread(cards[:6], (1400, 400), (6, 1), draw_blanks=True, bg="boostermat.jpeg")
+
+
+async def shop(cards):
+    return await DrawUtils.draw_shop(cards[:4], [card.cost for card in cards[:4]], (ViewShop.card_width, ViewShop.card_height), ViewShop.card_coords, ViewShop.text_coords)
+
+
+async def summon(cards):
+    return await DrawUtils.summon(cards[0])
+
+
+paths = {"inv": inventory_page, "pack": pack_row, "shop": shop, "summon": summon}
+
+
+async def watch_lag(samples, interval: float = 0.01):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0, time.perf_counter() - start - interval))
+
+
+async def run_level(concurrency: int, args, warm_cards, request_ids):
+    mix = itertools.cycle(args.mix.split(","))
+    latencies = {name: [] for name in paths}
+    lag = []
+    lag_task = asyncio.create_task(watch_lag(lag))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(name):
+        cards = make_cards(24, f"bench cold {next(request_ids)}") if args.cold else warm_cards
+        async with semaphore:
+            start = time.perf_counter()
+            await paths[name](cards)
+            latencies[name].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(next(mix)) for _ in range(args.requests)])
+    elapsed = time.perf_counter() - start
+    lag_task.cancel()
+    return elapsed, latencies, lag
+
+
+async def run_backend(kind: str, args):
+    DrawUtils.render_backend = RenderBackend(kind, args.workers)
+    DrawUtils.render_cache = RenderMemory(maxsize=max(150, args.requests * 24))
+    start = time.perf_counter()
+    await asyncio.to_thread(DrawUtils.render_backend.warm)
+    print(f"\n{kind} backend, {args.workers} workers, warmed in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    warm_cards = make_cards(24, "bench warm")
+    start = time.perf_counter()
+    await DrawUtils.card_pngs(warm_cards)
+    print(f"  rendered 24 cards in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    request_ids = itertools.count()
+    try:
+        for concurrency in [int(level) for level in args.concurrency.split(",")]:
+            elapsed, latencies, lag = await run_level(concurrency, args, warm_cards, request_ids)
+            every = [sample for samples in latencies.values() for sample in samples]
+            print(f"  {concurrency:>3} concurrent  {args.requests / elapsed:6.1f} req/s  p50 {percentile(every, 50) * 1000:7.0f}ms  "
+                  f"p95 {percentile(every, 95) * 1000:7.0f}ms  loop lag p95 {percentile(lag, 95) * 1000:5.0f}ms max {max(lag, default=0) * 1000:5.0f}ms  |  "
+                  + "  ".join(f"{name} {percentile(samples, 50) * 1000:.0f}ms" for name, samples in latencies.items() if samples))
+    finally:
+        DrawUtils.render_backend.shutdown()
+
+
+async def main(args):
+    # only the in-memory tier, a disk hit would hide what the backends cost
+    DrawUtils.render_store = RenderStore("", 0)
+    for kind in args.backends.split(","):
+        await run_backend(kind, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default="thread,process")
+    parser.add_argument("--workers", type=int, default=Env.render_workers)
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="concurrent request levels, comma separated")
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--mix", default="inv,pack,shop,summon", help=f"request kinds cycled through, from {','.join(paths)}")
+    parser.add_argument("--cold", action="store_true", help="new cards on every request, so card renders are included")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,11 @@
+"""
+Helpers shared by the tools.bench_* scripts.
+"""
+
+
+def percentile(samples, pct):
+    # nearest rank, 0 for no samples so a run that recorded nothing still prints
+    if len(samples) == 0:
+        return 0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,159 @@
+"""
+Seeds a large throwaway dataset, EXPLAINs the hot queries from the monitor, spin, shop,
+torchdupes and leaderboard paths, and exits non-zero if any of them seq scans one of the
+big tables. Everything runs in one transaction that is rolled back, so it's safe to point
+at a dev database that has been migrated to head.
+
+    python -m tools.explain_hot_queries --scale 1
+"""
+import argparse
+import datetime
+import json
+import sys
+
+from sqlalchemy import func, select, text
+from discord.CardBonusType import CardBonusType
+from discord.commands.torchdupes import DeleteDupeCards
+from envvars import Env
+from models.dbcontainer import DbService
+from models.models import BoosterCard, Card, CardBonus, Match, OwnedCard, Shop, User, Votes
+
+# tables that grow with usage, a seq scan on anything else (cards, guild, cardbonuses) is fine
+watched_tables = {"user_account", "ownedcards", "match", "votes", "shop", "booster_card"}
+
+
+def seed(connection, scale: int):
+    sizes = {
+        "guilds": 20,
+        "users": 5000 * scale,
+        "cards": 2000,
+        "owned": 200000 * scale,
+        "matches": 20000 * scale,
+        "votes": 60000 * scale,
+        "shop_days": 3000,
+        "packs": 50,
+    }
+    connection.execute(text("INSERT INTO images (label, bin) VALUES ('bench_img', '\\x00')"))
+    connection.execute(text(
+        "INSERT INTO cards (card_style, title, attribute, level, type, description, atk, defe, cost, image_label, shoppable, featured) "
+        "SELECT 'normal', 'bench card ' || g, 'EARTH', '4', 'Monster', 'bench description ' || g, '1', '1', g % 1500, 'bench_img', true, false "
+        "FROM generate_series(1, :cards) g"), sizes)
+    card_base = connection.execute(text("SELECT min(id) FROM cards WHERE image_label = 'bench_img'")).scalar()
+    connection.execute(text(
+        "INSERT INTO cardbonuses (card_id, bonus_type) SELECT :card_base + g, :bonus FROM generate_series(0, 20) g"),
+        {"card_base": card_base, "bonus": CardBonusType.SPIN_2X.value})
+
+    connection.execute(text(
+        "INSERT INTO guild (guild_id, brancoins) SELECT 'bench_g' || g, 10 FROM generate_series(0, :guilds - 1) g"), sizes)
+    connection.execute(text(
+        "INSERT INTO user_account (user_id, guild_id, brancoins) "
+        "SELECT 'bench_u' || g, 'bench_g' || (g % :guilds), (g * 7919) % 10000 FROM generate_series(0, :users - 1) g"), sizes)
+    user_base = connection.execute(text("SELECT min(id) FROM user_account WHERE user_id LIKE 'bench_u%'")).scalar()
+
+    connection.execute(text(
+        "INSERT INTO ownedcards (owner_id, card_id) "
+        "SELECT :user_base + (g % :users), :card_base + ((g * 31) % :cards) FROM generate_series(0, :owned - 1) g"),
+        {**sizes, "user_base": user_base, "card_base": card_base})
+
+    connection.execute(text(
+        "INSERT INTO match (match_id, finished, start_time, match_type) "
+        "SELECT 'bench_m' || g, g > 5, now() - (g || ' minutes')::interval, 'ARAM' FROM generate_series(0, :matches - 1) g"), sizes)
+    connection.execute(text(
+        "INSERT INTO votes (voter_id, match_id, processed, type_of_vote, brancoins) "
+        "SELECT :user_base + (g % :users), 'bench_m' || (g % :matches), g % :matches > 5, 1 + g % 2, 10 FROM generate_series(0, :votes - 1) g"),
+        {**sizes, "user_base": user_base})
+
+    connection.execute(text(
+        "INSERT INTO shop (card_id, date_added) "
+        "SELECT :card_base + (g % :cards), current_date - (g / 6) FROM generate_series(0, :shop_days * 6 - 1) g"),
+        {**sizes, "card_base": card_base})
+
+    connection.execute(text("INSERT INTO booster_pack (id, cost, image_label, \"desc\") SELECT 'bench_p' || g, 100, 'bench_img', '' FROM generate_series(0, :packs - 1) g"), sizes)
+    connection.execute(text(
+        "INSERT INTO booster_segments (booster_pack_id, id, num_cards_to_draw) "
+        "SELECT 'bench_p' || p, s, 3 FROM generate_series(0, :packs - 1) p, unnest(ARRAY['common', 'rare']) s"), sizes)
+    connection.execute(text(
+        "INSERT INTO booster_card (card_id, booster_pack_id, booster_segment_id, chance) "
+        "SELECT :card_base + (g % :cards), 'bench_p' || (g % :packs), CASE WHEN g % 5 = 0 THEN 'rare' ELSE 'common' END, 1 "
+        "FROM generate_series(0, :packs * 100 - 1) g"),
+        {**sizes, "card_base": card_base})
+
+    for table in watched_tables | {"cards", "guild", "cardbonuses", "booster_segments"}:
+        connection.execute(text(f"ANALYZE {table}"))
+    return user_base
+
+
+def hot_queries(owner_id: int):
+    guild_id = "bench_g3"
+    user_id = "bench_u63"
+    return {
+        # bot_league_monitor.py
+        "open matches": select(Match).filter(Match.finished == False),
+        "match already tracked": select(func.count()).select_from(Match).filter(Match.match_id == "bench_m1234"),
+        "votes for match": select(Votes).filter(Votes.match_id == "bench_m3"),
+        # spin.py
+        "spin user lookup": select(User).filter(User.user_id == user_id, User.guild_id == guild_id),
+        "spin bonus rolls": select(func.count()).select_from(
+            select(CardBonus).distinct(CardBonus.id).filter(CardBonus.bonus_type == CardBonusType.SPIN_2X.value)
+            .join(Card).join(OwnedCard).join(User).filter(User.user_id == user_id).subquery()),
+        "jackpot upper class": select(User).filter(User.guild_id == guild_id).order_by(User.brancoins.desc()).limit(3),
+        # viewshop.py
+        "shop count today": select(func.count()).select_from(Shop).filter(Shop.date_added == datetime.date.today()),
+        "shop items today": select(Shop).join(Card, Shop.card).filter(Shop.date_added == datetime.date.today()).order_by(Card.cost.asc(), Card.id.asc()),
+        "owned card ids": select(OwnedCard.card_id).filter(OwnedCard.owner_id == owner_id),
+        "pack distinct cards": select(func.distinct(BoosterCard.card_id)).filter(BoosterCard.booster_pack_id == "bench_p7"),
+        # torchdupes.py
+        "torch dupes": (DeleteDupeCards.dupes_query, {"ownerid": owner_id}),
+        # coins.py
+        "leaderboard": select(User).filter(User.guild_id == guild_id).order_by(User.brancoins.desc()).limit(10),
+    }
+
+
+def find_seq_scans(plan, found):
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in watched_tables:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        find_seq_scans(child, found)
+    return found
+
+
+def explain(connection, query):
+    if isinstance(query, tuple):
+        statement, params = query
+        return connection.execute(text("EXPLAIN (FORMAT JSON) " + statement.text), params).scalar()
+    # compiled orm statements carry the driver's paramstyle, hand them straight to it
+    compiled = query.compile(dialect=connection.dialect)
+    return connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+
+
+def main(args):
+    dbservice = DbService(Env.db_conn_str)
+    failures = []
+    with dbservice.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            print("seeding...")
+            owner_id = seed(connection, args.scale)
+            for name, query in hot_queries(owner_id + 42).items():
+                plan = explain(connection, query)
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                seq_scans = find_seq_scans(plan[0]["Plan"], [])
+                status = "ok" if len(seq_scans) == 0 else f"SEQ SCAN on {', '.join(seq_scans)}"
+                print(f"{name:<24}{status}")
+                if args.verbose:
+                    print(json.dumps(plan[0]["Plan"], indent=2))
+                if len(seq_scans) > 0:
+                    failures.append(name)
+        finally:
+            transaction.rollback()
+
+    if failures:
+        print(f"{len(failures)} hot queries fell back to a sequential scan")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true")
+    main(parser.parse_args())
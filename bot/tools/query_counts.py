@@ -0,0 +1,118 @@
+"""
+Locks in the loader strategies on the card heavy paths: seeds a small and a large inventory/pack
+inside a rolled back transaction and asserts each path issues the same, constant number of queries
+for both. Exits non-zero on a regression.
+
+    python -m tools.query_counts
+"""
+import asyncio
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from discord.commands.inventory import Inventory
+from discord.commands.openpack import OpenPack
+from discord.commands.viewcard import ViewCard
+from discord.drawutils import DrawUtils
+from envvars import Env
+from models.dbcontainer import AsyncDbService
+from models.identitycache import IdentityCache
+from models.models import OwnedCard, User
+from models.querycounter import QueryCounter
+from sqlalchemy.orm import selectinload
+
+sizes = [20, 200]
+guild_id = "query_count_guild"
+
+
+async def seed(connection, size: int):
+    # asyncpg is strict about types, so text prefixes are passed separately from the integer size
+    params = {"size": size, "prefix": f"query_count_{size}_", "user_id": f"query_count_{size}", "guild_id": guild_id, "pack": f"query_count_{size}"}
+    await connection.execute(text(
+        "INSERT INTO images (label, bin) SELECT :prefix || g, '\\x00' FROM generate_series(0, :size - 1) g"), params)
+    card_base = (await connection.execute(text(
+        "INSERT INTO cards (card_style, title, attribute, level, type, description, atk, defe, cost, image_label, shoppable, featured) "
+        "SELECT 'normal', 'query count card ' || g, 'EARTH', '4', 'Monster', 'desc ' || g, '1', '1', g, :prefix || g, true, false "
+        "FROM generate_series(0, :size - 1) g RETURNING id"), params)).scalars().all()
+    user_pk = (await connection.execute(text(
+        "INSERT INTO user_account (user_id, guild_id, brancoins) VALUES (:user_id, :guild_id, 10) RETURNING id"), params)).scalar()
+    await connection.execute(text(
+        "INSERT INTO ownedcards (owner_id, card_id) SELECT :owner, unnest(CAST(:cards AS integer[]))"), {"owner": user_pk, "cards": card_base})
+    await connection.execute(text(
+        "INSERT INTO booster_pack (id, cost, image_label, \"desc\") VALUES (:pack, 1, :prefix || '0', '')"), params)
+    await connection.execute(text(
+        "INSERT INTO booster_segments (booster_pack_id, id, num_cards_to_draw) VALUES (:pack, 'common', 3)"), params)
+    await connection.execute(text(
+        "INSERT INTO booster_card (card_id, booster_pack_id, booster_segment_id, chance) SELECT unnest(CAST(:cards AS integer[])), :pack, 'common', 1"),
+        {**params, "cards": card_base})
+    return params
+
+
+async def inventory_path(session, params):
+    guy = await IdentityCache.get_user(session, params["user_id"], guild_id, options=Inventory.owned_card_options())
+    cards = [owned_card.card for owned_card in guy.owned_cards]
+    await DrawUtils.preload_images(session, cards)
+    assert all(card.image.bin is not None for card in cards)
+
+
+async def torch_path(session, params):
+    guy = await IdentityCache.get_user(session, params["user_id"], guild_id, options=[selectinload(User.owned_cards).selectinload(OwnedCard.card)])
+    [owned_card.card.cost for owned_card in guy.owned_cards]
+
+
+async def search_path(session, params):
+    guy = await IdentityCache.get_user(session, params["user_id"], guild_id)
+    owned_card = await ViewCard.find_card_by_text(session, guy, "query count card 7")
+    if owned_card:
+        owned_card.card.image.label
+
+
+async def pack_path(session, params):
+    pack = await session.scalar(OpenPack.pack_query(params["pack"]))
+    cards = [booster_card.card for segment in pack.booster_segments for booster_card in segment.booster_cards]
+    await DrawUtils.preload_images(session, cards)
+
+
+paths = {
+    "inventory": (inventory_path, 5),
+    "torch": (torch_path, 3),
+    "viewcard search": (search_path, 2),
+    "open pack": (pack_path, 6),
+}
+
+
+async def main():
+    dbservice = AsyncDbService(Env.db_conn_str_async, Env.trigram_threshold)
+    failures = []
+    async with dbservice.engine.connect() as connection:
+        transaction = await connection.begin()
+        try:
+            seeded = [await seed(connection, size) for size in sizes]
+            for name, (path, limit) in paths.items():
+                counts = []
+                for params in seeded:
+                    DrawUtils.render_cache.clear()
+                    async with AsyncSession(bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False) as session:
+                        with QueryCounter(dbservice.engine) as counter:
+                            await path(session, params)
+                    counts.append(counter.count)
+                    try:
+                        counter.assert_at_most(limit, f"{name} ({params['size']} cards)")
+                    except AssertionError as e:
+                        failures.append(str(e))
+                scales = "ok" if len(set(counts)) == 1 else "SCALES WITH SIZE"
+                if len(set(counts)) != 1:
+                    failures.append(f"{name}: query count changed with size {counts}")
+                print(f"{name:<18}{' / '.join(str(x) for x in counts):>10} queries (limit {limit}) {scales}")
+        finally:
+            await transaction.rollback()
+    await dbservice.engine.dispose()
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
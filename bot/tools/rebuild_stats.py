@@ -0,0 +1,30 @@
+"""
+Recomputes player_stats and voter_stats from match_player, match_result and votes. Settlement keeps
+them current on its own, this is for after a backfill (tools.backfill_match_results), a change to
+how they're computed, or if they're ever suspected to have drifted. One transaction, so the bot
+keeps seeing the old numbers until it commits.
+
+    python -m tools.rebuild_stats
+"""
+import time
+
+from sqlalchemy import func, select
+from envvars import Env
+from models.dbcontainer import DbService
+from models.models import PlayerStats, VoterStats
+from models.statsaggregates import StatsAggregates
+
+
+def main():
+    db = DbService(Env.db_conn_str)
+    start = time.perf_counter()
+    with db.Session() as session:
+        StatsAggregates.rebuild_sync(session)
+        players = session.scalar(select(func.count()).select_from(PlayerStats))
+        voters = session.scalar(select(func.count()).select_from(VoterStats))
+        session.commit()
+    print(f"rebuilt {players} player_stats and {voters} voter_stats rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
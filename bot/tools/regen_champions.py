@@ -0,0 +1,75 @@
+"""
+Regenerates league/champion.json from a newer Data Dragon dump on disk, keeping only the fields
+ChampionIndex uses. Takes either the champion.json itself or an extracted dragontail directory.
+The running bot picks the new file up on its next lookup.
+
+    python -m tools.regen_champions ~/Downloads/dragontail-14.10.1
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+from league.championindex import ChampionIndex
+
+kept_fields = ["version", "id", "key", "name", "title", "tags", "image"]
+
+
+def version_key(match: str):
+    # the directory above data/, e.g. 13.10.1. compared as numbers, as strings 13.9.1 sorts after it
+    version = os.path.basename(match.split(os.sep + "data" + os.sep)[0])
+    try:
+        return (1, tuple(int(part) for part in version.split(".")))
+    except ValueError:
+        return (0, ())
+
+
+def find_dump(path: str, locale: str) -> str:
+    if os.path.isfile(path):
+        return path
+    matches = glob.glob(os.path.join(path, "**", "data", locale, "champion.json"), recursive=True)
+    if len(matches) == 0:
+        sys.exit(f"no data/{locale}/champion.json under {path}")
+    # dragontail has one directory per version, take the newest
+    return max(matches, key=version_key)
+
+
+def main(args):
+    source = find_dump(args.source, args.locale)
+    with open(source) as fp:
+        dump = json.load(fp)
+
+    trimmed = {
+        "type": dump.get("type", "champion"),
+        "format": dump.get("format", "standAloneComplex"),
+        "version": dump["version"],
+        "data": {champion_id: {field: value[field] for field in kept_fields if field in value} for champion_id, value in dump["data"].items()},
+    }
+    by_key, _ = ChampionIndex.build(trimmed)
+    if len(by_key) != len(trimmed["data"]):
+        sys.exit("duplicate champion keys in the dump, refusing to write it")
+
+    previous = {}
+    if os.path.exists(args.output):
+        with open(args.output) as fp:
+            previous, _ = ChampionIndex.build(json.load(fp))
+
+    # write next to the target and swap it in, a lookup mid write shouldn't see half a file
+    temp_path = args.output + ".tmp"
+    with open(temp_path, "w") as fp:
+        json.dump(trimmed, fp, separators=(",", ":"))
+    os.replace(temp_path, args.output)
+
+    added = sorted(by_key[key].id for key in by_key.keys() - previous.keys())
+    print(f"wrote {len(by_key)} champions (version {trimmed['version']}) from {source} to {args.output}")
+    if added:
+        print(f"new: {', '.join(added)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="a Data Dragon champion.json or an extracted dragontail directory")
+    parser.add_argument("--locale", default="en_US")
+    parser.add_argument("--output", default=ChampionIndex.path)
+    main(parser.parse_args())
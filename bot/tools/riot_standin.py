@@ -0,0 +1,393 @@
+"""
+A local stand-in for the parts of the Riot API the bot uses: spectator by_summoner, match-v5 by_id and
+matchlist, and account by_riot_id. Point the bot at it with RIOT_BASE_URL=http://host:port and it
+keeps its rate limiter, only the host changes (see LeagueService.point_at).
+
+It simulates a population of players queueing in premades, playing games of a configurable length
+and queueing again. Players are standin<i>#SIM, so `bran addleague standin3 SIM` tracks one. Latency,
+429s and the rate limit headers are injected so the gateway's backoff gets exercised.
+
+--record proxies to the real API with LEAGUE_TOKEN and saves every response under the directory.
+--recordings replays those: an exact path is served as recorded, anything else is synthesized using
+the recorded spectator/match payloads as templates, so responses keep their real shape and size.
+
+    python -m tools.riot_standin --players 1000 --game-seconds 60 --latency 40 --rate-429 0.01
+    python -m tools.riot_standin --record recordings/
+    RIOT_BASE_URL=http://localhost:8099 python app.py
+"""
+import argparse
+import copy
+import glob
+import hashlib
+import http.client
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from league.championindex import ChampionIndex
+
+spectator_path = re.compile(r"^/(\w+)/lol/spectator/v5/active-games/by-summoner/([^/]+)$")
+match_path = re.compile(r"^/(\w+)/lol/match/v5/matches/(\w+?)_(\d+)$")
+matchlist_path = re.compile(r"^/(\w+)/lol/match/v5/matches/by-puuid/([^/]+)/ids$")
+account_path = re.compile(r"^/(\w+)/riot/account/v1/accounts/by-riot-id/([^/]+)/([^/]+)$")
+
+# just the fields the bot reads, used when there are no recordings to take the shape from
+default_templates = {
+    "spectator": {"gameId": 0, "gameMode": "CLASSIC", "gameType": "MATCHED", "gameQueueConfigId": 420, "mapId": 11,
+                  "gameStartTime": 0, "gameLength": 0, "platformId": "NA1",
+                  "participants": [{"puuid": "", "teamId": 100, "championId": 1, "bot": False}]},
+    "match": {"metadata": {"dataVersion": "2", "matchId": "", "participants": []},
+              "info": {"gameId": 0, "gameMode": "CLASSIC", "queueId": 420, "gameVersion": "14.10.588.1", "platformId": "NA1",
+                       "gameCreation": 0, "gameStartTimestamp": 0, "gameEndTimestamp": 0, "gameDuration": 0,
+                       "participants": [{"puuid": "", "teamId": 100, "championId": 1, "win": False, "kills": 0, "deaths": 0, "assists": 0,
+                                         "totalDamageDealtToChampions": 0, "goldEarned": 0, "totalMinionsKilled": 0,
+                                         "neutralMinionsKilled": 0, "teamPosition": ""}],
+                       "teams": [{"teamId": 100, "win": False, "objectives": {"champion": {"first": False, "kills": 0}}}]}},
+}
+modes = {"CLASSIC": 420, "ARAM": 450, "URF": 1900}
+
+
+class Game():
+    __slots__ = ("game_id", "mode", "start", "length", "puuids", "champions", "winner")
+
+    def __init__(self, game_id: int, mode: str, start: float, length: float, puuids: List[str], champions: List[int], winner: int) -> None:
+        self.game_id = game_id
+        self.mode = mode
+        self.start = start
+        self.length = length
+        # ten players, the first five are team 100
+        self.puuids = puuids
+        self.champions = champions
+        self.winner = winner
+
+    def team(self, idx: int) -> int:
+        return 100 if idx < 5 else 200
+
+    @property
+    def end(self) -> float:
+        return self.start + self.length
+
+
+class World():
+    """The simulated population. Advanced lazily on each request: finished games release their
+    players, who idle for a while and then queue in groups of one to five, filled up to ten with
+    players from outside the population."""
+
+    group_sizes = [1, 1, 1, 2, 2, 3, 5]
+    advance_every = 0.05
+
+    def __init__(self, players: int, game_seconds: float, idle_seconds: float, result_lag: float, seed: int = 0, templates: Dict = None) -> None:
+        self.rng = random.Random(seed)
+        self.puuids = [self.puuid(i) for i in range(players)]
+        self.game_seconds = game_seconds
+        self.idle_seconds = idle_seconds
+        self.result_lag = result_lag
+        self.templates = templates or default_templates
+        ChampionIndex.refresh()
+        self.champion_keys = [int(key) for key in ChampionIndex.by_key]
+        now = time.time()
+        # staggered so the first minutes aren't one big wave of games
+        self.next_queue = {puuid: now + self.rng.uniform(0, idle_seconds) for puuid in self.puuids}
+        self.playing: Dict[str, Game] = {}
+        self.games: Dict[int, Game] = {}
+        self.history: Dict[str, List[int]] = {}
+        self.next_game_id = 5000000000
+        self.advanced_at = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def puuid(idx: int) -> str:
+        return f"standin-puuid-{idx:06d}"
+
+    @staticmethod
+    def riot_id(idx: int):
+        return f"standin{idx}", "SIM"
+
+    def advance(self, now: float):
+        with self.lock:
+            # every spectator call lands here, once a tick's worth of them is plenty
+            if now - self.advanced_at < self.advance_every:
+                return
+            self.advanced_at = now
+            for puuid, game in list(self.playing.items()):
+                if game.end <= now:
+                    del self.playing[puuid]
+                    self.next_queue[puuid] = game.end + self.rng.expovariate(1 / self.idle_seconds)
+            waiting = [puuid for puuid, queue_at in self.next_queue.items() if queue_at <= now]
+            self.rng.shuffle(waiting)
+            while waiting:
+                size = min(len(waiting), self.rng.choice(self.group_sizes))
+                group, waiting = waiting[:size], waiting[size:]
+                self.start_game(group, now)
+
+    def start_game(self, group: List[str], now: float):
+        mode = self.rng.choice(list(modes))
+        fillers = [f"standin-filler-{self.next_game_id}-{idx}" for idx in range(10 - len(group))]
+        # the group is always on team 100, that's what a premade looks like from spectator
+        puuids = group + fillers
+        game = Game(self.next_game_id, mode, now, self.game_seconds * self.rng.uniform(0.7, 1.3), puuids,
+                    self.rng.sample(self.champion_keys, 10), self.rng.choice([100, 200]))
+        self.next_game_id += 1
+        self.games[game.game_id] = game
+        for puuid in group:
+            del self.next_queue[puuid]
+            self.playing[puuid] = game
+            self.history.setdefault(puuid, []).insert(0, game.game_id)
+
+    def spectator(self, puuid: str, now: float) -> Optional[dict]:
+        self.advance(now)
+        game = self.playing.get(puuid)
+        if game is None:
+            return None
+        data = copy.deepcopy(self.templates["spectator"])
+        participant_template = data["participants"][0]
+        data.update(gameId=game.game_id, gameMode=game.mode, gameQueueConfigId=modes[game.mode],
+                    gameStartTime=int(game.start * 1000), gameLength=int(now - game.start))
+        data["participants"] = [dict(participant_template, puuid=player, teamId=game.team(idx), championId=game.champions[idx])
+                                for idx, player in enumerate(game.puuids)]
+        return data
+
+    def match(self, platform: str, game_id: int, now: float) -> Optional[dict]:
+        game = self.games.get(game_id)
+        # results show up a little after the game ends, like the real thing
+        if game is None or game.end + self.result_lag > now:
+            return None
+        data = copy.deepcopy(self.templates["match"])
+        info = data["info"]
+        participant_template = info["participants"][0]
+        team_template = info["teams"][0]
+        rng = random.Random(game_id)
+        data["metadata"].update(matchId=f"{platform}_{game_id}", participants=list(game.puuids))
+        info.update(gameId=game_id, gameMode=game.mode, queueId=modes[game.mode], gameCreation=int(game.start * 1000) - 60000,
+                    gameStartTimestamp=int(game.start * 1000), gameEndTimestamp=int(game.end * 1000), gameDuration=int(game.length))
+        info["participants"] = [dict(participant_template, puuid=player, teamId=game.team(idx), championId=game.champions[idx],
+                                     win=game.team(idx) == game.winner, kills=rng.randint(0, 15), deaths=rng.randint(0, 12),
+                                     assists=rng.randint(0, 25), totalDamageDealtToChampions=rng.randint(5000, 60000),
+                                     goldEarned=rng.randint(6000, 18000), totalMinionsKilled=rng.randint(0, 250))
+                                for idx, player in enumerate(game.puuids)]
+        info["teams"] = [dict(copy.deepcopy(team_template), teamId=team, win=team == game.winner) for team in (100, 200)]
+        for team in info["teams"]:
+            team["objectives"]["champion"]["kills"] = sum(p["kills"] for p in info["participants"] if p["teamId"] != team["teamId"]) // 2
+        return data
+
+    def matchlist(self, puuid: str, count: int) -> List[str]:
+        with self.lock:
+            return [f"NA1_{game_id}" for game_id in self.history.get(puuid, [])[:count]]
+
+    def account(self, game_name: str, tag_line: str) -> Optional[dict]:
+        match = re.fullmatch(r"standin(\d+)", game_name)
+        if tag_line != "SIM" or match is None or int(match.group(1)) >= len(self.puuids):
+            return None
+        return {"puuid": self.puuids[int(match.group(1))], "gameName": game_name, "tagLine": tag_line}
+
+
+class Recordings():
+    """Responses saved by --record, one file per path."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def kind(path: str) -> str:
+        for kind, pattern in (("spectator", spectator_path), ("match", match_path), ("matchlist", matchlist_path), ("account", account_path)):
+            if pattern.match(path):
+                return kind
+        return "other"
+
+    def file_for(self, path: str) -> str:
+        return os.path.join(self.directory, f"{self.kind(path)}-{hashlib.sha1(path.encode()).hexdigest()[:16]}.json")
+
+    def save(self, path: str, status: int, headers: Dict[str, str], body: bytes):
+        with self.lock, open(self.file_for(path), "w") as fp:
+            json.dump({"path": path, "status": status, "headers": headers, "body": body.decode()}, fp)
+
+    def load(self, path: str) -> Optional[dict]:
+        file = self.file_for(path)
+        if not os.path.exists(file):
+            return None
+        with open(file) as fp:
+            return json.load(fp)
+
+    def templates(self) -> Dict:
+        templates = dict(default_templates)
+        for kind in ("spectator", "match"):
+            for file in sorted(glob.glob(os.path.join(self.directory, f"{kind}-*.json"))):
+                with open(file) as fp:
+                    recorded = json.load(fp)
+                if recorded["status"] == 200:
+                    templates[kind] = json.loads(recorded["body"])
+                    break
+        return templates
+
+
+class Counter():
+    # X-*-Rate-Limit-Count style counts over fixed windows
+    def __init__(self, limits: str) -> None:
+        self.limits = [(int(count), int(window)) for count, window in (part.split(":") for part in limits.split(",") if part)]
+        self.counts: Dict[int, tuple] = {}
+        self.lock = threading.Lock()
+
+    def hit(self, now: float) -> str:
+        with self.lock:
+            parts = []
+            for _, window in self.limits:
+                bucket, count = self.counts.get(window, (None, 0))
+                current = int(now // window)
+                count = count + 1 if bucket == current else 1
+                self.counts[window] = (current, count)
+                parts.append(f"{count}:{window}")
+            return ",".join(parts)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, world: World, latency: float = 0, jitter: float = 0, rate_429: float = 0,
+                 app_limits: str = "", method_limits: str = "", recordings: Recordings = None, record: bool = False) -> None:
+        super().__init__(address, StandinHandler)
+        self.world = world
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.app_limits = app_limits
+        self.method_limits = method_limits
+        self.app_counter = Counter(app_limits)
+        self.method_counters: Dict[str, Counter] = {}
+        self.recordings = recordings
+        self.record = record
+        self.calls: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.rng = random.Random()
+
+    def count(self, kind: str, status: int):
+        with self.lock:
+            key = f"{kind}:{status}"
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.calls)
+
+    def method_counter(self, kind: str) -> Counter:
+        with self.lock:
+            if kind not in self.method_counters:
+                self.method_counters[kind] = Counter(self.method_limits)
+            return self.method_counters[kind]
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server: StandinServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        parsed = urllib.parse.urlsplit(self.path)
+        path = urllib.parse.unquote(parsed.path)
+        kind = Recordings.kind(path)
+        if server.record:
+            return self.proxy(kind, parsed)
+
+        if server.latency > 0:
+            time.sleep(max(0, server.rng.gauss(server.latency, server.jitter)) / 1000)
+        now = time.time()
+        headers = {"X-App-Rate-Limit": server.app_limits, "X-App-Rate-Limit-Count": server.app_counter.hit(now),
+                   "X-Method-Rate-Limit": server.method_limits, "X-Method-Rate-Limit-Count": server.method_counter(kind).hit(now)}
+        if server.rate_429 > 0 and server.rng.random() < server.rate_429:
+            limit_type = server.rng.choice(["application", "method", "service"])
+            return self.respond(kind, 429, {"status": {"message": "Rate limit exceeded", "status_code": 429}},
+                                dict(headers, **{"Retry-After": "1", "X-Rate-Limit-Type": limit_type}))
+
+        recorded = server.recordings.load(path) if server.recordings else None
+        if recorded is not None:
+            return self.respond(kind, recorded["status"], None, dict(headers, **{"Content-Type": "application/json"}), recorded["body"].encode())
+
+        body = None
+        if kind == "spectator":
+            body = server.world.spectator(spectator_path.match(path).group(2), now)
+        elif kind == "match":
+            match = match_path.match(path)
+            body = server.world.match(match.group(2), int(match.group(3)), now)
+        elif kind == "matchlist":
+            count = int(urllib.parse.parse_qs(parsed.query).get("count", ["20"])[0])
+            body = server.world.matchlist(matchlist_path.match(path).group(2), count)
+        elif kind == "account":
+            match = account_path.match(path)
+            body = server.world.account(match.group(2), match.group(3))
+        if body is None:
+            return self.respond(kind, 404, {"status": {"message": "Data not found", "status_code": 404}}, headers)
+        return self.respond(kind, 200, body, headers)
+
+    def respond(self, kind: str, status: int, body, headers: Dict[str, str], raw: bytes = None):
+        raw = raw if raw is not None else json.dumps(body).encode()
+        self.server.count(kind, status)
+        self.send_response(status)
+        headers.setdefault("Content-Type", "application/json;charset=utf-8")
+        for name, value in headers.items():
+            if value:
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def proxy(self, kind: str, parsed):
+        # /{platform}/rest... -> https://{platform}.api.riotgames.com/rest...
+        platform, _, rest = parsed.path.lstrip("/").partition("/")
+        connection = http.client.HTTPSConnection(f"{platform}.api.riotgames.com", timeout=10)
+        connection.request("GET", f"/{rest}" + (f"?{parsed.query}" if parsed.query else ""), headers={"X-Riot-Token": os.environ["LEAGUE_TOKEN"]})
+        upstream = connection.getresponse()
+        raw = upstream.read()
+        headers = {name: value for name, value in upstream.getheaders() if name.lower().startswith("x-") or name.lower() in ("retry-after", "content-type")}
+        if upstream.status in (200, 404):
+            self.server.recordings.save(urllib.parse.unquote(parsed.path), upstream.status, headers, raw)
+        self.respond(kind, upstream.status, None, headers, raw)
+
+
+def start(args) -> StandinServer:
+    recordings = Recordings(args.record or args.recordings) if (args.record or args.recordings) else None
+    world = World(args.players, args.game_seconds, args.idle_seconds, args.result_lag, args.seed,
+                  recordings.templates() if recordings else None)
+    server = StandinServer((args.host, args.port), world, args.latency, args.jitter, args.rate_429,
+                           args.app_limits, args.method_limits, recordings, record=bool(args.record))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--game-seconds", type=float, default=25 * 60, help="typical game length")
+    parser.add_argument("--idle-seconds", type=float, default=20 * 60, help="mean time between a player's games")
+    parser.add_argument("--result-lag", type=float, default=30, help="seconds after a game ends before match-v5 has it")
+    parser.add_argument("--latency", type=float, default=0, help="mean added latency in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="latency standard deviation in ms")
+    parser.add_argument("--rate-429", type=float, default=0, help="fraction of calls answered with a 429")
+    parser.add_argument("--app-limits", default="20:1,100:120", help="reported in X-App-Rate-Limit")
+    parser.add_argument("--method-limits", default="20000:10,1200000:600", help="reported in X-Method-Rate-Limit")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", help="proxy to the real api with LEAGUE_TOKEN and save responses here")
+    parser.add_argument("--recordings", help="replay responses saved with --record")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    parser.add_argument("--players", type=int, default=1000, help="size of the simulated population")
+    args = parser.parse_args()
+    server = start(args)
+    print(f"riot stand-in on http://{args.host}:{args.port}, {args.players} players ({'recording' if args.record else 'simulating'})")
+    try:
+        while True:
+            time.sleep(60)
+            print(server.snapshot())
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -8,6 +8,7 @@ import models
 from models.dbcontainer import DbContainer, DbService
 from dependency_injector.wiring import Provide, inject
 from envvars import Env
+from metrics import Metrics
 from bottle import route, run, template, post, get, response
 from cardmaker import CardConstructor
 
@@ -37,6 +38,11 @@ def get_image(dbservice: DbService = Provide[DbContainer.service]):
 
     return "done"
 
+@get('/metrics')
+def get_metrics():
+    content_type, body = Metrics.render()
+    response.set_header('Content-type', content_type)
+    return body
 
 
 def start():